@@ -0,0 +1,130 @@
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from archive import ARCHIVE, closed_semesters
+from stats import BATCH_SIZE, GRADE_POINTS, GRADES
+
+# Grade code 0 is "not graded yet"; 1.. follow stats.GRADES.
+GRADE_CODES = {None: 0, **{grade: code for code, grade in enumerate(GRADES, 1)}}
+GRADE_LABELS = ('Ungraded', *GRADES)
+GROUPINGS = {'Course': 'course', 'Semester': 'semester', 'Major': 'major', 'Student': 'student'}
+
+def available():
+    return np is not None
+
+class Encoder:
+    # Assigns dense int codes to values in first-seen order.
+    def __init__(self):
+        self.codes = {}
+        self.labels = []
+
+    def __call__(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.labels)
+            self.labels.append(value)
+        return code
+
+class GradeSnapshot:
+    # Enrollments as parallel columns of small ints: student, course and
+    # semester codes plus a grade code. Group-bys are np.bincount over the
+    # codes, so a report over a few hundred thousand rows needs no round trip.
+
+    def __init__(self, student, course, semester, grade, labels, student_major, major_labels, loaded_at, load_ms):
+        self.columns = {'student': student, 'course': course, 'semester': semester}
+        self.grade = grade
+        self.labels = labels
+        self.student_major = student_major
+        self.major_labels = major_labels
+        self.loaded_at = loaded_at
+        self.load_ms = load_ms
+        points = [np.nan] * len(GRADE_LABELS)
+        for grade, value in GRADE_POINTS.items():
+            points[GRADE_CODES[grade]] = value
+        self.points = np.array(points)
+
+    def __len__(self):
+        return len(self.grade)
+
+    def groups(self, by):
+        if by == 'major':
+            return self.student_major[self.columns['student']], self.major_labels
+        return self.columns[by], self.labels[by]
+
+    def distribution(self, by):
+        codes, labels = self.groups(by)
+        width = len(GRADE_LABELS)
+        counts = np.bincount(codes.astype(np.int64) * width + self.grade, minlength=len(labels) * width)
+        return labels, counts.reshape(len(labels), width)
+
+    def averages(self, by):
+        codes, labels = self.groups(by)
+        points = self.points[self.grade]
+        graded = ~np.isnan(points)
+        totals = np.bincount(codes[graded], weights=points[graded], minlength=len(labels))
+        counts = np.bincount(codes[graded], minlength=len(labels))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return labels, totals / counts
+
+    def report(self, by):
+        labels, counts = self.distribution(by)
+        _, means = self.averages(by)
+        rows = []
+        for index, label in enumerate(labels):
+            enrolled = int(counts[index].sum())
+            if enrolled:
+                rows.append((label, enrolled, None if np.isnan(means[index]) else float(means[index]),
+                             *(int(count) for count in counts[index])))
+        return rows
+
+def build_snapshot(db, batch_size=BATCH_SIZE):
+    if np is None:
+        raise RuntimeError("Grade analytics need NumPy; install it with 'pip install numpy'.")
+    start = time.perf_counter()
+    encoders = {'student': Encoder(), 'course': Encoder(), 'semester': Encoder()}
+    student, course, semester, grade = array('i'), array('i'), array('i'), array('b')
+    projection = {'student_id': 1, 'course_id': 1, 'semester': 1, 'grade': 1}
+    # Archived terms are read too, so the Semester grouping keeps closed terms
+    # and averages match the GWA counters, which keep archived grades. A term
+    # being archived can briefly have rows in both collections; the hot copy
+    # of those is counted and the archived one skipped.
+    closed = closed_semesters(db)
+    in_both = set()
+    for source in ('enrollments', ARCHIVE):
+        for doc in db[source].find({}, projection, batch_size=batch_size):
+            if source == 'enrollments' and doc.get('semester') in closed:
+                in_both.add(doc['_id'])
+            elif source == ARCHIVE and doc['_id'] in in_both:
+                continue
+            student.append(encoders['student'](doc['student_id']))
+            course.append(encoders['course'](doc['course_id']))
+            semester.append(encoders['semester'](doc.get('semester')))
+            grade.append(GRADE_CODES.get(doc.get('grade'), 0))
+
+    majors = Encoder()
+    student_ids = encoders['student'].labels
+    student_major = np.zeros(len(student_ids), dtype=np.int32)
+    found = {}
+    for offset in range(0, len(student_ids), batch_size):
+        chunk = student_ids[offset:offset + batch_size]
+        for doc in db['students'].find({'_id': {'$in': chunk}}, {'major': 1}):
+            found[doc['_id']] = doc.get('major') or ''
+    for code, student_id in enumerate(student_ids):
+        student_major[code] = majors(found.get(student_id, ''))
+
+    return GradeSnapshot(
+        student=np.frombuffer(student, dtype=np.int32).copy(),
+        course=np.frombuffer(course, dtype=np.int32).copy(),
+        semester=np.frombuffer(semester, dtype=np.int32).copy(),
+        grade=np.frombuffer(grade, dtype=np.int8).copy(),
+        labels={name: [str(label) for label in encoder.labels] for name, encoder in encoders.items()},
+        student_major=student_major,
+        major_labels=majors.labels,
+        loaded_at=time.time(),
+        load_ms=(time.perf_counter() - start) * 1000,
+    )
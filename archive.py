@@ -0,0 +1,123 @@
+import argparse
+import logging
+from datetime import datetime
+
+from pymongo import DeleteOne, ReplaceOne
+
+from connection import connect
+from stats import BATCH_SIZE, TERM_STATS, average, stats_group
+
+log = logging.getLogger(__name__)
+
+ARCHIVE = 'enrollments_archive'
+TERMS = 'terms'
+# Copy/delete passes before rows still changing in the hot collection are left there.
+ARCHIVE_ROUNDS = 3
+
+GENERIC_FIELDS = {'count': 'count', 'graded': 'graded', 'points': 'points'}
+
+def closed_semesters(db):
+    return {doc['_id'] for doc in db[TERMS].find({}, {'_id': 1})}
+
+def term_summary(db):
+    terms = {group['_id']: {'semester': group['_id'], 'enrollments': group['count'], 'archived_at': None}
+             for group in db['enrollments'].aggregate([{'$group': {'_id': '$semester', 'count': {'$sum': 1}}}])}
+    for doc in db[TERMS].find():
+        term = terms.setdefault(doc['_id'], {'semester': doc['_id'], 'enrollments': 0})
+        term['enrollments'] += doc.get('enrollments', 0)
+        term['archived_at'] = doc.get('archived_at')
+    return sorted(terms.values(), key=lambda term: term['semester'])
+
+def write_term_stats(db, semester):
+    written = 0
+    for group_field in ('student_id', 'course_id'):
+        batch = []
+        pipeline = [{'$match': {'semester': semester}}, stats_group(group_field)]
+        for group in db[ARCHIVE].aggregate(pipeline, allowDiskUse=True):
+            key = {'semester': semester, 'group': group_field, 'key': group['_id']}
+            doc = {**key, **{field: group[field] for field in GENERIC_FIELDS},
+                   'average': average(group, GENERIC_FIELDS)}
+            batch.append(ReplaceOne(key, doc, upsert=True))
+            if len(batch) >= BATCH_SIZE:
+                written += len(db[TERM_STATS].bulk_write(batch, ordered=False).upserted_ids)
+                batch = []
+        if batch:
+            written += len(db[TERM_STATS].bulk_write(batch, ordered=False).upserted_ids)
+    return written
+
+def delete_archived(db, semester):
+    # Deletes the hot copy of each archived row, unless the row changed after
+    # $merge copied it (a write whose transaction read the term before it was
+    # closed can still commit); the next round copies it again.
+    deleted, batch = 0, []
+    for doc in db[ARCHIVE].find({'semester': semester}, {'updated_at': 1}):
+        batch.append(DeleteOne({'_id': doc['_id'], 'semester': semester, 'updated_at': doc.get('updated_at')}))
+        if len(batch) >= BATCH_SIZE:
+            deleted += db['enrollments'].bulk_write(batch, ordered=False).deleted_count
+            batch = []
+    if batch:
+        deleted += db['enrollments'].bulk_write(batch, ordered=False).deleted_count
+    return deleted
+
+def drop_still_hot(db, semester):
+    # Archive copies of rows that are still in the hot collection (moved to
+    # another semester, or changed in every round) are removed, so each row
+    # is counted in exactly one place.
+    ids = [doc['_id'] for doc in db[ARCHIVE].find({'semester': semester}, {'_id': 1})]
+    dropped = 0
+    for offset in range(0, len(ids), BATCH_SIZE):
+        hot = [doc['_id'] for doc in db['enrollments'].find({'_id': {'$in': ids[offset:offset + BATCH_SIZE]}}, {'_id': 1})]
+        if hot:
+            dropped += db[ARCHIVE].delete_many({'_id': {'$in': hot}}).deleted_count
+    return dropped
+
+def archive_semester(db, semester):
+    # Every step is idempotent, so an interrupted archive can simply be re-run:
+    # the term is marked closed first (the service refuses new enrollments for
+    # it from then on), the documents are copied server side with $merge and
+    # the hot copies of exactly those versions deleted, and the final per-term
+    # stats are computed from the archive. The counters on student and course
+    # documents are left alone, so GWAs keep counting archived grades.
+    if not db['enrollments'].find_one({'semester': semester}, {'_id': 1}):
+        raise ValueError(f"Semester {semester} has no open enrollments to archive.")
+    db[TERMS].update_one({'_id': semester}, {'$setOnInsert': {'enrollments': 0}}, upsert=True)
+    deleted = 0
+    for _ in range(ARCHIVE_ROUNDS):
+        db['enrollments'].aggregate([
+            {'$match': {'semester': semester}},
+            {'$merge': {'into': ARCHIVE, 'on': '_id', 'whenMatched': 'replace', 'whenNotMatched': 'insert'}}
+        ])
+        deleted += delete_archived(db, semester)
+        if not db['enrollments'].find_one({'semester': semester}, {'_id': 1}):
+            break
+    else:
+        log.warning("Some enrollments of semester %s kept changing and were left unarchived.", semester)
+    drop_still_hot(db, semester)
+    write_term_stats(db, semester)
+    archived = db[ARCHIVE].count_documents({'semester': semester})
+    db[TERMS].update_one({'_id': semester}, {'$set': {'enrollments': archived, 'archived_at': datetime.now()}})
+    return deleted
+
+def term_stats(db, semester, group_field='course_id'):
+    return list(db[TERM_STATS].find({'semester': semester, 'group': group_field}, {'_id': 0}))
+
+def main():
+    parser = argparse.ArgumentParser(description="List terms or move a closed semester into the enrollment archive.")
+    parser.add_argument('command', choices=('list', 'archive'))
+    parser.add_argument('semester', nargs='?')
+    parser.add_argument('--uri', help="defaults to ENROLLMENT_URI or enrollment.ini")
+    parser.add_argument('--db')
+    args = parser.parse_args()
+
+    db = connect(args.uri, args.db)
+    if args.command == 'list':
+        for term in term_summary(db):
+            status = f"archived {term['archived_at']:%Y-%m-%d}" if term['archived_at'] else "open"
+            print(f"{term['semester']:12} {term['enrollments']:>8} enrollments  {status}")
+    elif not args.semester:
+        parser.error("archive needs a semester")
+    else:
+        print(f"Archived {archive_semester(db, args.semester)} enrollments from semester {args.semester}.")
+
+if __name__ == '__main__':
+    main()
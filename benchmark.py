@@ -0,0 +1,178 @@
+import argparse
+import json
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+from paging import PAGE_SIZE
+from service import EnrollmentService
+
+RESULTS_FILE = 'bench_results.jsonl'
+REPEAT = 5
+THRESHOLD = 0.20
+
+def timed(fn, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'min_ms': round(samples[0], 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        'runs': len(samples),
+    }
+
+def walk_pages(list_page, key):
+    after, rows = None, 0
+    while True:
+        page = list_page(after, None, PAGE_SIZE)
+        if not page:
+            return rows
+        rows += len(page)
+        after = page[-1][key]
+
+def middle_key(collection, field):
+    count = collection.estimated_document_count()
+    doc = next(collection.find({}, {field: 1}).sort(field, 1).skip(count // 2).limit(1), None)
+    return doc[field] if doc else None
+
+def scratch_student(service, tag):
+    return service.add_student({'first_name': 'Bench', 'last_name': tag, 'email': f"bench.{tag}@example.invalid"})
+
+def scratch_course(service, tag):
+    return service.add_course({'course_id': f"BENCH-{tag}", 'course_name': 'Benchmark', 'department': 'BENCH', 'credits': 3})
+
+def workloads(service):
+    counter = iter(range(10 ** 9))
+    def tag():
+        return f"{time.time_ns()}-{next(counter)}"
+
+    student_mid = middle_key(service.students, '_id')
+    enrollment_mid = middle_key(service.enrollments, '_id')
+    some_course = middle_key(service.courses, 'course_id')
+    some_semester = (service.enrollments.find_one({}, {'semester': 1}) or {}).get('semester', '1')
+
+    def student_with_enrollments():
+        student_id = scratch_student(service, tag())
+        courses = [doc['course_id'] for doc in service.courses.find({}, {'course_id': 1}).limit(8)]
+        for course_id in courses:
+            service.add_enrollment(student_id, course_id, 'bench')
+        return (student_id,)
+
+    def course_with_enrollments():
+        course_id = scratch_course(service, tag())
+        students = [doc['_id'] for doc in service.students.find({}, {'_id': 1}).limit(50)]
+        for student_id in students:
+            service.add_enrollment(student_id, course_id, 'bench')
+        return (course_id,)
+
+    def enrollment():
+        student_id = scratch_student(service, tag())
+        return (service.add_enrollment(student_id, some_course, 'bench'), student_id)
+
+    return {
+        'list_students first page': (lambda: service.list_students(limit=PAGE_SIZE), None),
+        'list_students middle page': (lambda: service.list_students(after=student_mid, limit=PAGE_SIZE), None),
+        'list_students full scan': (lambda: walk_pages(service.list_students, '_id'), None),
+        'list_courses first page': (lambda: service.list_courses(limit=PAGE_SIZE), None),
+        'list_courses full scan': (lambda: walk_pages(service.list_courses, 'course_id'), None),
+        'list_enrollments first page': (lambda: service.list_enrollments(limit=PAGE_SIZE), None),
+        'list_enrollments middle page': (lambda: service.list_enrollments(after=enrollment_mid, limit=PAGE_SIZE), None),
+        'search students by name': (lambda: service.list_students(limit=PAGE_SIZE, search={'name': 'ba'}), None),
+        'search enrollments by semester': (
+            lambda: service.list_enrollments(limit=PAGE_SIZE, search={'semester': some_semester}), None),
+        'add_student': (lambda student_tag: scratch_student(service, student_tag), lambda: (tag(),)),
+        'add_enrollment': (lambda student_id: service.add_enrollment(student_id, some_course, 'bench'),
+                           lambda: (scratch_student(service, tag()),)),
+        'update_enrollment': (lambda enrollment_id, _: service.update_enrollment(enrollment_id, 'bench', 'B'), enrollment),
+        'delete_enrollment': (lambda enrollment_id, _: service.delete_enrollment(enrollment_id), enrollment),
+        'delete_student (cascade)': (service.delete_student, student_with_enrollments),
+        'delete_course (cascade)': (service.delete_course, course_with_enrollments),
+    }
+
+def cleanup(service):
+    for doc in service.students.find({'email': {'$regex': r'^bench\..*@example\.invalid$'}}, {'_id': 1}):
+        service.delete_student(doc['_id'])
+    for doc in service.courses.find({'department': 'BENCH'}, {'course_id': 1}):
+        service.delete_course(doc['course_id'])
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(service, repeat=REPEAT, only=None):
+    service.prepare()
+    results = {}
+    try:
+        for name, (fn, setup) in workloads(service).items():
+            if only and only not in name:
+                continue
+            results[name] = timed(fn, repeat, setup)
+    finally:
+        cleanup(service)
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'counts': {name: service.db[name].estimated_document_count() for name in ('students', 'courses', 'enrollments')},
+        'results': results,
+    }
+
+def previous_run(path, counts):
+    previous = None
+    try:
+        with open(path, encoding='utf-8') as handle:
+            for line in handle:
+                if line.strip():
+                    record = json.loads(line)
+                    if record['counts'] == counts:
+                        previous = record
+    except FileNotFoundError:
+        pass
+    return previous
+
+def regressions(current, previous, threshold=THRESHOLD):
+    flagged = []
+    for name, result in current['results'].items():
+        before = previous['results'].get(name) if previous else None
+        if before and result['median_ms'] > before['median_ms'] * (1 + threshold):
+            flagged.append((name, before['median_ms'], result['median_ms']))
+    return flagged
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the enrollment queries and CRUD paths against a MongoDB server.")
+    parser.add_argument('--uri', help="defaults to ENROLLMENT_URI or enrollment.ini")
+    parser.add_argument('--db', default='enrollment_bench')
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--only', help="run only workloads whose name contains this text")
+    parser.add_argument('--results', default=RESULTS_FILE)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="flag a regression when the median grows by more than this fraction")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    service = EnrollmentService.connect(args.uri, args.db)
+    current = run(service, args.repeat, args.only)
+    previous = previous_run(args.results, current['counts'])
+    with open(args.results, 'a', encoding='utf-8') as handle:
+        handle.write(json.dumps(current) + '\n')
+
+    print(f"{'workload':34} {'median ms':>10} {'p95 ms':>10}")
+    for name, result in current['results'].items():
+        print(f"{name:34} {result['median_ms']:>10.2f} {result['p95_ms']:>10.2f}")
+    flagged = regressions(current, previous, args.threshold)
+    for name, before, after in flagged:
+        print(f"REGRESSION {name}: {before:.2f} ms -> {after:.2f} ms")
+    if previous is None:
+        print(f"No earlier run at this scale in {args.results}; nothing to compare.")
+    raise SystemExit(1 if flagged and args.fail_on_regression else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAXSIZE = 10000
+
+STUDENT_DISPLAY = {'first_name': 1, 'last_name': 1}
+COURSE_DISPLAY = {'course_id': 1, 'course_name': 1}
+
+class LRUCache:
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def pop(self, key):
+        return self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+class DisplayCache:
+    # Student and course display fields used to label enrollment rows, so
+    # listing enrollments does not have to $lookup both collections each time.
+    # Entries are dropped on our own writes and on change-feed events.
+
+    def __init__(self, db, maxsize=DEFAULT_MAXSIZE):
+        self.db = db
+        self.lock = threading.Lock()
+        self.students = LRUCache(maxsize)
+        self.courses = LRUCache(maxsize)
+
+    def _lookup(self, cache, keys, collection, key_field, projection):
+        keys = set(keys)
+        found = {}
+        with self.lock:
+            for key in keys:
+                value = cache.get(key)
+                if value is not None:
+                    found[key] = value
+        missing = [key for key in keys if key not in found]
+        if missing:
+            fetched = {doc[key_field]: doc for doc in self.db[collection].find({key_field: {'$in': missing}}, projection)}
+            with self.lock:
+                for key, doc in fetched.items():
+                    cache.put(key, doc)
+            found.update(fetched)
+        return found
+
+    def get_students(self, student_ids):
+        return self._lookup(self.students, student_ids, 'students', '_id', STUDENT_DISPLAY)
+
+    def get_courses(self, course_ids):
+        return self._lookup(self.courses, course_ids, 'courses', 'course_id', COURSE_DISPLAY)
+
+    def invalidate_student(self, student_id):
+        with self.lock:
+            self.students.pop(student_id)
+
+    def invalidate_course(self, course_id=None, document_id=None):
+        with self.lock:
+            if course_id is not None:
+                self.courses.pop(course_id)
+            elif document_id is not None:
+                for key, value in list(self.courses.entries.items()):
+                    if value['_id'] == document_id:
+                        self.courses.pop(key)
+
+    def apply_change(self, change):
+        doc = change['doc'] or {}
+        if change['op'] == 'reset':
+            # The feed lost its place, so renames in the gap were never seen.
+            self.clear()
+        elif change['collection'] == 'students':
+            self.invalidate_student(change['key'])
+        elif change['collection'] == 'courses':
+            self.invalidate_course(doc.get('course_id'), change['key'])
+
+    def clear(self):
+        with self.lock:
+            self.students.clear()
+            self.courses.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'student_hits': self.students.hits,
+                'student_misses': self.students.misses,
+                'students_cached': len(self.students.entries),
+                'course_hits': self.courses.hits,
+                'course_misses': self.courses.misses,
+                'courses_cached': len(self.courses.entries),
+            }
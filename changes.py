@@ -0,0 +1,148 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+log = logging.getLogger(__name__)
+
+WATCHED_COLLECTIONS = ('students', 'courses', 'enrollments')
+# The feed's own commands (awaitData getMores, updated_at polls) run on this
+# thread; CommandRecorder leaves them out of the diagnostics.
+FEED_THREAD = 'enrollment-changes'
+POLL_INTERVAL = 5.0
+AWAIT_MS = 1000
+RETRY_DELAY = 5.0
+FRAME_MS = 50
+# ChangeStreamHistoryLost / ChangeStreamFatalError: the resume token is no
+# longer in the oplog, so events were missed.
+HISTORY_LOST = (286, 280)
+# updated_at comes from each desk's clock, so polls overlap a little to absorb skew.
+POLL_OVERLAP = timedelta(seconds=2)
+
+def change_event(op, collection, key, doc=None):
+    return {'op': op, 'collection': collection, 'key': key, 'doc': doc}
+
+class ChangeFeed:
+    # Delivers normalized change events ({'op', 'collection', 'key', 'doc'}) for
+    # the watched collections to ``handler`` on a background thread. Uses a
+    # database change stream when the server is a replica set; otherwise polls
+    # the ``updated_at`` stamp written by the service, which sees inserts and
+    # updates but not deletes.
+
+    def __init__(self, db, handler, collections=WATCHED_COLLECTIONS, poll_interval=POLL_INTERVAL):
+        self.db = db
+        self.handler = handler
+        self.collections = tuple(collections)
+        self.poll_interval = poll_interval
+        self.stopped = threading.Event()
+        self.thread = None
+        self.mode = None
+        self.resume_token = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name=FEED_THREAD, daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def _run(self):
+        while not self.stopped.is_set():
+            try:
+                self._watch()
+            except OperationFailure as err:
+                if self._unsupported(err):
+                    log.info("Change streams unavailable (%s); polling every %ss.", err, self.poll_interval)
+                    self._poll()
+                    return
+                if err.code in HISTORY_LOST and self.resume_token is not None:
+                    # Start a fresh stream and tell the handler to reload
+                    # whatever it derived from the missed events.
+                    log.warning("Change stream could not resume: %s", err)
+                    self.resume_token = None
+                    self._emit(change_event('reset', None, None))
+                    continue
+                log.warning("Change stream failed: %s", err)
+            except PyMongoError as err:
+                log.warning("Change stream interrupted: %s", err)
+            self.stopped.wait(RETRY_DELAY)
+
+    def _unsupported(self, err):
+        return err.code in (40573, 40324) or 'replica set' in str(err)
+
+    def _watch(self):
+        pipeline = [{'$match': {'ns.coll': {'$in': list(self.collections)}}}]
+        with self.db.watch(pipeline, full_document='updateLookup', resume_after=self.resume_token,
+                           max_await_time_ms=AWAIT_MS) as stream:
+            self.mode = 'stream'
+            while not self.stopped.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is None:
+                    continue
+                self.resume_token = stream.resume_token
+                op = change['operationType']
+                if op in ('insert', 'update', 'replace', 'delete'):
+                    self._emit(change_event(op, change['ns']['coll'], change['documentKey']['_id'],
+                                            change.get('fullDocument')))
+
+    def _poll(self):
+        self.mode = 'poll'
+        since = datetime.now()
+        while not self.stopped.wait(self.poll_interval):
+            checked = datetime.now()
+            try:
+                for collection in self.collections:
+                    for doc in self.db[collection].find({'updated_at': {'$gt': since}}):
+                        self._emit(change_event('update', collection, doc['_id'], doc))
+            except PyMongoError as err:
+                log.warning("Change polling failed: %s", err)
+                continue
+            since = checked - POLL_OVERLAP
+
+    def _emit(self, event):
+        try:
+            self.handler(event)
+        except Exception:
+            log.exception("Change handler failed for %s", event)
+
+class ChangeBatcher:
+    # Hands change events from the feed thread to the Tk thread. Events are
+    # collected under a lock, keyed by (collection, key) so only the latest
+    # state of a document survives, and ``apply`` is called at most once per
+    # frame with the batch. A 'reset' event is passed on alone.
+
+    def __init__(self, root, apply, frame_ms=FRAME_MS):
+        self.root = root
+        self.apply = apply
+        self.frame_ms = frame_ms
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.reset = False
+        root.after(frame_ms, self._tick)
+
+    def push(self, change):
+        with self.lock:
+            if change['op'] == 'reset':
+                self.reset = True
+                self.pending.clear()
+            elif not self.reset:
+                self.pending[change['collection'], change['key']] = change
+
+    def take(self):
+        with self.lock:
+            if self.reset:
+                self.reset = False
+                return [change_event('reset', None, None)]
+            changes, self.pending = list(self.pending.values()), {}
+            return changes
+
+    def _tick(self):
+        try:
+            changes = self.take()
+            if changes:
+                self.apply(changes)
+        finally:
+            self.root.after(self.frame_ms, self._tick)
@@ -0,0 +1,183 @@
+import configparser
+import logging
+import os
+import threading
+from collections import deque
+
+from pymongo import MongoClient, monitoring
+
+log = logging.getLogger(__name__)
+
+CONFIG_FILE = 'enrollment.ini'
+CONFIG_SECTION = 'mongodb'
+ENV_PREFIX = 'ENROLLMENT_'
+
+DEFAULTS = {
+    'uri': 'mongodb://localhost:27017/',
+    'db': 'enrollment_db',
+    'app_name': 'enrollment',
+    'max_pool_size': '20',
+    'min_pool_size': '0',
+    'max_idle_time_ms': '60000',
+    'connect_timeout_ms': '5000',
+    'server_selection_timeout_ms': '5000',
+    'socket_timeout_ms': '30000',
+    'wait_queue_timeout_ms': '10000',
+    'read_preference': 'primary',
+    'write_concern': '1',
+    'journal': 'true',
+    # Path of the SQLite mirror used while MongoDB is unreachable; empty disables it.
+    'offline_cache': '',
+    # File holding the first page of each table from the last session, painted at
+    # launch before fresh rows arrive; empty disables it.
+    'row_snapshot': '',
+}
+
+# setting -> (MongoClient keyword, parser)
+CLIENT_OPTIONS = {
+    'app_name': ('appname', str),
+    'max_pool_size': ('maxPoolSize', int),
+    'min_pool_size': ('minPoolSize', int),
+    'max_idle_time_ms': ('maxIdleTimeMS', int),
+    'connect_timeout_ms': ('connectTimeoutMS', int),
+    'server_selection_timeout_ms': ('serverSelectionTimeoutMS', int),
+    'socket_timeout_ms': ('socketTimeoutMS', int),
+    'wait_queue_timeout_ms': ('waitQueueTimeoutMS', int),
+    'read_preference': ('readPreference', str),
+    'write_concern': ('w', lambda value: int(value) if value.isdigit() else value),
+    'journal': ('journal', lambda value: value.lower() in ('1', 'true', 'yes', 'on')),
+}
+
+LATENCY_SAMPLES = 50
+
+def load_settings(path=None, environ=None):
+    # Defaults, then the [mongodb] section of enrollment.ini (or $ENROLLMENT_CONFIG),
+    # then ENROLLMENT_<SETTING> environment variables, e.g. ENROLLMENT_URI.
+    environ = os.environ if environ is None else environ
+    settings = dict(DEFAULTS)
+    path = path or environ.get(ENV_PREFIX + 'CONFIG', CONFIG_FILE)
+    parser = configparser.ConfigParser()
+    if parser.read(path, encoding='utf-8') and parser.has_section(CONFIG_SECTION):
+        settings.update({key: value for key, value in parser.items(CONFIG_SECTION) if key in DEFAULTS})
+    for key in DEFAULTS:
+        value = environ.get(ENV_PREFIX + key.upper())
+        if value:
+            settings[key] = value
+    return settings
+
+def client_options(settings):
+    options = {}
+    for key, (option, parse) in CLIENT_OPTIONS.items():
+        try:
+            options[option] = parse(settings[key])
+        except ValueError:
+            raise ValueError(f"Invalid value for {key}: {settings[key]!r}") from None
+    return options
+
+def create_client(settings, listeners=(), **overrides):
+    options = client_options(settings)
+    # connect=False defers the first network round trip to the first operation,
+    # so building the client never blocks the caller.
+    options['connect'] = False
+    if listeners:
+        options['event_listeners'] = list(listeners)
+    options.update(overrides)
+    return MongoClient(settings['uri'], **options)
+
+def connect(uri=None, db_name=None, listeners=(), **overrides):
+    settings = load_settings()
+    if uri:
+        settings['uri'] = uri
+    if db_name:
+        settings['db'] = db_name
+    return create_client(settings, listeners, **overrides)[settings['db']]
+
+class ConnectionMonitor(monitoring.ServerHeartbeatListener, monitoring.ConnectionPoolListener):
+    # Collects heartbeat round trips and connection pool counters from the
+    # driver's monitoring events. Events arrive on driver threads, so all state
+    # is guarded by a lock and read through stats().
+
+    def __init__(self, samples=LATENCY_SAMPLES):
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=samples)
+        self.healthy = None
+        self.last_error = None
+        self.servers = {}
+        self.pool = {'open': 0, 'checked_out': 0, 'waiting': 0, 'check_out_failures': 0, 'cleared': 0}
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        with self.lock:
+            # An awaited (streaming) heartbeat's duration includes the server
+            # holding the reply for up to heartbeatFrequencyMS, so it is not a
+            # round trip; it still proves the server is up.
+            if not event.awaited:
+                self.latencies.append(event.duration * 1000)
+            self.servers[event.connection_id] = True
+            self.healthy = True
+            self.last_error = None
+
+    def failed(self, event):
+        with self.lock:
+            was_up = self.servers.get(event.connection_id) is not False
+            self.servers[event.connection_id] = False
+            self.healthy = any(self.servers.values())
+            self.last_error = str(event.reply)
+        # Heartbeats repeat every few seconds; only log the transition.
+        if was_up:
+            log.warning("Heartbeat to %s:%s failed: %s", *event.connection_id, event.reply)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self.lock:
+            self.pool['cleared'] += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self.lock:
+            self.pool['open'] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self.lock:
+            self.pool['open'] -= 1
+
+    def connection_check_out_started(self, event):
+        with self.lock:
+            self.pool['waiting'] += 1
+
+    def connection_check_out_failed(self, event):
+        with self.lock:
+            self.pool['waiting'] -= 1
+            self.pool['check_out_failures'] += 1
+
+    def connection_checked_out(self, event):
+        with self.lock:
+            self.pool['waiting'] -= 1
+            self.pool['checked_out'] += 1
+
+    def connection_checked_in(self, event):
+        with self.lock:
+            self.pool['checked_out'] -= 1
+
+    def stats(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            return {
+                'healthy': self.healthy,
+                'last_error': self.last_error,
+                'latency_ms': round(self.latencies[-1], 2) if latencies else None,
+                'median_latency_ms': round(latencies[len(latencies) // 2], 2) if latencies else None,
+                **self.pool,
+            }
@@ -0,0 +1,148 @@
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+
+from connection import connect
+from indexes import ensure_indexes
+from schema import ensure_validators
+from stats import COURSE_FIELDS, STUDENT_FIELDS, empty_stats, rebuild_stats
+
+BATCH_SIZE = 5000
+
+FIRST_NAMES = (
+    'Aaron', 'Abigail', 'Adrian', 'Aileen', 'Alfonso', 'Alyssa', 'Andrea', 'Angelo', 'Bea', 'Benjamin',
+    'Bianca', 'Carlo', 'Carmela', 'Christian', 'Daniel', 'Danica', 'Elijah', 'Erika', 'Francis', 'Gabriel',
+    'Grace', 'Hannah', 'Isabel', 'Jasmine', 'Jerome', 'John', 'Joshua', 'Kathleen', 'Kevin', 'Kris',
+    'Lance', 'Lea', 'Marco', 'Maria', 'Mark', 'Nathan', 'Nicole', 'Patricia', 'Paolo', 'Rafael',
+    'Regine', 'Ronnel', 'Samantha', 'Sophia', 'Stephen', 'Trisha', 'Vincent', 'Xavier', 'Ysabel', 'Zach',
+)
+LAST_NAMES = (
+    'Aquino', 'Bautista', 'Baluyut', 'Castillo', 'Cruz', 'David', 'Dela Cruz', 'Espino', 'Fernandez', 'Flores',
+    'Garcia', 'Gonzales', 'Hernandez', 'Lopez', 'Manalo', 'Mendoza', 'Miranda', 'Navarro', 'Ocampo', 'Pascual',
+    'Ramos', 'Reyes', 'Rivera', 'Santos', 'Soriano', 'Tolentino', 'Torres', 'Valdez', 'Villanueva', 'Yap',
+)
+MAJORS = ('BSIT', 'BSCS', 'BSIS', 'BSEMC', 'BSA', 'BSBA', 'BSN', 'BSED')
+DEPARTMENTS = {
+    'DCS': ('Programming', 'Data Structures', 'Database Systems', 'Networking', 'System Integration', 'Graphics'),
+    'DBA': ('Accounting', 'Marketing', 'Management', 'Economics', 'Business Law'),
+    'DNS': ('Anatomy', 'Pharmacology', 'Community Health', 'Nursing Practice'),
+    'DED': ('Pedagogy', 'Assessment', 'Curriculum Design', 'Child Development'),
+    'DGE': ('Mathematics', 'Physics', 'Ethics', 'Philippine History', 'Purposive Communication'),
+}
+INSTRUCTORS = ('Marsha Lintag', 'Thelma Miranda', 'Rizza Baltazar', 'OJ Liwanag', 'Dennis Cruz', 'Liza Ramos',
+               'Arnel Santos', 'Joy Mendoza', 'Carlo Reyes', 'Anna Villanueva')
+GRADE_WEIGHTS = {'A': 18, 'B': 30, 'C': 25, 'D': 10, 'F': 5, 'Incomplete': 2, None: 10}
+
+def default_scale(enrollments, students=None, courses=None):
+    students = students or max(10, enrollments // 6)
+    courses = courses or max(10, min(5000, enrollments // 200))
+    return students, courses
+
+def generate_students(rng, count):
+    start = datetime(2020, 6, 1)
+    for index in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield {
+            '_id': ObjectId(),
+            'first_name': first,
+            'last_name': last,
+            'email': f"{first}.{last}.{index}@example.edu".lower().replace(' ', ''),
+            'date_of_birth': datetime(rng.randint(2000, 2006), rng.randint(1, 12), rng.randint(1, 28)),
+            'major': rng.choice(MAJORS),
+            'enrollment_date': start + timedelta(minutes=rng.randint(0, 60 * 24 * 365 * 4)),
+            **empty_stats(STUDENT_FIELDS)
+        }
+
+def generate_courses(rng, count):
+    departments = list(DEPARTMENTS)
+    for index in range(count):
+        department = departments[index % len(departments)]
+        topic = DEPARTMENTS[department][(index // len(departments)) % len(DEPARTMENTS[department])]
+        yield {
+            'course_id': f"{department}{index + 100:04d}",
+            'course_name': f"{topic} {index // (len(departments) * len(DEPARTMENTS[department])) + 1}",
+            'department': department,
+            'credits': rng.choice((1, 2, 3, 3, 3, 4, 5)),
+            'instructor': rng.choice(INSTRUCTORS),
+            **empty_stats(COURSE_FIELDS)
+        }
+
+def generate_enrollments(rng, count, student_ids, course_ids, semesters):
+    grades, weights = zip(*GRADE_WEIGHTS.items())
+    per_semester = max(1, count // max(1, len(student_ids) * semesters))
+    produced = 0
+    semester = 0
+    # Courses are sampled without replacement per student and semester, so the
+    # unique (student_id, course_id, semester) index is never violated.
+    while produced < count:
+        semester += 1
+        enrollment_date = datetime(2021, 1, 1) + timedelta(days=182 * (semester - 1))
+        for student_id in student_ids:
+            load = min(len(course_ids), per_semester + rng.randint(0, 1))
+            for course_id in rng.sample(course_ids, load):
+                yield {
+                    'student_id': student_id,
+                    'course_id': course_id,
+                    'semester': str(semester),
+                    'enrollment_date': enrollment_date,
+                    'grade': rng.choices(grades, weights)[0]
+                }
+                produced += 1
+                if produced >= count:
+                    return
+
+def insert_batches(collection, docs, batch_size=BATCH_SIZE):
+    # Stamped like the service's own writes, so offline mirrors pull them.
+    now = datetime.now()
+    batch, total = [], 0
+    for doc in docs:
+        doc['updated_at'] = now
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            total += len(collection.insert_many(batch, ordered=False).inserted_ids)
+            batch = []
+    if batch:
+        total += len(collection.insert_many(batch, ordered=False).inserted_ids)
+    return total
+
+def populate(db, enrollments, students=None, courses=None, semesters=4, seed=0, drop=False):
+    rng = random.Random(seed)
+    students, courses = default_scale(enrollments, students, courses)
+    if drop:
+        for name in ('students', 'courses', 'enrollments'):
+            db.drop_collection(name)
+    ensure_validators(db)
+    ensure_indexes(db)
+
+    student_docs = list(generate_students(rng, students))
+    insert_batches(db['students'], student_docs)
+    student_ids = [doc['_id'] for doc in student_docs]
+    del student_docs
+    course_docs = list(generate_courses(rng, courses))
+    insert_batches(db['courses'], course_docs)
+    course_ids = [doc['course_id'] for doc in course_docs]
+    inserted = insert_batches(db['enrollments'], generate_enrollments(rng, enrollments, student_ids, course_ids, semesters))
+    rebuild_stats(db)
+    return {'students': students, 'courses': courses, 'enrollments': inserted}
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a database with synthetic students, courses and enrollments.")
+    parser.add_argument('--enrollments', type=int, default=10000)
+    parser.add_argument('--students', type=int)
+    parser.add_argument('--courses', type=int)
+    parser.add_argument('--semesters', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--drop', action='store_true', help="drop the three collections first")
+    parser.add_argument('--uri', help="defaults to ENROLLMENT_URI or enrollment.ini")
+    parser.add_argument('--db', default='enrollment_bench')
+    args = parser.parse_args()
+
+    db = connect(args.uri, args.db)
+    counts = populate(db, args.enrollments, args.students, args.courses, args.semesters, args.seed, args.drop)
+    print(f"Generated {counts['students']} students, {counts['courses']} courses and "
+          f"{counts['enrollments']} enrollments in {args.db}.")
+
+if __name__ == '__main__':
+    main()
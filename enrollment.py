@@ -1,22 +1,62 @@
+import logging
+import time
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-from pymongo import MongoClient
+from tkinter import ttk, filedialog, messagebox, simpledialog
+from pymongo.errors import DuplicateKeyError
 from bson.objectid import ObjectId
-from datetime import datetime
-
-client = MongoClient('mongodb://localhost:27017/')
-db = client['enrollment_db']
-
-students_collection = db['students']
-courses_collection = db['courses']
-enrollments_collection = db['enrollments']
-students_collection.create_index('email', unique=True)
-courses_collection.create_index('course_id', unique=True)
+import analytics
+from changes import ChangeBatcher
+from connection import load_settings
+from import_export import format_report
+from instrumentation import SLOW_MS
+from models import Course, Enrollment, Student, format_average
+from offline import LocalMirror, OfflineService
+from paging import PagedTable
+from rowcache import load_rows, save_rows
+from search import SEARCH_FIELDS
+from service import EnrollmentService
+from stats import GRADES
+from worker import Worker
+
+SEARCH_DELAY_MS = 300
+STATUS_INTERVAL_MS = 5000
+SYNC_INTERVAL_MS = 30000
+# More changes than this to one table in a single frame reload it instead of
+# patching row by row.
+LIVE_RELOAD_AT = 500
+SLOWEST_SHOWN = 100
+
+# Set up by main(); the callbacks below only run once the window exists.
+root = None
+worker = None
+service = None
+settings = None
+
+# Tab frame name -> (title, PagedTable). A table is loaded when its tab is
+# first shown; load_all() only reloads the visible one and marks the rest stale.
+tab_views = {}
+stale = set()
+
+# Milestones since main() started, in ms; shown on the Diagnostics tab.
+startup = {}
+
+# Set once the offline mirror's periodic sync has been started.
+sync_started = False
+
+# Latest analytics.GradeSnapshot, loaded from the Grade Analytics tab.
+snapshot = None
+
+def database_error(err):
+    if isinstance(err, ValueError):
+        messagebox.showwarning("Input Error", str(err))
+    else:
+        messagebox.showerror("Database Error", str(err))
 
-root = tk.Tk()
-root.title("Enrollment Management System")
-root.geometry("1200x700")
-root.config(bg="#f7f9fc")
+def enrollment_error(err):
+    if isinstance(err, DuplicateKeyError):
+        messagebox.showwarning("Duplicate Enrollment", "This student is already enrolled in that course for this semester.")
+    else:
+        database_error(err)
 
 def clear_fields():
     for entry in [first_name, last_name, email, dob, major, 
@@ -32,21 +72,20 @@ def add_student():
     student_major = major.get()
 
     if fname and lname and student_email:
-        try:
-            student_data = {
-                'first_name': fname,
-                'last_name': lname,
-                'email': student_email,
-                'date_of_birth': student_dob,
-                'major': student_major,
-                'enrollment_date': datetime.now()
-            }
-            students_collection.insert_one(student_data)
-            load_students()
+        student_data = {
+            'first_name': fname,
+            'last_name': lname,
+            'email': student_email,
+            'date_of_birth': student_dob,
+            'major': student_major
+        }
+
+        def done(student_id):
+            refresh_students([student_id])
             messagebox.showinfo("Success", "Student added successfully!")
             clear_fields()
-        except Exception as err:
-            messagebox.showerror("Database Error", str(err))
+
+        worker.submit(service.add_student, student_data, on_done=done)
     else:
         messagebox.showwarning("Input Error", "All fields are required.")
 
@@ -62,45 +101,47 @@ def update_student():
     fname = simpledialog.askstring("Update", "Enter First Name:", initialvalue=student_data[1])
     lname = simpledialog.askstring("Update", "Enter Last Name:", initialvalue=student_data[2])
     student_email = simpledialog.askstring("Update", "Enter Email:", initialvalue=student_data[3])
-    student_dob = simpledialog.askstring("Update", "Enter Date of Birth:", initialvalue=student_data[4])
+    student_dob = simpledialog.askstring("Update", "Enter Date of Birth (YYYY-MM-DD):", initialvalue=student_data[4])
     student_major = simpledialog.askstring("Update", "Enter Major:", initialvalue=student_data[5])
 
     if fname and lname and student_email:
-        try:
-            students_collection.update_one(
-                {'_id': ObjectId(student_id)},
-                {'$set': {
-                    'first_name': fname, 
-                    'last_name': lname, 
-                    'email': student_email,
-                    'date_of_birth': student_dob, 
-                    'major': student_major
-                }}
-            )
-            load_students()
+        def done(result):
+            refresh_students([student_id])
+            refresh_enrollments(rows_where(enrollment_table, "Student ID", student_id))
             messagebox.showinfo("Success", "Student updated successfully!")
-        except Exception as err:
-            messagebox.showerror("Database Error", str(err))
+
+        worker.submit(
+            service.update_student,
+            student_id,
+            {
+                'first_name': fname,
+                'last_name': lname,
+                'email': student_email,
+                'date_of_birth': student_dob,
+                'major': student_major
+            },
+            on_done=done
+        )
 
 def delete_student():
-    selected = student_table.focus()
+    selected = selected_rows(student_table)
     if not selected:
         messagebox.showwarning("Selection Error", "Please select a student to delete.")
         return
 
-    student_data = student_table.item(selected, 'values')
-    student_id = student_data[0]
+    student_ids = [student_table.item(row, 'values')[0] for row in selected]
+    target = "this student" if len(student_ids) == 1 else f"these {len(student_ids)} students"
 
-    if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this student? This will also remove all their enrollments."):
-        try:
-            enrollments_collection.delete_many({'student_id': ObjectId(student_id)})
-            students_collection.delete_one({'_id': ObjectId(student_id)})
-            
-            load_students()
-            load_enrollments()
-            messagebox.showinfo("Success", "Student deleted successfully!")
-        except Exception as err:
-            messagebox.showerror("Database Error", str(err))
+    if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete {target}? This will also remove all their enrollments."):
+        def done(affected_courses):
+            enrollment_view.remove([row for student_id in student_ids
+                                    for row in rows_where(enrollment_table, "Student ID", student_id)])
+            student_view.remove(student_ids)
+            refresh_courses(affected_courses)
+            messagebox.showinfo("Success", "Student deleted successfully!" if len(student_ids) == 1
+                                else f"{len(student_ids)} students deleted successfully!")
+
+        worker.submit(service.delete_students, student_ids, on_done=done)
 
 def add_course():
     cid = course_id.get()
@@ -110,20 +151,20 @@ def add_course():
     cinstructor = instructor.get()
 
     if cid and cname and cdepartment and ccredits:
-        try:
-            course_data = {
-                'course_id': cid,
-                'course_name': cname,
-                'department': cdepartment,
-                'credits': int(ccredits),
-                'instructor': cinstructor
-            }
-            courses_collection.insert_one(course_data)
-            load_courses()
+        course_data = {
+            'course_id': cid,
+            'course_name': cname,
+            'department': cdepartment,
+            'credits': ccredits,
+            'instructor': cinstructor
+        }
+
+        def done(result):
+            refresh_courses([cid])
             messagebox.showinfo("Success", "Course added successfully!")
             clear_fields()
-        except Exception as err:
-            messagebox.showerror("Database Error", str(err))
+
+        worker.submit(service.add_course, course_data, on_done=done)
     else:
         messagebox.showwarning("Input Error", "All course fields are required.")
 
@@ -142,40 +183,42 @@ def update_course():
     cinstructor = simpledialog.askstring("Update", "Enter Instructor:", initialvalue=course_data[4])
 
     if cname and cdepartment and ccredits and cinstructor:
-        try:
-            courses_collection.update_one(
-                {'course_id': course_id_val},
-                {'$set': {
-                    'course_name': cname, 
-                    'department': cdepartment, 
-                    'credits': ccredits, 
-                    'instructor': cinstructor
-                }}
-            )
-            load_courses()
+        def done(result):
+            refresh_courses([course_id_val])
+            refresh_enrollments(rows_where(enrollment_table, "Course ID", course_id_val))
             messagebox.showinfo("Success", "Course updated successfully!")
-        except Exception as err:
-            messagebox.showerror("Database Error", str(err))
+
+        worker.submit(
+            service.update_course,
+            course_id_val,
+            {
+                'course_name': cname,
+                'department': cdepartment,
+                'credits': ccredits,
+                'instructor': cinstructor
+            },
+            on_done=done
+        )
 
 def delete_course():
-    selected = course_table.focus()
+    selected = selected_rows(course_table)
     if not selected:
         messagebox.showwarning("Selection Error", "Please select a course to delete.")
         return
 
-    course_data = course_table.item(selected, 'values')
-    course_id_val = course_data[0]
+    course_ids = [course_table.item(row, 'values')[0] for row in selected]
+    target = "this course" if len(course_ids) == 1 else f"these {len(course_ids)} courses"
 
-    if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this course? This will also remove all enrollments for this course."):
-        try:
-            enrollments_collection.delete_many({'course_id': course_id_val})
-            courses_collection.delete_one({'course_id': course_id_val})
-            
-            load_courses()
-            load_enrollments()
-            messagebox.showinfo("Success", "Course deleted successfully!")
-        except Exception as err:
-            messagebox.showerror("Database Error", str(err))
+    if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete {target}? This will also remove all enrollments for them."):
+        def done(affected_students):
+            enrollment_view.remove([row for course_id_val in course_ids
+                                    for row in rows_where(enrollment_table, "Course ID", course_id_val)])
+            course_view.remove(course_ids)
+            refresh_students(affected_students)
+            messagebox.showinfo("Success", "Course deleted successfully!" if len(course_ids) == 1
+                                else f"{len(course_ids)} courses deleted successfully!")
+
+        worker.submit(service.delete_courses, course_ids, on_done=done)
 
 def add_enrollment():
     student_selection = student_table.focus()
@@ -193,20 +236,14 @@ def add_enrollment():
     sem = semester.get()
 
     if sem:
-        try:
-            enrollment_data = {
-                'student_id': ObjectId(student_id),
-                'course_id': course_id_val,
-                'semester': sem,
-                'enrollment_date': datetime.now(),
-                'grade': None
-            }
-            enrollments_collection.insert_one(enrollment_data)
+        def done(enrollment_id):
+            refresh_enrollments([enrollment_id])
+            refresh_students([student_id])
+            refresh_courses([course_id_val])
             messagebox.showinfo("Success", "Student enrolled successfully!")
             clear_fields()
-            load_enrollments()
-        except Exception as err:
-            messagebox.showerror("Database Error", str(err))
+
+        worker.submit(service.add_enrollment, student_id, course_id_val, sem, on_done=done, on_error=enrollment_error)
     else:
         messagebox.showwarning("Input Error", "Semester is required.")
 
@@ -223,298 +260,723 @@ def update_enrollment():
     grade = simpledialog.askstring("Update", "Enter Grade (A/B/C/D/F/Incomplete):", initialvalue=enrollment_data[5] or '')
 
     if sem:
-        try:
-            enrollments_collection.update_one(
-                {'_id': ObjectId(enrollment_id)},
-                {'$set': {
-                    'semester': sem, 
-                    'grade': grade or None
-                }}
-            )
-            load_enrollments()
+        def done(previous):
+            refresh_enrollments([enrollment_id])
+            refresh_students([enrollment_data[1]])
+            refresh_courses([enrollment_data[2]])
             messagebox.showinfo("Success", "Enrollment updated successfully!")
-        except Exception as err:
-            messagebox.showerror("Database Error", str(err))
+
+        worker.submit(service.update_enrollment, enrollment_id, sem, grade or None,
+                      on_done=done, on_error=enrollment_error)
 
 def delete_enrollment():
-    selected = enrollment_table.focus()
+    selected = selected_rows(enrollment_table)
     if not selected:
         messagebox.showwarning("Selection Error", "Please select an enrollment to delete.")
         return
 
-    enrollment_data = enrollment_table.item(selected, 'values')
-    enrollment_id = enrollment_data[0]
+    rows = [enrollment_table.item(row, 'values') for row in selected]
+    enrollment_ids = [values[0] for values in rows]
+    target = "this enrollment" if len(rows) == 1 else f"these {len(rows)} enrollments"
 
-    if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this enrollment?"):
-        try:
-            enrollments_collection.delete_one({'_id': ObjectId(enrollment_id)})
-            load_enrollments()
-            messagebox.showinfo("Success", "Enrollment deleted successfully!")
-        except Exception as err:
-            messagebox.showerror("Database Error", str(err))
+    if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete {target}?"):
+        def done(removed):
+            enrollment_view.remove(enrollment_ids)
+            refresh_students({values[1] for values in rows})
+            refresh_courses({values[2] for values in rows})
+            messagebox.showinfo("Success", "Enrollment deleted successfully!" if len(rows) == 1
+                                else f"{len(rows)} enrollments deleted successfully!")
 
-def load_students():
-    for row in student_table.get_children():
-        student_table.delete(row)
-    pipeline = [
-        {
-            '$lookup': {
-                'from': 'enrollments',
-                'localField': '_id',
-                'foreignField': 'student_id',
-                'as': 'enrollments'
-            }
-        },
-        {
-            '$addFields': {
-                'total_courses': {'$size': '$enrollments'},
-                'gwa': {
-                    '$avg': {
-                        '$map': {
-                            'input': '$enrollments',
-                            'as': 'enrollment',
-                            'in': {
-                                '$switch': {
-                                    'branches': [
-                                        {'case': {'$eq': ['$$enrollment.grade', 'A']}, 'then': 1.0},
-                                        {'case': {'$eq': ['$$enrollment.grade', 'B']}, 'then': 2.0},
-                                        {'case': {'$eq': ['$$enrollment.grade', 'C']}, 'then': 3.0},
-                                        {'case': {'$eq': ['$$enrollment.grade', 'D']}, 'then': 4.0},
-                                        {'case': {'$eq': ['$$enrollment.grade', 'F']}, 'then': 5.0}
-                                    ],
-                                    'default': None
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        }
-    ]
-    
-    students = list(students_collection.aggregate(pipeline))
-    
-    for student in students:
-        student_table.insert("", "end", values=(
-            str(student['_id']),
-            student['first_name'],
-            student['last_name'],
-            student['email'],
-            student.get('date_of_birth', ''),
-            student['major'],
-            student['total_courses'],
-            round(student['gwa'], 2) if student['gwa'] is not None else 'N/A'
-        ))
-
-def load_courses():
-    for row in course_table.get_children():
-        course_table.delete(row)
-    
-    pipeline = [
-        {
-            '$lookup': {
-                'from': 'enrollments',
-                'localField': 'course_id',
-                'foreignField': 'course_id',
-                'as': 'enrollments'
-            }
-        },
-        {
-            '$addFields': {
-                'enrolled_students': {'$size': '$enrollments'},
-                'avg_course_grade': {
-                    '$avg': {
-                        '$map': {
-                            'input': '$enrollments',
-                            'as': 'enrollment',
-                            'in': {
-                                '$switch': {
-                                    'branches': [
-                                        {'case': {'$eq': ['$$enrollment.grade', 'A']}, 'then': 1.0},
-                                        {'case': {'$eq': ['$$enrollment.grade', 'B']}, 'then': 2.0},
-                                        {'case': {'$eq': ['$$enrollment.grade', 'C']}, 'then': 3.0},
-                                        {'case': {'$eq': ['$$enrollment.grade', 'D']}, 'then': 4.0},
-                                        {'case': {'$eq': ['$$enrollment.grade', 'F']}, 'then': 5.0}
-                                    ],
-                                    'default': None
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        }
-    ]
-    
-    courses = list(courses_collection.aggregate(pipeline))
-    
-    for course in courses:
-        course_table.insert("", "end", values=(
-            course['course_id'],
-            course['course_name'],
-            course['department'],
-            course['credits'],
-            course['instructor'],
-            course['enrolled_students'],
-            round(course['avg_course_grade'], 2) if course['avg_course_grade'] is not None else 'N/A'
-        ))
+        worker.submit(service.delete_enrollments, enrollment_ids, on_done=done)
 
-def load_enrollments():
-    for row in enrollment_table.get_children():
-        enrollment_table.delete(row)
-    pipeline = [
-        {
-            '$lookup': {
-                'from': 'students',
-                'localField': 'student_id',
-                'foreignField': '_id',
-                'as': 'student'
-            }
-        },
-        {
-            '$lookup': {
-                'from': 'courses',
-                'localField': 'course_id',
-                'foreignField': 'course_id',
-                'as': 'course'
-            }
-        },
-        {
-            '$unwind': '$student'
-        },
-        {
-            '$unwind': '$course'
-        }
-    ]
-    
-    enrollments = list(enrollments_collection.aggregate(pipeline))
-    
-    for enrollment in enrollments:
-        enrollment_table.insert("", "end", values=(
-            str(enrollment['_id']),
-            str(enrollment['student_id']),
-            enrollment['course_id'],
-            enrollment['semester'],
-            enrollment['enrollment_date'],
-            enrollment['grade'],
-            f"{enrollment['student']['first_name']} {enrollment['student']['last_name']}",
-            enrollment['course']['course_name']
-        ))
-
-notebook = ttk.Notebook(root)
-notebook.pack(fill="both", expand=True)
-
-students_frame = ttk.Frame(notebook)
-notebook.add(students_frame, text="Students")
-
-student_columns = ("ID", "First Name", "Last Name", "Email", "Date of Birth", "Major", "Total Courses", "GWA")
-student_table = ttk.Treeview(students_frame, columns=student_columns, show="headings", height=10)
-
-for col in student_columns:
-    student_table.heading(col, text=col)
-    student_table.column(col, anchor='center', width=100)
-
-student_table.pack(fill="both", expand=True, padx=20, pady=10)
-
-student_input_frame = tk.Frame(students_frame, bg="#e8f1f5")
-student_input_frame.pack(pady=10)
-
-student_fields = [
-    ("First Name:", "first_name"),
-    ("Last Name:", "last_name"),
-    ("Email:", "email"),
-    ("Date of Birth:", "dob"),
-    ("Major:", "major")
-]
-
-for i, (label_text, entry_name) in enumerate(student_fields):
-    row = i // 2
-    col = (i % 2) * 2
-    
-    tk.Label(student_input_frame, text=label_text, bg="#e8f1f5").grid(row=row, column=col, padx=5, pady=5, sticky='w')
-    globals()[entry_name] = ttk.Entry(student_input_frame, width=20)
-    globals()[entry_name].grid(row=row, column=col+1, padx=5, pady=5)
-
-student_buttons_frame = tk.Frame(students_frame, bg="#e8f1f5")
-student_buttons_frame.pack(pady=10)
-
-ttk.Button(student_buttons_frame, text="Add Student", command=add_student).grid(row=0, column=0, padx=5)
-ttk.Button(student_buttons_frame, text="Update Student", command=update_student).grid(row=0, column=1, padx=5)
-ttk.Button(student_buttons_frame, text="Delete Student", command=delete_student).grid(row=0, column=2, padx=5)
-ttk.Button(student_buttons_frame, text="Clear Fields", command=clear_fields).grid(row=0, column=3, padx=5)
+def open_grade_sheet():
+    course_selection = course_table.focus()
+    sem = semester.get()
+    if not course_selection or not sem:
+        messagebox.showwarning("Selection Error", "Please select a course and enter a semester.")
+        return
 
-courses_frame = ttk.Frame(notebook)
-notebook.add(courses_frame, text="Courses")
+    course_id_val = course_table.item(course_selection, 'values')[0]
+    worker.submit(service.grade_sheet, course_id_val, sem,
+                  on_done=lambda sheet: show_grade_sheet(course_id_val, sem, sheet))
 
-course_columns = ("Course ID", "Course Name", "Department", "Credits", "Instructor", "Enrolled Students", "Course Grade")
-course_table = ttk.Treeview(courses_frame, columns=course_columns, show="headings", height=10)
+# One editable grade per enrolled student; Save validates every entry and
+# sends only the changed grades in a single call.
+def show_grade_sheet(course_id_val, sem, sheet):
+    if not sheet:
+        messagebox.showinfo("Enter Grades", f"No students are enrolled in {course_id_val} for semester {sem}.")
+        return
 
-for col in course_columns:
-    course_table.heading(col, text=col)
-    course_table.column(col, anchor='center', width=100)
+    window = tk.Toplevel(root)
+    window.title(f"Grades for {course_id_val}, Semester {sem}")
+    window.geometry("460x600")
+    window.config(bg="#e8f1f5")
+
+    buttons = tk.Frame(window, bg="#e8f1f5")
+    buttons.pack(side="bottom", pady=10)
+    canvas = tk.Canvas(window, bg="#e8f1f5", highlightthickness=0)
+    scrollbar = ttk.Scrollbar(window, orient="vertical", command=canvas.yview)
+    scrollbar.pack(side="right", fill="y")
+    canvas.pack(side="left", fill="both", expand=True)
+    canvas.configure(yscrollcommand=scrollbar.set)
+    grid = tk.Frame(canvas, bg="#e8f1f5")
+    canvas.create_window((0, 0), window=grid, anchor="nw")
+    grid.bind("<Configure>", lambda _: canvas.configure(scrollregion=canvas.bbox("all")))
+
+    tk.Label(grid, text="Student", bg="#e8f1f5", font=("TkDefaultFont", 10, "bold")).grid(row=0, column=0, padx=10, pady=5, sticky='w')
+    tk.Label(grid, text="Grade", bg="#e8f1f5", font=("TkDefaultFont", 10, "bold")).grid(row=0, column=1, padx=10, pady=5)
+    entries = {}
+    for row, enrollment in enumerate(sheet, 1):
+        student = enrollment['student']
+        name = f"{student.get('last_name', '')}, {student.get('first_name', '')}"
+        tk.Label(grid, text=name, bg="#e8f1f5").grid(row=row, column=0, padx=10, pady=2, sticky='w')
+        choice = ttk.Combobox(grid, values=("", *GRADES), width=12)
+        choice.set(enrollment.get('grade') or '')
+        choice.grid(row=row, column=1, padx=10, pady=2)
+        entries[str(enrollment['_id'])] = (name, choice)
+
+    valid = {grade.lower(): grade for grade in GRADES}
+
+    def save():
+        grades, invalid = {}, []
+        for enrollment_id, (name, choice) in entries.items():
+            value = choice.get().strip()
+            if value and value.lower() not in valid:
+                invalid.append(f"{name}: {value}")
+            grades[enrollment_id] = valid.get(value.lower())
+        if invalid:
+            messagebox.showwarning("Input Error", f"Grade must be one of {', '.join(GRADES)}.\n\n" + "\n".join(invalid[:10]),
+                                   parent=window)
+            return
+
+        def done(result):
+            changed, student_ids = result
+            refresh_enrollments(changed)
+            refresh_students(set(student_ids))
+            refresh_courses([course_id_val] if changed else [])
+            window.destroy()
+            messagebox.showinfo("Success", f"Saved {len(changed)} grade changes for {course_id_val}.")
+
+        worker.submit(service.save_grades, course_id_val, sem, grades, on_done=done)
+
+    ttk.Button(buttons, text="Save Grades", command=save).grid(row=0, column=0, padx=5)
+    ttk.Button(buttons, text="Cancel", command=window.destroy).grid(row=0, column=1, padx=5)
+
+# Treeviews allow extended selection, so deletes act on every selected row and
+# fall back to the focused row when nothing is selected.
+def selected_rows(table):
+    selected = table.selection()
+    if selected:
+        return list(selected)
+    return [table.focus()] if table.focus() else []
+
+def rows_where(table, column, value):
+    index = table['columns'].index(column)
+    return [iid for iid in table.get_children() if table.item(iid, 'values')[index] == str(value)]
+
+# The fetch_* functions run on the worker pool and return ascending
+# (sort key, Treeview item id, row values) tuples; everything that touches a
+# widget happens in the on_done callbacks, back on the Tk thread.
+def fetch_students(after=None, before=None, limit=None, match=None, search=None):
+    return [(student['_id'], str(student['_id']), Student.from_doc(student).row())
+            for student in service.list_students(after, before, limit, match, search)]
+
+def fetch_courses(after=None, before=None, limit=None, match=None, search=None):
+    return [(course['course_id'], course['course_id'], Course.from_doc(course).row())
+            for course in service.list_courses(after, before, limit, match, search)]
+
+def fetch_enrollments(after=None, before=None, limit=None, match=None, search=None):
+    return [(enrollment['_id'], str(enrollment['_id']), Enrollment.from_doc(enrollment).row())
+            for enrollment in service.list_enrollments(after, before, limit, match, search)]
+
+def refresh_students(student_ids):
+    ids = [ObjectId(student_id) for student_id in student_ids]
+    if ids:
+        worker.submit(lambda search=student_view.search: fetch_students(match={'_id': {'$in': ids}}, search=search),
+                      on_done=lambda rows: student_view.patch([str(i) for i in ids], rows))
+
+def refresh_courses(course_ids):
+    ids = list(course_ids)
+    if ids:
+        worker.submit(lambda search=course_view.search: fetch_courses(match={'course_id': {'$in': ids}}, search=search),
+                      on_done=lambda rows: course_view.patch(ids, rows))
+
+def refresh_enrollments(enrollment_ids):
+    ids = [ObjectId(enrollment_id) for enrollment_id in enrollment_ids]
+    if ids:
+        worker.submit(lambda search=enrollment_view.search: fetch_enrollments(match={'_id': {'$in': ids}}, search=search),
+                      on_done=lambda rows: enrollment_view.patch([str(i) for i in ids], rows))
+
+# Live updates: ChangeBatcher calls apply_changes on the Tk thread once per
+# frame with the latest change for each document other windows (or this one)
+# wrote. Rows on screen are patched in place; nothing else is reloaded.
+def apply_changes(changes):
+    if changes[0]['op'] == 'reset':
+        load_all()
+        return
+    grouped = {'students': [], 'courses': [], 'enrollments': []}
+    for change in changes:
+        grouped[change['collection']].append(change)
+
+    patch_table(student_view, grouped['students'], '_id', lambda doc: Student.from_doc(doc).row(), refresh_students)
+    if any(change['op'] == 'delete' for change in grouped['courses']):
+        # Course rows are keyed by course_id but delete events only carry the _id.
+        reload_table(course_view)
+    else:
+        patch_table(course_view, grouped['courses'], 'course_id', lambda doc: Course.from_doc(doc).row(),
+                    refresh_courses)
+    # Enrollment rows need the joined names, so they are fetched again.
+    patch_table(enrollment_view, grouped['enrollments'], '_id', None, refresh_enrollments)
+    renamed_enrollments(grouped['students'], grouped['courses'])
+
+def patch_table(view, changes, key_field, row, refresh):
+    if not changes or table_stale(view):
+        return
+    if len(changes) > LIVE_RELOAD_AT:
+        reload_table(view)
+        return
+    view.remove([str(change['key']) for change in changes if change['op'] == 'delete'])
+    docs = [change['doc'] for change in changes if change['op'] != 'delete' and change['doc'] is not None]
+    if view.search or row is None:
+        # The server applies the search, so rows that no longer match drop out.
+        refresh([doc[key_field] for doc in docs])
+    else:
+        for doc in docs:
+            view.upsert(doc[key_field], str(doc[key_field]), row(doc))
+
+def renamed_enrollments(student_changes, course_changes):
+    names = {str(change['doc']['_id']): f"{change['doc'].get('first_name', '')} {change['doc'].get('last_name', '')}"
+             for change in student_changes if change['doc'] is not None}
+    titles = {change['doc']['course_id']: change['doc'].get('course_name', '')
+              for change in course_changes if change['doc'] is not None}
+    if not names and not titles:
+        return
+    stale_rows = []
+    for iid in enrollment_table.get_children():
+        values = enrollment_table.item(iid, 'values')
+        if names.get(values[1], values[6]) != values[6] or titles.get(values[2], values[7]) != values[7]:
+            stale_rows.append(iid)
+    refresh_enrollments(stale_rows)
 
-course_table.pack(fill="both", expand=True, padx=20, pady=10)
+def table_frame(view):
+    return next(frame for frame, (_, tab_view) in tab_views.items() if tab_view is view)
 
-course_input_frame = tk.Frame(courses_frame, bg="#e8f1f5")
-course_input_frame.pack(pady=10)
+def table_stale(view):
+    return table_frame(view) in stale
 
-course_fields = [
-    ("Course ID:", "course_id"),
-    ("Course Name:", "course_name"),
-    ("Department:", "department"),
-    ("Credits:", "credits"),
-    ("Instructor:", "instructor")
-]
+def reload_table(view):
+    # Reloads now if the table is on screen, otherwise when its tab is next shown.
+    stale.add(table_frame(view))
+    load_visible()
 
-for i, (label_text, entry_name) in enumerate(course_fields):
-    row = i // 2
-    col = (i % 2) * 2
-    
-    tk.Label(course_input_frame, text=label_text, bg="#e8f1f5").grid(row=row, column=col, padx=5, pady=5, sticky='w')
-    globals()[entry_name] = ttk.Entry(course_input_frame, width=20)
-    globals()[entry_name].grid(row=row, column=col+1, padx=5, pady=5)
+def load_students():
+    student_view.reload()
 
-course_buttons_frame = tk.Frame(courses_frame, bg="#e8f1f5")
-course_buttons_frame.pack(pady=10)
+def load_courses():
+    course_view.reload()
 
-ttk.Button(course_buttons_frame, text="Add Course", command=add_course).grid(row=0, column=0, padx=5)
-ttk.Button(course_buttons_frame, text="Update Course", command=update_course).grid(row=0, column=1, padx=5)
-ttk.Button(course_buttons_frame, text="Delete Course", command=delete_course).grid(row=0, column=2, padx=5)
-ttk.Button(course_buttons_frame, text="Clear Fields", command=clear_fields).grid(row=0, column=3, padx=5)
+def load_enrollments():
+    enrollment_view.reload()
+
+def import_records(collection):
+    path = filedialog.askopenfilename(
+        title=f"Import {collection.title()}",
+        filetypes=[("CSV or Extended JSON", "*.csv *.json *.jsonl"), ("All files", "*.*")]
+    )
+    if not path:
+        return
 
-enrollments_frame = ttk.Frame(notebook)
-notebook.add(enrollments_frame, text="Enrollments")
+    def done(report):
+        load_all()
+        if report['failed']:
+            messagebox.showwarning("Import Finished With Errors", format_report(report))
+        elif report['warnings']:
+            messagebox.showwarning("Import Finished With Warnings", format_report(report))
+        else:
+            messagebox.showinfo("Import Finished", format_report(report))
+
+    worker.submit(service.import_records, collection, path, on_done=done)
+
+def export_records(collection):
+    path = filedialog.asksaveasfilename(
+        title=f"Export {collection.title()}",
+        defaultextension=".csv",
+        filetypes=[("CSV", "*.csv"), ("Extended JSON", "*.json")]
+    )
+    if not path:
+        return
+    worker.submit(service.export_records, collection, path,
+                  on_done=lambda count: messagebox.showinfo("Export Finished", f"Exported {count} {collection} to {path}."))
 
-enrollment_columns = ("Enrollment ID", "Student ID", "Course ID", "Semester", "Enrollment Date", "Grade", "Student Name", "Course Name")
-enrollment_table = ttk.Treeview(enrollments_frame, columns=enrollment_columns, show="headings", height=10)
+def archive_term():
+    sem = simpledialog.askstring("Archive Semester", "Semester to close and archive:")
+    if not sem:
+        return
+    if messagebox.askyesno("Confirm Archive", f"Archive semester {sem}? Its enrollments move to the archive and can no longer be added or regraded."):
+        def done(count):
+            load_enrollments()
+            messagebox.showinfo("Archive Finished", f"Archived {count} enrollments from semester {sem}.")
 
-for col in enrollment_columns:
-    enrollment_table.heading(col, text=col)
-    enrollment_table.column(col, anchor='center', width=100)
-enrollment_table.pack(fill="both", expand=True, padx=20, pady=10)
-enrollment_input_frame = tk.Frame(enrollments_frame, bg="#e8f1f5")
-enrollment_input_frame.pack(pady=10)
+        worker.submit(service.archive_semester, sem, on_done=done)
 
-tk.Label(enrollment_input_frame, text="Semester:", bg="#e8f1f5").grid(row=0, column=0, padx=5, pady=5, sticky='w')
-semester = ttk.Entry(enrollment_input_frame, width=20)
-semester.grid(row=0, column=1, padx=5, pady=5)
+def on_closing():
+    worker.shutdown()
+    if settings['row_snapshot']:
+        try:
+            save_rows(settings['row_snapshot'], settings['db'],
+                      {title: view.first_page() for title, view in tab_views.values()})
+        except OSError as err:
+            logging.warning("Could not save the row snapshot: %s", err)
+    service.close()
+    root.destroy()
 
-enrollment_buttons_frame = tk.Frame(enrollments_frame, bg="#e8f1f5")
-enrollment_buttons_frame.pack(pady=10)
+def mark_startup(milestone):
+    if milestone not in startup:
+        startup[milestone] = round((time.perf_counter() - startup['started']) * 1000)
+        logging.info("Startup: %s after %s ms", milestone, startup[milestone])
+
+def startup_text():
+    milestones = [f"{name} {ms} ms" for name, ms in startup.items() if name != 'started']
+    return f"Startup: {', '.join(milestones)}." if milestones else ""
+
+def update_status():
+    stats = service.connection_stats()
+    if not stats or stats['healthy'] is None:
+        text = "Connecting to MongoDB..."
+    elif stats['healthy']:
+        text = (f"Connected  |  heartbeat {stats['latency_ms']} ms (median {stats['median_latency_ms']} ms)  |  "
+                f"{stats['checked_out']} of {stats['open']} connections in use")
+    else:
+        text = f"MongoDB unreachable: {stats['last_error']}"
+    if stats and stats.get('queued'):
+        text += f"  |  {stats['queued']} offline changes waiting to sync"
+    status_label.config(text=text)
+    root.after(STATUS_INTERVAL_MS, update_status)
+
+def sync_offline(full=False):
+    worker.submit(service.sync, full, key='sync', on_done=sync_done)
+
+def sync_done(report):
+    if report['conflicts']:
+        details = "\n".join(f"{op}: {reason}" for op, reason in report['conflicts'])
+        messagebox.showwarning("Sync Conflicts",
+                               f"{len(report['conflicts'])} offline changes were not applied:\n\n{details}")
+    if report['applied'] or report['conflicts']:
+        # The tables showed the offline edits; reload them as the server has them.
+        load_all()
+
+def schedule_sync():
+    sync_offline()
+    root.after(SYNC_INTERVAL_MS, schedule_sync)
+
+# The launch sync also reads every key to find deletions made while the app
+# was closed, so it waits until the first table is on screen instead of
+# competing with its page for the worker pool.
+def start_sync():
+    global sync_started
+    if settings['offline_cache'] and not sync_started:
+        sync_started = True
+        sync_offline(full=True)
+        root.after(SYNC_INTERVAL_MS, schedule_sync)
+
+def refresh_diagnostics():
+    recorder = service.recorder
+    records = recorder.snapshot()
+    summary_table.delete(*summary_table.get_children())
+    for row in recorder.summary(records):
+        summary_table.insert("", "end", iid=f"{row['command']} {row['collection']}", values=(
+            row['command'], row['collection'] or '', row['calls'], row['errors'], row['docs'],
+            row['mean_ms'], row['p50_ms'], row['p95_ms'], row['max_ms']))
+    slow_table.delete(*slow_table.get_children())
+    for record in recorder.slowest(SLOWEST_SHOWN, records):
+        explained = record.get('explain') or {}
+        slow_table.insert("", "end", iid=str(record['id']), values=(
+            time.strftime('%H:%M:%S', time.localtime(record['time'])), record['command'], record['collection'] or '',
+            round(record['duration_ms'], 2), '' if record['docs'] is None else record['docs'],
+            explained.get('docs_examined', ''), explained.get('keys_examined', ''),
+            ' '.join(explained.get('stages', ())), record['error'] or ''))
+    slow = sum(1 for record in records if record['duration_ms'] >= SLOW_MS)
+    diagnostics_label.config(text=f"{len(records)} commands recorded, {slow} took {SLOW_MS} ms or longer.  "
+                                  f"{startup_text()}")
+
+def explain_selected():
+    selected = slow_table.focus()
+    if not selected:
+        messagebox.showwarning("Selection Error", "Please select a command to explain.")
+        return
+    worker.submit(service.explain_command, int(selected), on_done=lambda _: refresh_diagnostics())
+
+def export_diagnostics():
+    path = filedialog.asksaveasfilename(
+        title="Export Diagnostics",
+        defaultextension=".json",
+        filetypes=[("JSON", "*.json")]
+    )
+    if not path:
+        return
+    worker.submit(service.export_diagnostics, path,
+                  on_done=lambda count: messagebox.showinfo("Export Finished", f"Exported {count} commands to {path}."))
+
+def clear_diagnostics():
+    service.recorder.clear()
+    refresh_diagnostics()
+
+# The Diagnostics tab stays hidden until toggled from the View menu or with
+# Ctrl+Shift+D.
+def toggle_diagnostics(_=None):
+    if str(notebook.tab(diagnostics_frame, 'state')) == 'hidden':
+        notebook.tab(diagnostics_frame, state='normal')
+        notebook.select(diagnostics_frame)
+        refresh_diagnostics()
+    else:
+        notebook.tab(diagnostics_frame, state='hidden')
 
-ttk.Button(enrollment_buttons_frame, text="Add Enrollment", command=add_enrollment).grid(row=0, column=0, padx=5)
-ttk.Button(enrollment_buttons_frame, text="Update Enrollment", command=update_enrollment).grid(row=0, column=1, padx=5)
-ttk.Button(enrollment_buttons_frame, text="Delete Enrollment", command=delete_enrollment).grid(row=0, column=2, padx=5)
-ttk.Button(enrollment_buttons_frame, text="Clear Fields", command=clear_fields).grid(row=0, column=3, padx=5)
+def show_analytics(_=None):
+    if snapshot is None:
+        return
+    analytics_table.delete(*analytics_table.get_children())
+    for label, enrolled, mean, *counts in snapshot.report(analytics.GROUPINGS[group_by.get()]):
+        analytics_table.insert("", "end", values=(label, enrolled, format_average(mean), *counts))
+    analytics_label.config(text=f"{len(snapshot)} enrollments loaded in {snapshot.load_ms:.0f} ms at "
+                                f"{time.strftime('%H:%M:%S', time.localtime(snapshot.loaded_at))}.")
+
+def load_analytics():
+    def done(result):
+        global snapshot
+        snapshot = result
+        show_analytics()
+
+    analytics_label.config(text="Loading enrollments...")
+    worker.submit(service.analytics_snapshot, key='analytics', on_done=done)
+
+# Grade reports are computed from an in-memory snapshot of every enrollment,
+# archived terms included; switching the grouping reuses it, and Refresh
+# Snapshot reloads it.
+def build_analytics_tab():
+    global analytics_label, analytics_table, group_by
+
+    analytics_frame = ttk.Frame(notebook)
+    notebook.add(analytics_frame, text="Grade Analytics")
+
+    if not analytics.available():
+        tk.Label(analytics_frame, text="Install NumPy (pip install numpy) to enable grade analytics.").pack(pady=20)
+        return
 
-def on_closing():
-    if db.is_connected():
-        cursor.close()
-        db.close()
-    root.destroy()
+    analytics_controls = tk.Frame(analytics_frame, bg="#e8f1f5")
+    analytics_controls.pack(fill="x", padx=20, pady=(10, 0))
+    tk.Label(analytics_controls, text="Group by:", bg="#e8f1f5").pack(side="left", padx=5, pady=5)
+    group_by = ttk.Combobox(analytics_controls, values=list(analytics.GROUPINGS), state="readonly", width=14)
+    group_by.current(0)
+    group_by.pack(side="left", padx=5, pady=5)
+    group_by.bind("<<ComboboxSelected>>", show_analytics)
+    ttk.Button(analytics_controls, text="Refresh Snapshot", command=load_analytics).pack(side="left", padx=5, pady=5)
+    analytics_label = tk.Label(analytics_controls, text="No snapshot loaded.", bg="#e8f1f5")
+    analytics_label.pack(side="left", padx=5, pady=5)
+
+    analytics_columns = ("Group", "Enrolled", "Average", *analytics.GRADE_LABELS)
+    analytics_table_frame = ttk.Frame(analytics_frame)
+    analytics_table_frame.pack(fill="both", expand=True, padx=20, pady=10)
+    analytics_table = ttk.Treeview(analytics_table_frame, columns=analytics_columns, show="headings", height=10)
+    for col in analytics_columns:
+        analytics_table.heading(col, text=col)
+        analytics_table.column(col, anchor='center', width=90)
+    analytics_scrollbar = ttk.Scrollbar(analytics_table_frame, orient="vertical", command=analytics_table.yview)
+    analytics_scrollbar.pack(side="right", fill="y")
+    analytics_table.configure(yscrollcommand=analytics_scrollbar.set)
+    analytics_table.pack(side="left", fill="both", expand=True)
+
+def build_diagnostics_tab():
+    global diagnostics_frame, diagnostics_label, summary_table, slow_table
+
+    diagnostics_frame = ttk.Frame(notebook)
+    notebook.add(diagnostics_frame, text="Diagnostics", state="hidden")
+
+    diagnostics_label = tk.Label(diagnostics_frame, text="", anchor="w")
+    diagnostics_label.pack(fill="x", padx=20, pady=(10, 0))
+
+    summary_columns = ("Command", "Collection", "Calls", "Errors", "Docs", "Mean ms", "p50 ms", "p95 ms", "Max ms")
+    summary_table = ttk.Treeview(diagnostics_frame, columns=summary_columns, show="headings", height=8)
+    for col in summary_columns:
+        summary_table.heading(col, text=col)
+        summary_table.column(col, anchor='center', width=90)
+    summary_table.pack(fill="both", expand=True, padx=20, pady=10)
+
+    slow_columns = ("Time", "Command", "Collection", "ms", "Docs", "Docs Examined", "Keys Examined", "Plan", "Error")
+    slow_table = ttk.Treeview(diagnostics_frame, columns=slow_columns, show="headings", height=8)
+    for col in slow_columns:
+        slow_table.heading(col, text=col)
+        slow_table.column(col, anchor='center', width=90)
+    slow_table.pack(fill="both", expand=True, padx=20, pady=10)
+
+    diagnostics_buttons_frame = tk.Frame(diagnostics_frame, bg="#e8f1f5")
+    diagnostics_buttons_frame.pack(pady=10)
+
+    ttk.Button(diagnostics_buttons_frame, text="Refresh", command=refresh_diagnostics).grid(row=0, column=0, padx=5)
+    ttk.Button(diagnostics_buttons_frame, text="Explain Selected", command=explain_selected).grid(row=0, column=1, padx=5)
+    ttk.Button(diagnostics_buttons_frame, text="Export JSON...", command=export_diagnostics).grid(row=0, column=2, padx=5)
+    ttk.Button(diagnostics_buttons_frame, text="Clear", command=clear_diagnostics).grid(row=0, column=3, padx=5)
+
+def build_search_bar(parent, collection, view, before, history=False):
+    fields = dict(SEARCH_FIELDS[collection])
+    frame = tk.Frame(parent, bg="#e8f1f5")
+    frame.pack(fill="x", padx=20, pady=(10, 0), before=before)
+
+    tk.Label(frame, text="Search:", bg="#e8f1f5").pack(side="left", padx=5, pady=5)
+    field = ttk.Combobox(frame, values=list(fields), state="readonly", width=14)
+    field.current(0)
+    field.pack(side="left", padx=5, pady=5)
+    text = ttk.Entry(frame, width=30)
+    text.pack(side="left", padx=5, pady=5)
+    pending = []
+    include_archived = tk.BooleanVar(value=False)
+
+    def apply():
+        pending.clear()
+        value = text.get().strip()
+        search = {fields[field.get()]: value} if value else {}
+        if include_archived.get():
+            search['history'] = True
+        search = search or None
+        if search != view.search:
+            view.set_search(search)
+
+    def schedule(event=None):
+        if pending:
+            root.after_cancel(pending.pop())
+        pending.append(root.after(SEARCH_DELAY_MS, apply))
+
+    def clear():
+        text.delete(0, tk.END)
+        schedule()
+
+    text.bind("<KeyRelease>", schedule)
+    field.bind("<<ComboboxSelected>>", schedule)
+    ttk.Button(frame, text="Clear", command=clear).pack(side="left", padx=5, pady=5)
+    if history:
+        ttk.Checkbutton(frame, text="Include archived terms", variable=include_archived,
+                        command=schedule).pack(side="left", padx=5, pady=5)
+
+def load_all(_=None):
+    stale.update(str(frame) for frame in tab_views)
+    load_visible()
+
+def load_visible(_=None):
+    selected = notebook.select()
+    if selected in stale:
+        stale.discard(selected)
+        tab_views[selected][1].reload()
+
+def add_table_tab(frame, title, view):
+    tab_views[str(frame)] = (title, view)
+    stale.add(str(frame))
+
+def loading_indicator(frame, title):
+    def show(busy):
+        notebook.tab(frame, text=f"{title} (loading...)" if busy else title)
+        if not busy:
+            mark_startup(f"{title.lower()} loaded")
+            start_sync()
+    return show
+
+def paint_snapshot():
+    rows = load_rows(settings['row_snapshot'], settings['db'])
+    for title, view in tab_views.values():
+        if rows.get(title):
+            view.paint(rows[title])
+    if rows:
+        mark_startup("snapshot painted")
+
+def build_ui():
+    global notebook, semester, status_label
+    global student_table, student_view, course_table, course_view, enrollment_table, enrollment_view
+
+    status_label = tk.Label(root, text="Connecting to MongoDB...", anchor="w", bg="#f7f9fc", fg="#555555")
+    status_label.pack(side="bottom", fill="x", padx=10, pady=2)
+
+    notebook = ttk.Notebook(root)
+    notebook.pack(fill="both", expand=True)
+
+    students_frame = ttk.Frame(notebook)
+    notebook.add(students_frame, text="Students")
+
+    student_columns = ("ID", "First Name", "Last Name", "Email", "Date of Birth", "Major", "Total Courses", "GWA")
+    student_table_frame = ttk.Frame(students_frame)
+    student_table_frame.pack(fill="both", expand=True, padx=20, pady=10)
+    student_table = ttk.Treeview(student_table_frame, columns=student_columns, show="headings", height=10)
+
+    for col in student_columns:
+        student_table.heading(col, text=col)
+        student_table.column(col, anchor='center', width=100)
+
+    student_scrollbar = ttk.Scrollbar(student_table_frame, orient="vertical")
+    student_scrollbar.pack(side="right", fill="y")
+    student_table.pack(side="left", fill="both", expand=True)
+    student_view = PagedTable(student_table, student_scrollbar, worker, fetch_students,
+                              on_loading=loading_indicator(students_frame, "Students"), key='load_students')
+    add_table_tab(students_frame, "Students", student_view)
+    build_search_bar(students_frame, 'students', student_view, student_table_frame)
+
+    student_input_frame = tk.Frame(students_frame, bg="#e8f1f5")
+    student_input_frame.pack(pady=10)
+
+    student_fields = [
+        ("First Name:", "first_name"),
+        ("Last Name:", "last_name"),
+        ("Email:", "email"),
+        ("Date of Birth (YYYY-MM-DD):", "dob"),
+        ("Major:", "major")
+    ]
 
-load_students()
-load_courses()
-load_enrollments()
+    for i, (label_text, entry_name) in enumerate(student_fields):
+        row = i // 2
+        col = (i % 2) * 2
+    
+        tk.Label(student_input_frame, text=label_text, bg="#e8f1f5").grid(row=row, column=col, padx=5, pady=5, sticky='w')
+        globals()[entry_name] = ttk.Entry(student_input_frame, width=20)
+        globals()[entry_name].grid(row=row, column=col+1, padx=5, pady=5)
+
+    student_buttons_frame = tk.Frame(students_frame, bg="#e8f1f5")
+    student_buttons_frame.pack(pady=10)
+
+    ttk.Button(student_buttons_frame, text="Add Student", command=add_student).grid(row=0, column=0, padx=5)
+    ttk.Button(student_buttons_frame, text="Update Student", command=update_student).grid(row=0, column=1, padx=5)
+    ttk.Button(student_buttons_frame, text="Delete Student", command=delete_student).grid(row=0, column=2, padx=5)
+    ttk.Button(student_buttons_frame, text="Clear Fields", command=clear_fields).grid(row=0, column=3, padx=5)
+
+    courses_frame = ttk.Frame(notebook)
+    notebook.add(courses_frame, text="Courses")
+
+    course_columns = ("Course ID", "Course Name", "Department", "Credits", "Instructor", "Enrolled Students", "Course Grade")
+    course_table_frame = ttk.Frame(courses_frame)
+    course_table_frame.pack(fill="both", expand=True, padx=20, pady=10)
+    course_table = ttk.Treeview(course_table_frame, columns=course_columns, show="headings", height=10)
+
+    for col in course_columns:
+        course_table.heading(col, text=col)
+        course_table.column(col, anchor='center', width=100)
+
+    course_scrollbar = ttk.Scrollbar(course_table_frame, orient="vertical")
+    course_scrollbar.pack(side="right", fill="y")
+    course_table.pack(side="left", fill="both", expand=True)
+    course_view = PagedTable(course_table, course_scrollbar, worker, fetch_courses,
+                             on_loading=loading_indicator(courses_frame, "Courses"), key='load_courses')
+    add_table_tab(courses_frame, "Courses", course_view)
+    build_search_bar(courses_frame, 'courses', course_view, course_table_frame)
+
+    course_input_frame = tk.Frame(courses_frame, bg="#e8f1f5")
+    course_input_frame.pack(pady=10)
+
+    course_fields = [
+        ("Course ID:", "course_id"),
+        ("Course Name:", "course_name"),
+        ("Department:", "department"),
+        ("Credits:", "credits"),
+        ("Instructor:", "instructor")
+    ]
 
-root.mainloop()
\ No newline at end of file
+    for i, (label_text, entry_name) in enumerate(course_fields):
+        row = i // 2
+        col = (i % 2) * 2
+    
+        tk.Label(course_input_frame, text=label_text, bg="#e8f1f5").grid(row=row, column=col, padx=5, pady=5, sticky='w')
+        globals()[entry_name] = ttk.Entry(course_input_frame, width=20)
+        globals()[entry_name].grid(row=row, column=col+1, padx=5, pady=5)
+
+    course_buttons_frame = tk.Frame(courses_frame, bg="#e8f1f5")
+    course_buttons_frame.pack(pady=10)
+
+    ttk.Button(course_buttons_frame, text="Add Course", command=add_course).grid(row=0, column=0, padx=5)
+    ttk.Button(course_buttons_frame, text="Update Course", command=update_course).grid(row=0, column=1, padx=5)
+    ttk.Button(course_buttons_frame, text="Delete Course", command=delete_course).grid(row=0, column=2, padx=5)
+    ttk.Button(course_buttons_frame, text="Clear Fields", command=clear_fields).grid(row=0, column=3, padx=5)
+
+    enrollments_frame = ttk.Frame(notebook)
+    notebook.add(enrollments_frame, text="Enrollments")
+
+    enrollment_columns = ("Enrollment ID", "Student ID", "Course ID", "Semester", "Enrollment Date", "Grade", "Student Name", "Course Name")
+    enrollment_table_frame = ttk.Frame(enrollments_frame)
+    enrollment_table_frame.pack(fill="both", expand=True, padx=20, pady=10)
+    enrollment_table = ttk.Treeview(enrollment_table_frame, columns=enrollment_columns, show="headings", height=10)
+
+    for col in enrollment_columns:
+        enrollment_table.heading(col, text=col)
+        enrollment_table.column(col, anchor='center', width=100)
+    enrollment_scrollbar = ttk.Scrollbar(enrollment_table_frame, orient="vertical")
+    enrollment_scrollbar.pack(side="right", fill="y")
+    enrollment_table.pack(side="left", fill="both", expand=True)
+    enrollment_view = PagedTable(enrollment_table, enrollment_scrollbar, worker, fetch_enrollments,
+                                 on_loading=loading_indicator(enrollments_frame, "Enrollments"), key='load_enrollments')
+    add_table_tab(enrollments_frame, "Enrollments", enrollment_view)
+    build_search_bar(enrollments_frame, 'enrollments', enrollment_view, enrollment_table_frame, history=True)
+    enrollment_input_frame = tk.Frame(enrollments_frame, bg="#e8f1f5")
+    enrollment_input_frame.pack(pady=10)
+
+    tk.Label(enrollment_input_frame, text="Semester:", bg="#e8f1f5").grid(row=0, column=0, padx=5, pady=5, sticky='w')
+    semester = ttk.Entry(enrollment_input_frame, width=20)
+    semester.grid(row=0, column=1, padx=5, pady=5)
+
+    enrollment_buttons_frame = tk.Frame(enrollments_frame, bg="#e8f1f5")
+    enrollment_buttons_frame.pack(pady=10)
+
+    ttk.Button(enrollment_buttons_frame, text="Add Enrollment", command=add_enrollment).grid(row=0, column=0, padx=5)
+    ttk.Button(enrollment_buttons_frame, text="Update Enrollment", command=update_enrollment).grid(row=0, column=1, padx=5)
+    ttk.Button(enrollment_buttons_frame, text="Delete Enrollment", command=delete_enrollment).grid(row=0, column=2, padx=5)
+    ttk.Button(enrollment_buttons_frame, text="Enter Grades", command=open_grade_sheet).grid(row=0, column=3, padx=5)
+    ttk.Button(enrollment_buttons_frame, text="Clear Fields", command=clear_fields).grid(row=0, column=4, padx=5)
+
+    build_analytics_tab()
+    build_diagnostics_tab()
+    notebook.bind("<<NotebookTabChanged>>", load_visible)
+
+    menubar = tk.Menu(root)
+    file_menu = tk.Menu(menubar, tearoff=0)
+    for collection in ('students', 'courses', 'enrollments'):
+        file_menu.add_command(label=f"Import {collection.title()}...", command=lambda c=collection: import_records(c))
+    file_menu.add_separator()
+    for collection in ('students', 'courses', 'enrollments'):
+        file_menu.add_command(label=f"Export {collection.title()}...", command=lambda c=collection: export_records(c))
+    file_menu.add_separator()
+    file_menu.add_command(label="Archive Semester...", command=archive_term)
+    menubar.add_cascade(label="File", menu=file_menu)
+    view_menu = tk.Menu(menubar, tearoff=0)
+    view_menu.add_command(label="Diagnostics", accelerator="Ctrl+Shift+D", command=toggle_diagnostics)
+    menubar.add_cascade(label="View", menu=view_menu)
+    root.config(menu=menubar)
+    root.bind_all("<Control-Shift-D>", toggle_diagnostics)
+
+def main():
+    global root, worker, service, settings
+    startup['started'] = time.perf_counter()
+    logging.basicConfig(format='%(levelname)s %(name)s: %(message)s')
+    settings = load_settings()
+
+    root = tk.Tk()
+    root.title("Enrollment Management System")
+    root.geometry("1200x700")
+    root.config(bg="#f7f9fc")
+    root.protocol("WM_DELETE_WINDOW", on_closing)
+
+    worker = Worker(root, on_error=database_error)
+    build_ui()
+    if settings['row_snapshot']:
+        paint_snapshot()
+    visible = notebook.select()
+    notebook.tab(visible, text=f"{tab_views[visible][0]} (loading...)")
+    root.after_idle(mark_startup, "window drawn")
+
+    # The client connects on its first operation, which runs on the worker pool,
+    # so the window is drawn before the server has answered. Only the visible
+    # tab is loaded; the others load when first selected.
+    service = EnrollmentService.connect()
+    cache_path = settings['offline_cache']
+    if cache_path:
+        service = OfflineService(service, LocalMirror(cache_path))
+    update_status()
+    worker.submit(service.prepare, on_done=load_all)
+    service.watch(ChangeBatcher(root, apply_changes).push)
+    worker.submit(service.report_collection_scans, on_error=lambda err: logging.warning("Index check failed: %s", err))
+
+    root.mainloop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+import argparse
+import csv
+import json
+import os
+from datetime import datetime
+
+from bson import json_util
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError
+
+from connection import connect
+from models import parse_date
+from stats import COURSE_FIELDS, GRADES, STUDENT_FIELDS, empty_stats, rebuild_stats
+
+CHUNK_SIZE = 1000
+READ_SIZE = 64 * 1024
+MAX_REPORTED_ERRORS = 1000
+
+EXPORT_FIELDS = {
+    'students': ('_id', 'first_name', 'last_name', 'email', 'date_of_birth', 'major', 'enrollment_date'),
+    'courses': ('_id', 'course_id', 'course_name', 'department', 'credits', 'instructor'),
+    'enrollments': ('_id', 'student_id', 'course_id', 'semester', 'enrollment_date', 'grade'),
+}
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.json', '.jsonl', '.ndjson'):
+        return 'json'
+    raise ValueError(f"Cannot tell the format of {path}; use csv or json.")
+
+def iter_csv(handle):
+    for row in csv.DictReader(handle):
+        yield {field: value.strip() for field, value in row.items() if field is not None and value is not None}
+
+def iter_json(handle):
+    decoder = json.JSONDecoder(object_hook=json_util.object_hook)
+    buffer = handle.read(READ_SIZE).lstrip()
+    if not buffer.startswith('['):
+        # One Extended JSON document per line, as written by plain mongoexport.
+        for line in _lines(buffer, handle):
+            if line.strip():
+                yield decoder.decode(line)
+        return
+    buffer = buffer[1:]
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if buffer.startswith(','):
+            buffer = buffer[1:].lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            doc, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more = handle.read(READ_SIZE)
+            eof = not more
+            buffer += more
+            continue
+        yield doc
+        buffer = buffer[end:]
+
+def _lines(head, handle):
+    pending = head
+    while True:
+        more = handle.read(READ_SIZE)
+        pending += more
+        lines = pending.split('\n')
+        pending = lines.pop()
+        yield from lines
+        if not more:
+            yield pending
+            return
+
+def required(row, *fields):
+    missing = [field for field in fields if not row.get(field)]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+
+def object_id(value):
+    if isinstance(value, ObjectId):
+        return value
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise ValueError(f"invalid ObjectId {value!r}")
+
+def timestamp(value):
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return datetime.now()
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"invalid date {value!r}")
+
+def with_id(row, doc):
+    if row.get('_id'):
+        doc['_id'] = object_id(row['_id'])
+    return doc
+
+# Cleaners append problems that do not reject the row to ``warnings``.
+def clean_student(row, warnings):
+    required(row, 'first_name', 'last_name', 'email')
+    try:
+        date_of_birth = parse_date(row.get('date_of_birth'))
+    except ValueError as err:
+        # Like schema.migrate_dates, keep the student and leave the date for a
+        # person to fix; the validator only accepts a date or null.
+        warnings.append(f"{err} Imported without a date of birth.")
+        date_of_birth = None
+    return with_id(row, {
+        'first_name': row['first_name'],
+        'last_name': row['last_name'],
+        'email': row['email'],
+        'date_of_birth': date_of_birth,
+        'major': row.get('major', ''),
+        'enrollment_date': timestamp(row.get('enrollment_date')),
+        **empty_stats(STUDENT_FIELDS)
+    })
+
+def clean_course(row, warnings):
+    required(row, 'course_id', 'course_name', 'department', 'credits')
+    try:
+        credits = int(row['credits'])
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid credits {row['credits']!r}")
+    return with_id(row, {
+        'course_id': row['course_id'],
+        'course_name': row['course_name'],
+        'department': row['department'],
+        'credits': credits,
+        'instructor': row.get('instructor', ''),
+        **empty_stats(COURSE_FIELDS)
+    })
+
+def clean_enrollment(row, warnings):
+    required(row, 'student_id', 'course_id', 'semester')
+    grade = row.get('grade') or None
+    if grade is not None and grade not in GRADES:
+        raise ValueError(f"invalid grade {grade!r}")
+    return with_id(row, {
+        'student_id': object_id(row['student_id']),
+        'course_id': row['course_id'],
+        'semester': str(row['semester']),
+        'enrollment_date': timestamp(row.get('enrollment_date')),
+        'grade': grade
+    })
+
+CLEANERS = {
+    'students': clean_student,
+    'courses': clean_course,
+    'enrollments': clean_enrollment,
+}
+
+def missing_references(db, batch):
+    student_ids = {doc['student_id'] for _, doc in batch}
+    course_ids = {doc['course_id'] for _, doc in batch}
+    known_students = {doc['_id'] for doc in db['students'].find({'_id': {'$in': list(student_ids)}}, {'_id': 1})}
+    known_courses = {doc['course_id'] for doc in db['courses'].find({'course_id': {'$in': list(course_ids)}}, {'course_id': 1})}
+    errors = {}
+    for row_number, doc in batch:
+        if doc['student_id'] not in known_students:
+            errors[row_number] = f"unknown student {doc['student_id']}"
+        elif doc['course_id'] not in known_courses:
+            errors[row_number] = f"unknown course {doc['course_id']}"
+    return errors
+
+def write_batch(db, collection, batch, report):
+    if collection == 'enrollments':
+        rejected = missing_references(db, batch)
+        for row_number, message in rejected.items():
+            add_error(report, row_number, message)
+        batch = [(row_number, doc) for row_number, doc in batch if row_number not in rejected]
+    if not batch:
+        return
+    now = datetime.now()
+    for _, doc in batch:
+        doc['updated_at'] = now
+    try:
+        result = db[collection].insert_many([doc for _, doc in batch], ordered=False)
+        inserted = result.inserted_ids
+    except BulkWriteError as err:
+        failed = {error['index'] for error in err.details['writeErrors']}
+        for error in err.details['writeErrors']:
+            add_error(report, batch[error['index']][0], error['errmsg'])
+        inserted = [doc['_id'] for index, (_, doc) in enumerate(batch) if index not in failed]
+    report['inserted'] += len(inserted)
+    if collection == 'enrollments':
+        inserted = set(inserted)
+        report['student_ids'].update(doc['student_id'] for _, doc in batch if doc['_id'] in inserted)
+        report['course_ids'].update(doc['course_id'] for _, doc in batch if doc['_id'] in inserted)
+
+def add_error(report, row_number, message):
+    report['failed'] += 1
+    if len(report['errors']) < MAX_REPORTED_ERRORS:
+        report['errors'].append((row_number, message))
+
+def add_warning(report, row_number, message):
+    if len(report['warnings']) < MAX_REPORTED_ERRORS:
+        report['warnings'].append((row_number, message))
+
+def import_file(db, collection, path, fmt=None, chunk_size=CHUNK_SIZE):
+    clean = CLEANERS[collection]
+    reader = iter_csv if detect_format(path, fmt) == 'csv' else iter_json
+    report = {'inserted': 0, 'failed': 0, 'errors': [], 'warnings': [], 'student_ids': set(), 'course_ids': set()}
+    batch = []
+    with open(path, newline='', encoding='utf-8') as handle:
+        for row_number, row in enumerate(reader(handle), start=1):
+            warnings = []
+            try:
+                doc = clean(row, warnings)
+            except ValueError as err:
+                add_error(report, row_number, str(err))
+                continue
+            for message in warnings:
+                add_warning(report, row_number, message)
+            doc.setdefault('_id', ObjectId())
+            batch.append((row_number, doc))
+            if len(batch) >= chunk_size:
+                write_batch(db, collection, batch, report)
+                batch = []
+    if batch:
+        write_batch(db, collection, batch, report)
+    if report['student_ids'] or report['course_ids']:
+        rebuild_stats(db, report['student_ids'], report['course_ids'])
+    return report
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def export_collection(db, collection, path, fmt=None, batch_size=CHUNK_SIZE):
+    fmt = detect_format(path, fmt)
+    count = 0
+    cursor = db[collection].find({}, batch_size=batch_size).sort('_id', 1)
+    with open(path, 'w', newline='', encoding='utf-8') as handle:
+        if fmt == 'csv':
+            fields = EXPORT_FIELDS[collection]
+            writer = csv.writer(handle)
+            writer.writerow(fields)
+            for doc in cursor:
+                writer.writerow([csv_value(doc.get(field)) for field in fields])
+                count += 1
+        else:
+            handle.write('[')
+            for doc in cursor:
+                handle.write(',\n' if count else '')
+                handle.write(json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS))
+                count += 1
+            handle.write(']\n')
+    return count
+
+def format_report(report, limit=20):
+    lines = [f"{report['inserted']} inserted, {report['failed']} rejected."]
+    lines += [f"row {row_number}: {message}" for row_number, message in report['errors'][:limit]]
+    if report['failed'] > limit:
+        lines.append(f"... and {report['failed'] - limit} more")
+    if report['warnings']:
+        lines.append(f"{len(report['warnings'])} imported with warnings:")
+        lines += [f"row {row_number}: {message}" for row_number, message in report['warnings'][:limit]]
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import or export students, courses and enrollments.")
+    parser.add_argument('command', choices=('import', 'export'))
+    parser.add_argument('collection', choices=tuple(CLEANERS))
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=('csv', 'json'))
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--uri', help="defaults to ENROLLMENT_URI or enrollment.ini")
+    parser.add_argument('--db')
+    args = parser.parse_args()
+
+    db = connect(args.uri, args.db)
+    if args.command == 'export':
+        count = export_collection(db, args.collection, args.path, args.format, args.chunk_size)
+        print(f"Exported {count} {args.collection} to {args.path}.")
+        return
+    report = import_file(db, args.collection, args.path, args.format, args.chunk_size)
+    print(format_report(report, limit=len(report['errors'])))
+    raise SystemExit(1 if report['failed'] else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import argparse
+import logging
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from connection import connect
+from paging import PAGE_SIZE
+from search import NAME_COLLATION, course_search, enrollment_search, student_search
+
+log = logging.getLogger(__name__)
+
+# The compound (student_id, course_id, semester) index also serves every
+# student_id lookup through its prefix, so student_id gets no index of its own.
+REQUIRED_INDEXES = {
+    'students': [
+        IndexModel([('email', ASCENDING)], unique=True),
+        IndexModel([('last_name', ASCENDING)], collation=NAME_COLLATION, name='last_name_ci'),
+        IndexModel([('first_name', ASCENDING)], collation=NAME_COLLATION, name='first_name_ci'),
+        IndexModel([('major', ASCENDING)]),
+        IndexModel([('updated_at', ASCENDING)]),
+    ],
+    'courses': [
+        IndexModel([('course_id', ASCENDING)], unique=True),
+        IndexModel([('course_name', ASCENDING)], collation=NAME_COLLATION, name='course_name_ci'),
+        IndexModel([('department', ASCENDING)]),
+        IndexModel([('updated_at', ASCENDING)]),
+    ],
+    'enrollments': [
+        IndexModel([('student_id', ASCENDING), ('course_id', ASCENDING), ('semester', ASCENDING)],
+                   unique=True, name='student_course_semester'),
+        IndexModel([('course_id', ASCENDING)]),
+        IndexModel([('semester', ASCENDING), ('grade', ASCENDING)]),
+        IndexModel([('updated_at', ASCENDING)]),
+    ],
+    'enrollments_archive': [
+        IndexModel([('student_id', ASCENDING)]),
+        IndexModel([('course_id', ASCENDING)]),
+        IndexModel([('semester', ASCENDING), ('grade', ASCENDING)]),
+    ],
+    'term_stats': [
+        IndexModel([('semester', ASCENDING), ('group', ASCENDING), ('key', ASCENDING)],
+                   unique=True, name='semester_group_key'),
+        IndexModel([('group', ASCENDING), ('key', ASCENDING)]),
+    ],
+}
+
+def ensure_indexes(db, required=REQUIRED_INDEXES):
+    # Only indexes missing by name are sent, so a normal launch costs one
+    # listIndexes per collection instead of a createIndexes round trip each.
+    created = []
+    for collection, models in required.items():
+        existing = {index['name'] for index in db[collection].list_indexes()}
+        for model in models:
+            if model.document['name'] in existing:
+                continue
+            try:
+                created += db[collection].create_indexes([model])
+            except OperationFailure as err:
+                log.warning("Could not create index %s on %s: %s", model.document['name'], collection, err)
+    return created
+
+def query_shapes():
+    sample_id = ObjectId()
+    name_query, name_collation = student_search({'name': 'a'})
+    course_query, course_collation = course_search({'name': 'a'})
+    return [
+        ('students page', 'students', 'find', {'filter': {'_id': {'$gt': sample_id}}, 'sort': '_id'}),
+        ('students by email', 'students', 'find', {'filter': {'email': ''}}),
+        ('students by name', 'students', 'find', {'filter': name_query, 'collation': name_collation}),
+        ('students by major', 'students', 'find', {'filter': student_search({'major': ''})[0]}),
+        ('courses page', 'courses', 'find', {'filter': {'course_id': {'$gt': ''}}, 'sort': 'course_id'}),
+        ('courses by name', 'courses', 'find', {'filter': course_query, 'collation': course_collation}),
+        ('courses by department', 'courses', 'find', {'filter': course_search({'department': ''})[0]}),
+        ('enrollments page', 'enrollments', 'find', {'filter': {'_id': {'$gt': sample_id}}, 'sort': '_id'}),
+        ('enrollments by student', 'enrollments', 'find', {'filter': {'student_id': sample_id}}),
+        ('enrollments by course', 'enrollments', 'find', {'filter': {'course_id': ''}}),
+        ('enrollments by semester and grade', 'enrollments', 'find',
+         {'filter': enrollment_search({'semester': '1', 'grade': 'A'})}),
+        ('duplicate enrollment check', 'enrollments', 'find',
+         {'filter': {'student_id': sample_id, 'course_id': '', 'semester': ''}}),
+    ]
+
+def plan_stages(plan):
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from plan_stages(value)
+
+def explain(db, collection, kind, spec):
+    if kind == 'aggregate':
+        return db.command('aggregate', collection, pipeline=spec['pipeline'], explain=True)
+    cursor = db[collection].find(spec['filter'], collation=spec.get('collation'))
+    if 'sort' in spec:
+        cursor = cursor.sort(spec['sort'], ASCENDING).limit(PAGE_SIZE)
+    return cursor.explain()
+
+def collection_scans(db, shapes=None):
+    scans = []
+    for label, collection, kind, spec in shapes or query_shapes():
+        try:
+            plan = explain(db, collection, kind, spec)
+        except OperationFailure as err:
+            log.warning("Could not explain %s: %s", label, err)
+            continue
+        if 'COLLSCAN' in plan_stages(plan):
+            scans.append((label, collection))
+    return scans
+
+def report_collection_scans(db):
+    scans = collection_scans(db)
+    for label, collection in scans:
+        log.warning("Query '%s' on %s still uses a COLLSCAN; check REQUIRED_INDEXES.", label, collection)
+    return scans
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the required indexes and report unindexed queries.")
+    parser.add_argument('--uri', help="defaults to ENROLLMENT_URI or enrollment.ini")
+    parser.add_argument('--db')
+    args = parser.parse_args()
+
+    db = connect(args.uri, args.db)
+    created = ensure_indexes(db)
+    print(f"Created: {', '.join(created)}" if created else "All required indexes already exist.")
+    scans = collection_scans(db)
+    for label, collection in scans:
+        print(f"COLLSCAN: {label} ({collection})")
+    print(f"{len(scans)} queries need an index." if scans else "All known queries use an index.")
+    raise SystemExit(1 if scans else 0)
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(levelname)s %(name)s: %(message)s')
+    main()
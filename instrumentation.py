@@ -0,0 +1,176 @@
+import statistics
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from bson import json_util
+from pymongo import monitoring
+
+from changes import FEED_THREAD
+from indexes import plan_stages
+
+RING_SIZE = 2000
+SLOW_MS = 100
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+# Driver housekeeping that would drown out the application's own commands.
+IGNORED_COMMANDS = frozenset(('hello', 'ismaster', 'isMaster', 'ping', 'saslStart', 'saslContinue',
+                              'endSessions', 'killCursors', 'buildInfo'))
+EXPLAINABLE = ('find', 'aggregate', 'count', 'distinct')
+# Session and cluster fields the server rejects inside an explain.
+SESSION_FIELDS = ('lsid', '$db', '$clusterTime', '$readPreference', 'txnNumber', 'autocommit',
+                  'startTransaction', 'readConcern')
+
+def returned_count(name, reply):
+    if 'cursor' in reply:
+        cursor = reply['cursor']
+        return len(cursor.get('firstBatch', cursor.get('nextBatch', ())))
+    if name == 'findAndModify':
+        return 1 if reply.get('value') else 0
+    return reply.get('n')
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+class CommandRecorder(monitoring.CommandListener):
+    # Keeps the last RING_SIZE commands the driver ran with their duration and
+    # the number of documents returned or written. Find/aggregate command
+    # documents are kept so a record can be explained later on request; the
+    # listener itself never sends anything to the server.
+
+    def __init__(self, size=RING_SIZE, keep_commands=True):
+        self.lock = threading.Lock()
+        self.records = deque(maxlen=size)
+        self.pending = {}
+        self.keep_commands = keep_commands
+        self.next_id = 0
+
+    def started(self, event):
+        # Listeners run on the thread that sends the command. The change feed
+        # blocks about AWAIT_MS in every getMore, once a second, which would
+        # fill the ring and top every latency table.
+        if event.command_name in IGNORED_COMMANDS or threading.current_thread().name == FEED_THREAD:
+            return
+        target = event.command.get(event.command_name)
+        if event.command_name == 'getMore':
+            target = event.command.get('collection')
+        spec = None
+        if self.keep_commands and event.command_name in EXPLAINABLE:
+            spec = {key: value for key, value in event.command.items() if key not in SESSION_FIELDS}
+        with self.lock:
+            self.pending[(event.connection_id, event.request_id)] = (
+                time.time(), target if isinstance(target, str) else None, spec)
+
+    def succeeded(self, event):
+        self._finish(event, returned_count(event.command_name, event.reply), None)
+
+    def failed(self, event):
+        self._finish(event, None, str(event.failure.get('errmsg', event.failure)))
+
+    def _finish(self, event, docs, error):
+        with self.lock:
+            started = self.pending.pop((event.connection_id, event.request_id), None)
+            if started is None:
+                return
+            when, collection, spec = started
+            self.next_id += 1
+            self.records.append({
+                'id': self.next_id,
+                'time': when,
+                'command': event.command_name,
+                'database': event.database_name,
+                'collection': collection,
+                'duration_ms': event.duration_micros / 1000,
+                'docs': docs,
+                'error': error,
+                'spec': spec,
+            })
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.records)
+
+    def get(self, record_id):
+        with self.lock:
+            for record in self.records:
+                if record['id'] == record_id:
+                    return record
+        return None
+
+    def clear(self):
+        with self.lock:
+            self.records.clear()
+
+    def summary(self, records=None):
+        groups = {}
+        for record in records if records is not None else self.snapshot():
+            groups.setdefault((record['command'], record['collection']), []).append(record)
+        rows = []
+        for (command, collection), group in groups.items():
+            durations = sorted(record['duration_ms'] for record in group)
+            rows.append({
+                'command': command,
+                'collection': collection,
+                'calls': len(group),
+                'errors': sum(1 for record in group if record['error']),
+                'docs': sum(record['docs'] or 0 for record in group),
+                'mean_ms': round(statistics.fmean(durations), 3),
+                'p50_ms': round(percentile(durations, 0.5), 3),
+                'p95_ms': round(percentile(durations, 0.95), 3),
+                'max_ms': round(durations[-1], 3),
+            })
+        rows.sort(key=lambda row: row['p95_ms'], reverse=True)
+        return rows
+
+    def slowest(self, count=50, records=None):
+        records = records if records is not None else self.snapshot()
+        return sorted(records, key=lambda record: record['duration_ms'], reverse=True)[:count]
+
+    def histograms(self, records=None):
+        # Counts per upper bound in ms; durations above the last bound go to 'inf'.
+        histograms = {}
+        for record in records if records is not None else self.snapshot():
+            name = f"{record['command']} {record['collection'] or ''}".strip()
+            buckets = histograms.setdefault(name, dict.fromkeys([*map(str, HISTOGRAM_BUCKETS_MS), 'inf'], 0))
+            bound = next((bound for bound in HISTOGRAM_BUCKETS_MS if record['duration_ms'] <= bound), None)
+            buckets[str(bound) if bound is not None else 'inf'] += 1
+        return histograms
+
+    def export(self, path):
+        records = self.snapshot()
+        dump = {
+            'generated': datetime.now().isoformat(timespec='seconds'),
+            'slow_ms': SLOW_MS,
+            'summary': self.summary(records),
+            'histograms_ms': self.histograms(records),
+            'records': records,
+        }
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(json_util.dumps(dump, indent=2, json_options=json_util.RELAXED_JSON_OPTIONS))
+        return len(records)
+
+def explain_record(db, record):
+    # Re-runs a recorded find/aggregate/count/distinct under explain and keeps
+    # the execution counters the command events do not carry.
+    if not record.get('spec'):
+        raise ValueError(f"Only {', '.join(EXPLAINABLE)} commands can be explained.")
+    plan = db.client[record['database']].command('explain', record['spec'], verbosity='executionStats')
+    stats = plan.get('executionStats') or next(find_key(plan, 'executionStats'), {})
+    result = {
+        'docs_examined': stats.get('totalDocsExamined'),
+        'keys_examined': stats.get('totalKeysExamined'),
+        'returned': stats.get('nReturned'),
+        'stages': sorted(set(plan_stages(plan.get('queryPlanner', plan)))),
+    }
+    record['explain'] = result
+    return result
+
+def find_key(value, key):
+    if isinstance(value, dict):
+        if key in value:
+            yield value[key]
+        for child in value.values():
+            yield from find_key(child, key)
+    elif isinstance(value, list):
+        for child in value:
+            yield from find_key(child, key)
@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import ClassVar, Optional
+
+from bson.objectid import ObjectId
+
+from stats import COURSE_FIELDS, STUDENT_FIELDS, average
+
+DATE_FORMAT = '%Y-%m-%d'
+
+def parse_date(value):
+    # Dates of birth arrive as YYYY-MM-DD (or any ISO date), or in the legacy
+    # MMDDYY form the first version of the app stored, e.g. '101003'.
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    text = str(value).strip()
+    try:
+        if len(text) == 6 and text.isdigit():
+            year = 2000 + int(text[4:])
+            if year > date.today().year:
+                year -= 100
+            return datetime(year, int(text[:2]), int(text[2:4]))
+        return datetime.fromisoformat(text)
+    except ValueError:
+        raise ValueError(f"Date of birth must be YYYY-MM-DD or MMDDYY, not {text!r}.") from None
+
+def format_date(value):
+    return value.strftime(DATE_FORMAT) if isinstance(value, datetime) else (value or '')
+
+def format_average(value):
+    return round(value, 2) if value is not None else 'N/A'
+
+def display_projection(fields):
+    return dict.fromkeys(fields, 1)
+
+def stored(doc, id_value):
+    if id_value is not None:
+        doc['_id'] = id_value
+    return doc
+
+# The models are the typed form of a stored document: to_doc() is what the
+# service inserts and row() is what the tables show. Each PROJECTION holds only
+# the fields row() needs, so list queries transfer nothing else.
+
+@dataclass(slots=True)
+class Student:
+    first_name: str
+    last_name: str
+    email: str
+    major: str = ''
+    date_of_birth: Optional[datetime] = None
+    total_courses: int = 0
+    graded_courses: int = 0
+    grade_points: float = 0.0
+    enrollment_date: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    id: Optional[ObjectId] = None
+
+    PROJECTION: ClassVar[dict] = display_projection(
+        ('first_name', 'last_name', 'email', 'date_of_birth', 'major', *STUDENT_FIELDS.values()))
+
+    @classmethod
+    def from_doc(cls, doc):
+        return cls(doc['first_name'], doc['last_name'], doc['email'], doc.get('major', ''),
+                   doc.get('date_of_birth'), doc.get('total_courses', 0), doc.get('graded_courses', 0),
+                   doc.get('grade_points', 0.0), doc.get('enrollment_date'), doc.get('updated_at'), doc.get('_id'))
+
+    def to_doc(self):
+        return stored({
+            'first_name': self.first_name,
+            'last_name': self.last_name,
+            'email': self.email,
+            'date_of_birth': self.date_of_birth,
+            'major': self.major,
+            'enrollment_date': self.enrollment_date,
+            'updated_at': self.updated_at,
+            'total_courses': self.total_courses,
+            'graded_courses': self.graded_courses,
+            'grade_points': self.grade_points,
+        }, self.id)
+
+    @property
+    def gwa(self):
+        return average({'graded_courses': self.graded_courses, 'grade_points': self.grade_points}, STUDENT_FIELDS)
+
+    def row(self):
+        return (str(self.id), self.first_name, self.last_name, self.email, format_date(self.date_of_birth),
+                self.major, self.total_courses, format_average(self.gwa))
+
+@dataclass(slots=True)
+class Course:
+    course_id: str
+    course_name: str
+    department: str
+    credits: int
+    instructor: str = ''
+    enrolled_students: int = 0
+    graded_students: int = 0
+    grade_points: float = 0.0
+    updated_at: Optional[datetime] = None
+
+    PROJECTION: ClassVar[dict] = display_projection(
+        ('course_id', 'course_name', 'department', 'credits', 'instructor', *COURSE_FIELDS.values()))
+
+    @classmethod
+    def from_doc(cls, doc):
+        return cls(doc['course_id'], doc['course_name'], doc['department'], doc['credits'], doc.get('instructor', ''),
+                   doc.get('enrolled_students', 0), doc.get('graded_students', 0), doc.get('grade_points', 0.0),
+                   doc.get('updated_at'))
+
+    def to_doc(self):
+        return {
+            'course_id': self.course_id,
+            'course_name': self.course_name,
+            'department': self.department,
+            'credits': self.credits,
+            'instructor': self.instructor,
+            'updated_at': self.updated_at,
+            'enrolled_students': self.enrolled_students,
+            'graded_students': self.graded_students,
+            'grade_points': self.grade_points,
+        }
+
+    @property
+    def avg_course_grade(self):
+        return average({'graded_students': self.graded_students, 'grade_points': self.grade_points}, COURSE_FIELDS)
+
+    def row(self):
+        return (self.course_id, self.course_name, self.department, self.credits, self.instructor,
+                self.enrolled_students, format_average(self.avg_course_grade))
+
+@dataclass(slots=True)
+class Enrollment:
+    student_id: ObjectId
+    course_id: str
+    semester: str
+    enrollment_date: Optional[datetime] = None
+    grade: Optional[str] = None
+    student_name: str = ''
+    course_name: str = ''
+    updated_at: Optional[datetime] = None
+    id: Optional[ObjectId] = None
+
+    PROJECTION: ClassVar[dict] = display_projection(('student_id', 'course_id', 'semester', 'enrollment_date', 'grade'))
+
+    # Expects the 'student' and 'course' display fields attached by
+    # EnrollmentService.join_display.
+    @classmethod
+    def from_doc(cls, doc):
+        student, course = doc.get('student', {}), doc.get('course', {})
+        return cls(doc['student_id'], doc['course_id'], doc['semester'], doc.get('enrollment_date'), doc.get('grade'),
+                   f"{student.get('first_name', '')} {student.get('last_name', '')}", course.get('course_name', ''),
+                   doc.get('updated_at'), doc.get('_id'))
+
+    def to_doc(self):
+        return stored({
+            'student_id': self.student_id,
+            'course_id': self.course_id,
+            'semester': self.semester,
+            'enrollment_date': self.enrollment_date,
+            'grade': self.grade,
+            'updated_at': self.updated_at,
+        }, self.id)
+
+    def row(self):
+        return (str(self.id), str(self.student_id), self.course_id, self.semester, format_date(self.enrollment_date),
+                self.grade, self.student_name, self.course_name)
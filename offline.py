@@ -0,0 +1,653 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from bson import json_util
+from bson.objectid import ObjectId
+from pymongo.errors import ConnectionFailure, DuplicateKeyError, OperationFailure
+
+from archive import closed_semesters
+from changes import POLL_OVERLAP
+from models import parse_date
+from paging import combine_filters
+from search import course_search, enrollment_search, student_search
+from service import COURSE_EDITABLE, STUDENT_EDITABLE, ascending, check_grade, require
+from stats import BATCH_SIZE, COURSE_FIELDS, STUDENT_FIELDS, empty_stats
+
+log = logging.getLogger(__name__)
+
+# collection -> field the mirror keys (and pages) it by
+KEYS = {'students': '_id', 'courses': 'course_id', 'enrollments': '_id'}
+SQL_OPERATORS = {'$eq': '=', '$gt': '>', '$gte': '>=', '$lt': '<', '$lte': '<='}
+FIELD_NAME = re.compile(r'^\w+$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    collection TEXT NOT NULL,
+    key TEXT NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (collection, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    op TEXT NOT NULL,
+    args TEXT NOT NULL,
+    base TEXT NOT NULL,
+    queued_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS conflicts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    op TEXT NOT NULL,
+    args TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    found_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def dumps(value):
+    return json_util.dumps(value, json_options=json_util.CANONICAL_JSON_OPTIONS)
+
+def loads(text):
+    return json_util.loads(text)
+
+def key_of(value):
+    return str(value)
+
+def compare(value, op, operand, fold):
+    if fold and isinstance(value, str) and isinstance(operand, str):
+        value, operand = value.casefold(), operand.casefold()
+    try:
+        if op == '$eq':
+            return value == operand
+        if op == '$in':
+            return any(compare(value, '$eq', item, fold) for item in operand)
+        if op == '$gt':
+            return value is not None and value > operand
+        if op == '$gte':
+            return value is not None and value >= operand
+        if op == '$lt':
+            return value is not None and value < operand
+        if op == '$lte':
+            return value is not None and value <= operand
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported operator {op} in offline query.")
+
+def matches(doc, query, fold=False):
+    # Evaluates the subset of query syntax the service builds (equality,
+    # $in, ranges, $and/$or) against a mirrored document. ``fold`` stands in
+    # for the case-insensitive NAME_COLLATION.
+    for field, condition in (query or {}).items():
+        if field == '$and':
+            if not all(matches(doc, part, fold) for part in condition):
+                return False
+        elif field == '$or':
+            if not any(matches(doc, part, fold) for part in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(op.startswith('$') for op in condition):
+            if not all(compare(doc.get(field), op, operand, fold) for op, operand in condition.items()):
+                return False
+        elif not compare(doc.get(field), '$eq', condition, fold):
+            return False
+    return True
+
+def key_in(query, field):
+    # The ids of a top-level (or $and-ed) {field: {'$in': [...]}} condition.
+    for part in [query or {}, *(query or {}).get('$and', ())]:
+        condition = part.get(field)
+        if isinstance(condition, dict) and '$in' in condition:
+            return condition['$in']
+    return None
+
+def casefold(value):
+    return value.casefold() if isinstance(value, str) else value
+
+def sql_condition(field, condition, fold):
+    # SQL for the string comparisons in one field's condition; others are
+    # left to matches(). Extended JSON stores strings as plain JSON strings.
+    if not FIELD_NAME.match(field):
+        return []
+    value = f"json_extract(body, '$.{field}')"
+    if fold:
+        value = f'casefold({value})'
+    operand = casefold if fold else (lambda item: item)
+    if not (isinstance(condition, dict) and condition and all(op.startswith('$') for op in condition)):
+        condition = {'$eq': condition}
+    clauses = []
+    for op, item in condition.items():
+        if op in SQL_OPERATORS and isinstance(item, str):
+            clauses.append((f'{value} {SQL_OPERATORS[op]} ?', [operand(item)]))
+        elif op == '$in' and item and all(isinstance(entry, str) for entry in item):
+            clauses.append((f"{value} IN ({','.join('?' * len(item))})", [operand(entry) for entry in item]))
+    return clauses
+
+def sql_filter(query, fold=False):
+    # A pre-filter the SQL engine can apply before a row is decoded. It may
+    # let through rows that matches() then rejects, but never drops a match.
+    clauses = []
+    for field, condition in (query or {}).items():
+        if field == '$and':
+            for part in condition:
+                clauses += sql_filter(part, fold)
+        elif field == '$or':
+            alternatives = [sql_filter(part, fold) for part in condition]
+            if alternatives and all(alternatives):
+                clauses.append((
+                    '(' + ' OR '.join('(' + ' AND '.join(sql for sql, _ in part) + ')' for part in alternatives) + ')',
+                    [param for part in alternatives for _, params in part for param in params]))
+        elif not field.startswith('$'):
+            clauses += sql_condition(field, condition, fold)
+    return clauses
+
+class LocalMirror:
+    # SQLite copy of the three collections plus the queue of writes made while
+    # MongoDB was unreachable. One connection is shared by the worker threads,
+    # so every statement runs under the lock.
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.create_function('casefold', 1, casefold, deterministic=True)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        # Outbox size, kept up to date by queue()/done() so the status bar can
+        # read it on the Tk thread without waiting for the lock.
+        self.queued = self.conn.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def meta(self, name, default=None):
+        with self.lock:
+            row = self.conn.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+        return loads(row[0]) if row else default
+
+    def set_meta(self, name, value):
+        with self.lock, self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', (name, dumps(value)))
+
+    def has_data(self):
+        with self.lock:
+            return self.conn.execute('SELECT 1 FROM docs LIMIT 1').fetchone() is not None
+
+    def put_many(self, collection, docs):
+        rows = [(collection, key_of(doc[KEYS[collection]]), dumps(doc)) for doc in docs]
+        with self.lock, self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO docs (collection, key, body) VALUES (?, ?, ?)', rows)
+        return len(rows)
+
+    def delete_many(self, collection, keys):
+        with self.lock, self.conn:
+            self.conn.executemany('DELETE FROM docs WHERE collection = ? AND key = ?',
+                                  [(collection, key_of(key)) for key in keys])
+
+    def get_many(self, collection, keys):
+        keys = [key_of(key) for key in keys]
+        found = {}
+        with self.lock:
+            for offset in range(0, len(keys), 500):
+                chunk = keys[offset:offset + 500]
+                marks = ','.join('?' * len(chunk))
+                for key, body in self.conn.execute(
+                        f'SELECT key, body FROM docs WHERE collection = ? AND key IN ({marks})', (collection, *chunk)):
+                    found[key] = loads(body)
+        return found
+
+    def keys(self, collection):
+        with self.lock:
+            return {key for key, in self.conn.execute('SELECT key FROM docs WHERE collection = ?', (collection,))}
+
+    def find(self, collection, query, after=None, before=None, limit=None, fold=False):
+        # Pages in key order like window_find: the key range, the string
+        # conditions and, when nothing else filters, the limit go into the SQL;
+        # matches() checks each row as the cursor is read, stopping once the
+        # page is full. ObjectId hex strings sort like the ObjectIds themselves.
+        keys = key_in(query, KEYS[collection])
+        if keys is not None:
+            return self.find_keys(collection, keys, query, after, before, limit, fold)
+        sql, params = 'SELECT body FROM docs WHERE collection = ?', [collection]
+        for clause, clause_params in sql_filter(query, fold):
+            sql, params = f'{sql} AND {clause}', params + clause_params
+        if before is not None:
+            sql, params = sql + ' AND key < ? ORDER BY key DESC', params + [key_of(before)]
+        elif after is not None:
+            sql, params = sql + ' AND key > ? ORDER BY key', params + [key_of(after)]
+        else:
+            sql += ' ORDER BY key'
+        if limit and not query:
+            sql, params = sql + ' LIMIT ?', params + [limit]
+        found = []
+        with self.lock:
+            for body, in self.conn.execute(sql, params):
+                doc = loads(body)
+                if matches(doc, query, fold):
+                    found.append(doc)
+                    if limit and len(found) >= limit:
+                        break
+        return ascending(found, before)
+
+    def find_keys(self, collection, keys, query, after=None, before=None, limit=None, fold=False):
+        # Targeted refreshes ({key: {'$in': ids}}) read by primary key.
+        docs = sorted(self.get_many(collection, keys).items(), reverse=before is not None)
+        found = [doc for key, doc in docs
+                 if (after is None or key > key_of(after)) and (before is None or key < key_of(before))
+                 and matches(doc, query, fold)]
+        return ascending(found[:limit] if limit else found, before)
+
+    def queue(self, op, args, base):
+        with self.lock, self.conn:
+            self.conn.execute('INSERT INTO outbox (op, args, base, queued_at) VALUES (?, ?, ?, ?)',
+                              (op, dumps(args), dumps(base), time.time()))
+            self.queued += 1
+
+    def outbox(self):
+        with self.lock:
+            rows = self.conn.execute('SELECT id, op, args, base FROM outbox ORDER BY id').fetchall()
+        return [(entry_id, op, loads(args), loads(base)) for entry_id, op, args, base in rows]
+
+    def pending(self):
+        return self.queued
+
+    def done(self, entry_id, conflict=None):
+        with self.lock, self.conn:
+            if conflict is not None:
+                self.conn.execute('INSERT INTO conflicts (op, args, reason, found_at) '
+                                  'SELECT op, args, ?, ? FROM outbox WHERE id = ?', (conflict, time.time(), entry_id))
+            self.queued -= self.conn.execute('DELETE FROM outbox WHERE id = ?', (entry_id,)).rowcount
+
+    def conflicts(self):
+        with self.lock:
+            rows = self.conn.execute('SELECT id, op, args, reason, found_at FROM conflicts ORDER BY id').fetchall()
+        return [{'id': row[0], 'op': row[1], 'args': loads(row[2]), 'reason': row[3],
+                 'found_at': datetime.fromtimestamp(row[4])} for row in rows]
+
+    def apply_change(self, change):
+        collection, doc = change['collection'], change['doc']
+        if collection not in KEYS:
+            return
+        if change['op'] == 'delete':
+            if collection == 'courses':
+                # Delete events only carry the _id, not the course_id key.
+                for key, course in self.get_many('courses', self.keys('courses')).items():
+                    if course.get('_id') == change['key']:
+                        self.delete_many('courses', [key])
+            else:
+                self.delete_many(collection, [change['key']])
+        elif doc is not None:
+            self.put_many(collection, [doc])
+
+    def pull(self, db, full=False, batch_size=BATCH_SIZE):
+        # Copies documents changed since the last pull (everything the first
+        # time). Deletes leave no updated_at behind, so a full pull also reads
+        # every key and drops mirrored documents that no longer exist.
+        started = datetime.now()
+        since = self.meta('pulled_at')
+        pulled = 0
+        for collection, key in KEYS.items():
+            query = {'updated_at': {'$gt': since - POLL_OVERLAP}} if since else {}
+            batch = []
+            for doc in db[collection].find(query, batch_size=batch_size):
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    pulled += self.put_many(collection, batch)
+                    batch = []
+            pulled += self.put_many(collection, batch)
+            if since is None or full:
+                # Only the key is read, so the query is covered by its index.
+                projection = {key: 1} if key == '_id' else {key: 1, '_id': 0}
+                live = {key_of(doc[key]) for doc in db[collection].find({}, projection, batch_size=batch_size)}
+                self.delete_many(collection, self.keys(collection) - live)
+        self.drop_closed(closed_semesters(db))
+        self.set_meta('pulled_at', started)
+        return pulled
+
+    def drop_closed(self, semesters):
+        # Archiving deletes enrollments without a trace a pull could see, so the
+        # closed terms are compared instead; the terms collection is tiny.
+        semesters = sorted(semesters)
+        if semesters == self.meta('closed_semesters', []):
+            return
+        archived = self.find('enrollments', {'semester': {'$in': semesters}}) if semesters else []
+        self.delete_many('enrollments', [enrollment['_id'] for enrollment in archived])
+        self.set_meta('closed_semesters', semesters)
+
+class OfflineService:
+    # Wraps an EnrollmentService. Reads and writes go to MongoDB while it is
+    # reachable. When it is not, reads are answered from the LocalMirror and
+    # writes are applied to the mirror and queued; sync() replays the queue in
+    # order and then pulls what changed on the server. Each queued edit keeps
+    # the values the fields it changes had before it; if the server's values
+    # differ by replay time, someone else edited them and the edit is not
+    # replayed but recorded as a conflict. (Comparing updated_at would flag
+    # every counter bump from other desks' enrollments.)
+    #
+    # Offline edits do not move the GWA/average counters; the counter writes
+    # made by the replay stamp updated_at, so the pull after it brings them.
+
+    # op -> (collection, key, fields the edit changes) for each document it touches
+    TARGETS = {
+        'add_student': lambda args: [('students', args[0]['_id'], ())],
+        'add_course': lambda args: [('courses', args[0]['course_id'], ())],
+        'add_enrollment': lambda args: [('enrollments', args[4], ())],
+        'update_student': lambda args: [('students', args[0], [field for field in args[1] if field in STUDENT_EDITABLE])],
+        'delete_students': lambda args: [('students', key, ()) for key in args[0]],
+        'update_course': lambda args: [('courses', args[0], [field for field in args[1] if field in COURSE_EDITABLE])],
+        'delete_courses': lambda args: [('courses', key, ()) for key in args[0]],
+        'update_enrollment': lambda args: [('enrollments', args[0], ('semester', 'grade'))],
+        'delete_enrollments': lambda args: [('enrollments', key, ()) for key in args[0]],
+        'save_grades': lambda args: [('enrollments', key, ('grade',)) for key in args[2]],
+    }
+    # Only edits of existing documents are checked against the server's copy.
+    CHECKED = ('update_student', 'update_course', 'update_enrollment', 'save_grades')
+
+    def __init__(self, service, mirror):
+        self.service = service
+        self.mirror = mirror
+        self.sync_lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.service, name)
+
+    def online(self):
+        stats = self.service.connection_stats() or {}
+        if stats.get('healthy') is None:
+            # Nothing heard from the server yet: answer from the mirror if it has
+            # anything, so the first screen does not wait for server selection.
+            return not self.mirror.has_data()
+        return stats['healthy']
+
+    def connection_stats(self):
+        stats = self.service.connection_stats()
+        if stats is not None:
+            stats = {**stats, 'queued': self.mirror.pending()}
+        return stats
+
+    def prepare(self):
+        try:
+            self.service.prepare()
+        except ConnectionFailure as err:
+            log.warning("MongoDB unreachable, working from the local copy: %s", err)
+
+    def watch(self, handler=None):
+        def mirror_change(change):
+            if change['op'] == 'reset':
+                # Events were missed: pull what changed since the last pull and
+                # check every key for deletions before the handler reloads.
+                self.sync(full=True)
+            else:
+                self.mirror.apply_change(change)
+            if handler is not None:
+                handler(change)
+
+        return self.service.watch(mirror_change)
+
+    def close(self):
+        self.service.close()
+        self.mirror.close()
+
+    # Reads
+
+    def _read(self, read, local):
+        if self.online():
+            try:
+                return read()
+            except ConnectionFailure as err:
+                log.warning("Read failed, answering from the local copy: %s", err)
+        return local()
+
+    def list_students(self, after=None, before=None, limit=None, match=None, search=None):
+        query, collation = student_search(search)
+        return self._read(
+            lambda: self.service.list_students(after, before, limit, match, search),
+            lambda: self.mirror.find('students', combine_filters(match, query), after, before, limit, collation is not None))
+
+    def list_courses(self, after=None, before=None, limit=None, match=None, search=None):
+        query, collation = course_search(search)
+        return self._read(
+            lambda: self.service.list_courses(after, before, limit, match, search),
+            lambda: self.mirror.find('courses', combine_filters(match, query), after, before, limit, collation is not None))
+
+    def list_enrollments(self, after=None, before=None, limit=None, match=None, search=None):
+        return self._read(
+            lambda: self.service.list_enrollments(after, before, limit, match, search),
+            lambda: self.join_local(self.mirror.find('enrollments', combine_filters(match, enrollment_search(search)),
+                                                     after, before, limit)))
+
+    def grade_sheet(self, course_id, semester):
+        return self._read(lambda: self.service.grade_sheet(course_id, semester),
+                          lambda: self.local_grade_sheet(course_id, semester))
+
+    def local_grade_sheet(self, course_id, semester):
+        enrollments = self.mirror.find('enrollments', {'course_id': course_id, 'semester': semester})
+        students = self.mirror.get_many('students', {enrollment['student_id'] for enrollment in enrollments})
+        sheet = [{**enrollment, 'student': students[key_of(enrollment['student_id'])]}
+                 for enrollment in enrollments if key_of(enrollment['student_id']) in students]
+        sheet.sort(key=lambda row: (row['student'].get('last_name', ''), row['student'].get('first_name', '')))
+        return sheet
+
+    def join_local(self, enrollments):
+        students = self.mirror.get_many('students', {enrollment['student_id'] for enrollment in enrollments})
+        courses = self.mirror.get_many('courses', {enrollment['course_id'] for enrollment in enrollments})
+        joined = []
+        for enrollment in enrollments:
+            student = students.get(key_of(enrollment['student_id']))
+            course = courses.get(key_of(enrollment['course_id']))
+            if student is not None and course is not None:
+                joined.append({**enrollment, 'student': student, 'course': course})
+        return joined
+
+    # Writes
+
+    def _write(self, op, *args):
+        if self.online():
+            if self.mirror.pending():
+                self.sync()
+            try:
+                return getattr(self.service, op)(*args)
+            except ConnectionFailure as err:
+                # The write may or may not have reached the server; replaying it
+                # either succeeds or is recorded as a conflict (e.g. duplicate key).
+                log.warning("%s failed, queueing it for the next sync: %s", op, err)
+        base = {f"{collection}:{key_of(key)}": {field: doc.get(field) for field in fields}
+                for collection, key, fields in self.TARGETS[op](args)
+                for doc in [self.mirror.get_many(collection, [key]).get(key_of(key), {})]}
+        result = getattr(self, f'_local_{op}')(*args)
+        self.mirror.queue(op, list(args), base)
+        return result
+
+    def add_student(self, data):
+        if not data.get('_id'):
+            data = {**data, '_id': ObjectId()}
+        return self._write('add_student', data)
+
+    def update_student(self, student_id, changes):
+        return self._write('update_student', student_id, changes)
+
+    def delete_student(self, student_id):
+        return self.delete_students([student_id])
+
+    def delete_students(self, student_ids):
+        return self._write('delete_students', list(student_ids))
+
+    def add_course(self, data):
+        return self._write('add_course', data)
+
+    def update_course(self, course_id, changes):
+        return self._write('update_course', course_id, changes)
+
+    def delete_course(self, course_id):
+        return self.delete_courses([course_id])
+
+    def delete_courses(self, course_ids):
+        return self._write('delete_courses', list(course_ids))
+
+    def add_enrollment(self, student_id, course_id, semester, grade=None, enrollment_id=None):
+        return self._write('add_enrollment', student_id, course_id, semester, grade, enrollment_id or ObjectId())
+
+    def update_enrollment(self, enrollment_id, semester, grade=None):
+        return self._write('update_enrollment', enrollment_id, semester, grade)
+
+    def delete_enrollment(self, enrollment_id):
+        removed = self.delete_enrollments([enrollment_id])
+        return removed[0] if removed else None
+
+    def delete_enrollments(self, enrollment_ids):
+        return self._write('delete_enrollments', list(enrollment_ids))
+
+    def save_grades(self, course_id, semester, grades):
+        return self._write('save_grades', course_id, semester, grades)
+
+    # Offline versions of the writes: validate like the service, then change
+    # the mirror so the tables show the edit straight away.
+
+    def _local_add_student(self, data):
+        require(data, 'first_name', 'last_name', 'email')
+        student = {field: data.get(field, '') for field in STUDENT_EDITABLE}
+        student.update(_id=ObjectId(data['_id']), date_of_birth=parse_date(data.get('date_of_birth')),
+                       enrollment_date=datetime.now(), **empty_stats(STUDENT_FIELDS))
+        self.mirror.put_many('students', [student])
+        return student['_id']
+
+    def _local_update_student(self, student_id, changes):
+        changes = {field: value for field, value in changes.items() if field in STUDENT_EDITABLE}
+        require(changes, 'first_name', 'last_name', 'email', partial=True)
+        if 'date_of_birth' in changes:
+            changes['date_of_birth'] = parse_date(changes['date_of_birth'])
+        return self._patch('students', student_id, changes)
+
+    def _local_delete_students(self, student_ids):
+        student_ids = {ObjectId(student_id) for student_id in student_ids}
+        removed = self.mirror.find('enrollments', {'student_id': {'$in': list(student_ids)}})
+        self.mirror.delete_many('enrollments', [enrollment['_id'] for enrollment in removed])
+        self.mirror.delete_many('students', student_ids)
+        return list({enrollment['course_id'] for enrollment in removed})
+
+    def _local_add_course(self, data):
+        require(data, 'course_id', 'course_name', 'department', 'credits')
+        if self.mirror.get_many('courses', [data['course_id']]):
+            raise DuplicateKeyError(f"Course {data['course_id']} already exists.")
+        course = {'course_id': data['course_id'], **{field: data.get(field, '') for field in COURSE_EDITABLE}}
+        course.update(credits=int(course['credits']), **empty_stats(COURSE_FIELDS))
+        self.mirror.put_many('courses', [course])
+        return course['course_id']
+
+    def _local_update_course(self, course_id, changes):
+        changes = {field: value for field, value in changes.items() if field in COURSE_EDITABLE}
+        require(changes, 'course_name', 'department', 'credits', partial=True)
+        if 'credits' in changes:
+            changes['credits'] = int(changes['credits'])
+        return self._patch('courses', course_id, changes)
+
+    def _local_delete_courses(self, course_ids):
+        removed = self.mirror.find('enrollments', {'course_id': {'$in': list(course_ids)}})
+        self.mirror.delete_many('enrollments', [enrollment['_id'] for enrollment in removed])
+        self.mirror.delete_many('courses', course_ids)
+        return list({enrollment['student_id'] for enrollment in removed})
+
+    def _local_add_enrollment(self, student_id, course_id, semester, grade, enrollment_id):
+        require({'semester': semester}, 'semester')
+        check_grade(grade)
+        student_id = ObjectId(student_id)
+        if self.mirror.find('enrollments', {'student_id': student_id, 'course_id': course_id, 'semester': semester}):
+            raise DuplicateKeyError("This student is already enrolled in that course for this semester.")
+        self.mirror.put_many('enrollments', [{'_id': ObjectId(enrollment_id), 'student_id': student_id,
+                                              'course_id': course_id, 'semester': semester,
+                                              'enrollment_date': datetime.now(), 'grade': grade}])
+        return ObjectId(enrollment_id)
+
+    def _local_update_enrollment(self, enrollment_id, semester, grade):
+        require({'semester': semester}, 'semester')
+        check_grade(grade)
+        previous = self.mirror.get_many('enrollments', [enrollment_id]).get(key_of(enrollment_id))
+        self._patch('enrollments', enrollment_id, {'semester': semester, 'grade': grade})
+        return previous
+
+    def _local_delete_enrollments(self, enrollment_ids):
+        removed = list(self.mirror.get_many('enrollments', enrollment_ids).values())
+        self.mirror.delete_many('enrollments', enrollment_ids)
+        return removed
+
+    def _local_save_grades(self, course_id, semester, grades):
+        changed, students = [], []
+        current = self.mirror.get_many('enrollments', grades)
+        for enrollment_id, grade in grades.items():
+            check_grade(grade or None)
+            doc = current.get(key_of(enrollment_id))
+            if doc is not None and doc.get('grade') != (grade or None):
+                self._patch('enrollments', enrollment_id, {'grade': grade or None})
+                changed.append(doc['_id'])
+                students.append(doc['student_id'])
+        return changed, students
+
+    def _patch(self, collection, key, changes):
+        doc = self.mirror.get_many(collection, [key]).get(key_of(key))
+        if doc is None:
+            return False
+        doc.update(changes)
+        self.mirror.put_many(collection, [doc])
+        return True
+
+    # Sync
+
+    def conflict(self, base, touched):
+        # Returns why a queued write must not be replayed, or None.
+        for target, expected in base.items():
+            if target in touched or not expected:
+                continue
+            collection, key = target.split(':', 1)
+            field = KEYS[collection]
+            doc = self.service.db[collection].find_one({field: ObjectId(key) if field == '_id' else key},
+                                                       dict.fromkeys(expected, 1))
+            if doc is None:
+                return f"{collection} {key} was deleted on the server"
+            changed = [name for name, value in expected.items() if doc.get(name) != value]
+            if changed:
+                return f"{collection} {key}: {', '.join(changed)} changed on the server after the offline edit"
+        return None
+
+    def sync(self, full=False):
+        report = {'applied': 0, 'conflicts': [], 'pulled': 0, 'queued': 0}
+        with self.sync_lock:
+            touched = set()
+            try:
+                for entry_id, op, args, base in self.mirror.outbox():
+                    reason = self.conflict(base, touched) if op in self.CHECKED else None
+                    if reason is None:
+                        try:
+                            getattr(self.service, op)(*args)
+                        except (OperationFailure, ValueError) as err:
+                            # Rejected by the server (duplicate key, validator,
+                            # ...) or the service; replaying it again would fail
+                            # the same way and hold up the rest of the queue.
+                            # ConnectionFailure is not an OperationFailure, so
+                            # it still stops the sync with the entry queued.
+                            reason = str(err)
+                    self.mirror.done(entry_id, reason)
+                    if reason is None:
+                        report['applied'] += 1
+                        touched.update(base)
+                    else:
+                        report['conflicts'].append((op, reason))
+                        log.warning("Offline %s not applied: %s", op, reason)
+                report['pulled'] = self.mirror.pull(self.service.db, full)
+            except ConnectionFailure as err:
+                log.info("Sync stopped, MongoDB unreachable: %s", err)
+            report['queued'] = self.mirror.pending()
+        return report
+
+    def conflicts(self):
+        return self.mirror.conflicts()
+
+    def archive_semester(self, semester):
+        archived = self.service.archive_semester(semester)
+        self.mirror.drop_closed(closed_semesters(self.service.db))
+        return archived
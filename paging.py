@@ -0,0 +1,204 @@
+from bisect import bisect_left
+
+PAGE_SIZE = 200
+MAX_PAGES = 3
+SCROLL_EDGE = 0.02
+
+def combine_filters(*filters):
+    conditions = [condition for condition in filters if condition]
+    if len(conditions) > 1:
+        return {'$and': conditions}
+    return conditions[0] if conditions else {}
+
+def window_filter(match, field, after=None, before=None):
+    return combine_filters(
+        match,
+        {field: {'$gt': after}} if after is not None else None,
+        {field: {'$lt': before}} if before is not None else None
+    )
+
+def window_stages(match, field, after=None, before=None, limit=None):
+    query = window_filter(match, field, after, before)
+    stages = [{'$match': query}] if query else []
+    if limit:
+        stages.append({'$sort': {field: -1 if before is not None else 1}})
+        stages.append({'$limit': limit})
+    return stages
+
+def window_find(collection, match, field, after=None, before=None, limit=None, projection=None, collation=None):
+    cursor = collection.find(window_filter(match, field, after, before), projection, collation=collation)
+    if limit:
+        cursor = cursor.sort(field, -1 if before is not None else 1).limit(limit)
+    return cursor
+
+class PagedTable:
+    # Keeps at most MAX_PAGES pages of a Treeview materialized. Pages are fetched
+    # with range cursors on the sort field (``fetch(after=..., before=..., limit=...)``
+    # returning ascending ``(key, iid, values)`` rows), so no $skip scans are needed.
+    # ``search`` is passed through to fetch unchanged and narrows every page.
+    # ``on_loading(busy)`` is told when a reload starts and when it finishes.
+    # Reloads are submitted under ``key``, so repeats while one is in flight
+    # collapse into a single rerun.
+
+    def __init__(self, table, scrollbar, worker, fetch, page_size=PAGE_SIZE, max_pages=MAX_PAGES, on_loading=None,
+                 key=None):
+        self.table = table
+        self.scrollbar = scrollbar
+        self.worker = worker
+        self.fetch = fetch
+        self.page_size = page_size
+        self.max_rows = page_size * max_pages
+        self.keys = {}
+        self.search = None
+        self.has_before = False
+        self.has_after = False
+        self.loading = False
+        self.generation = 0
+        self.on_loading = on_loading
+        self.key = key
+        table.configure(yscrollcommand=self._on_scroll)
+        scrollbar.configure(command=table.yview)
+
+    def set_search(self, search):
+        self.search = search or None
+        self.reload()
+
+    def _fetch(self, after, before, search):
+        return self.fetch(after, before, self.page_size, search=search)
+
+    def reload(self):
+        self.generation += 1
+        self.loading = True
+        self._notify(True)
+        self.worker.submit(self._fetch, None, None, self.search, key=self.key,
+                           on_done=lambda rows, generation=self.generation: self._loaded(generation, rows),
+                           on_error=lambda err, generation=self.generation: self._failed(generation, err))
+
+    def load_next(self):
+        children = self.table.get_children()
+        if self.loading or not self.has_after or not children:
+            return
+        self.loading = True
+        self.worker.submit(self._fetch, self.keys[children[-1]], None, self.search,
+                           on_done=lambda rows, generation=self.generation: self._appended(generation, rows),
+                           on_error=lambda err, generation=self.generation: self._failed(generation, err))
+
+    def load_previous(self):
+        children = self.table.get_children()
+        if self.loading or not self.has_before or not children:
+            return
+        self.loading = True
+        self.worker.submit(self._fetch, None, self.keys[children[0]], self.search,
+                           on_done=lambda rows, generation=self.generation: self._prepended(generation, rows),
+                           on_error=lambda err, generation=self.generation: self._failed(generation, err))
+
+    def paint(self, rows):
+        # Shows rows saved from an earlier session until the first reload
+        # replaces them; paging stays off until then.
+        if self.table.get_children():
+            return
+        for key, iid, values in rows:
+            self.table.insert("", "end", iid=iid, values=values)
+            self.keys[iid] = key
+
+    def first_page(self):
+        # The rows worth saving for the next paint: the unfiltered top page.
+        if self.search or self.has_before:
+            return None
+        return [(self.keys[iid], iid, self.table.item(iid, 'values'))
+                for iid in self.table.get_children()[:self.page_size]]
+
+    def upsert(self, key, iid, values):
+        if self.table.exists(iid):
+            self.table.item(iid, values=values)
+            return
+        children = self.table.get_children()
+        ordered = [self.keys[child] for child in children]
+        if self.has_before and ordered and key < ordered[0]:
+            return
+        if self.has_after and ordered and key > ordered[-1]:
+            return
+        index = bisect_left(ordered, key)
+        self.table.insert("", index if index < len(children) else "end", iid=iid, values=values)
+        self.keys[iid] = key
+
+    def remove(self, iids):
+        for iid in iids:
+            if self.table.exists(iid):
+                self.table.delete(iid)
+                del self.keys[iid]
+
+    def patch(self, iids, rows):
+        found = set()
+        for key, iid, values in rows:
+            self.upsert(key, iid, values)
+            found.add(iid)
+        self.remove(set(iids) - found)
+
+    # A short page means the end of the range is on screen, so rows inserted
+    # past it (e.g. by live updates) belong in the table.
+    def _loaded(self, generation, rows):
+        if generation != self.generation:
+            return
+        self.loading = False
+        self._notify(False)
+        self.table.delete(*self.table.get_children())
+        self.keys.clear()
+        for key, iid, values in rows:
+            self.table.insert("", "end", iid=iid, values=values)
+            self.keys[iid] = key
+        self.has_before = False
+        self.has_after = len(rows) >= self.page_size
+
+    def _appended(self, generation, rows):
+        if generation != self.generation:
+            return
+        self.loading = False
+        self.has_after = len(rows) >= self.page_size
+        if not rows:
+            return
+        anchor = self.table.get_children()[-1]
+        for key, iid, values in rows:
+            if not self.table.exists(iid):
+                self.table.insert("", "end", iid=iid, values=values)
+                self.keys[iid] = key
+        children = self.table.get_children()
+        if len(children) > self.max_rows:
+            self.remove(children[:len(children) - self.max_rows])
+            self.has_before = True
+        self.table.see(anchor)
+
+    def _prepended(self, generation, rows):
+        if generation != self.generation:
+            return
+        self.loading = False
+        self.has_before = len(rows) >= self.page_size
+        if not rows:
+            return
+        anchor = self.table.get_children()[0]
+        for index, (key, iid, values) in enumerate(rows):
+            if not self.table.exists(iid):
+                self.table.insert("", index, iid=iid, values=values)
+                self.keys[iid] = key
+        children = self.table.get_children()
+        if len(children) > self.max_rows:
+            self.remove(children[self.max_rows:])
+            self.has_after = True
+        self.table.see(anchor)
+
+    def _failed(self, generation, err):
+        if generation == self.generation:
+            self.loading = False
+            self._notify(False)
+        self.worker.on_error(err)
+
+    def _notify(self, busy):
+        if self.on_loading is not None:
+            self.on_loading(busy)
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(last) >= 1 - SCROLL_EDGE:
+            self.load_next()
+        elif float(first) <= SCROLL_EDGE:
+            self.load_previous()
@@ -0,0 +1,34 @@
+import logging
+import os
+import time
+
+from bson import json_util
+
+log = logging.getLogger(__name__)
+
+VERSION = 1
+
+# The first page of each table as it was last shown, so the next launch can
+# paint it before the server has answered. The file is tagged with the
+# database name; a snapshot of another database is ignored.
+
+def load_rows(path, source):
+    try:
+        with open(path, encoding='utf-8') as f:
+            saved = json_util.loads(f.read())
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as err:
+        log.warning("Ignoring row snapshot %s: %s", path, err)
+        return {}
+    if saved.get('version') != VERSION or saved.get('source') != source:
+        return {}
+    return {name: [tuple(row) for row in rows] for name, rows in saved['tables'].items()}
+
+def save_rows(path, source, tables):
+    saved = {'version': VERSION, 'source': source, 'saved_at': time.time(),
+             'tables': {name: [list(row) for row in rows] for name, rows in tables.items() if rows is not None}}
+    partial = f'{path}.tmp'
+    with open(partial, 'w', encoding='utf-8') as f:
+        f.write(json_util.dumps(saved))
+    os.replace(partial, path)
@@ -0,0 +1,135 @@
+import argparse
+import logging
+
+from datetime import datetime
+
+from pymongo import UpdateOne
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+from connection import connect
+from models import parse_date
+from stats import BATCH_SIZE, COURSE_FIELDS, GRADES, STUDENT_FIELDS
+
+log = logging.getLogger(__name__)
+
+# 'moderate' validates every insert and every update of a document that is
+# already valid, but lets legacy documents that predate the schema be updated.
+VALIDATION_LEVEL = 'moderate'
+VALIDATION_ACTION = 'error'
+
+def text(required=True):
+    return {'bsonType': 'string', 'minLength': 1} if required else {'bsonType': 'string'}
+
+def counters(fields):
+    return {
+        fields['count']: {'bsonType': ['int', 'long'], 'minimum': 0},
+        fields['graded']: {'bsonType': ['int', 'long'], 'minimum': 0},
+        fields['points']: {'bsonType': 'number', 'minimum': 0},
+    }
+
+SCHEMAS = {
+    'students': {
+        'bsonType': 'object',
+        'required': ['first_name', 'last_name', 'email'],
+        'properties': {
+            'first_name': text(),
+            'last_name': text(),
+            'email': text(),
+            'major': text(required=False),
+            'date_of_birth': {'bsonType': ['date', 'null']},
+            'enrollment_date': {'bsonType': ['date', 'null']},
+            'updated_at': {'bsonType': ['date', 'null']},
+            **counters(STUDENT_FIELDS),
+        },
+    },
+    'courses': {
+        'bsonType': 'object',
+        'required': ['course_id', 'course_name', 'department', 'credits'],
+        'properties': {
+            'course_id': text(),
+            'course_name': text(),
+            'department': text(),
+            'credits': {'bsonType': ['int', 'long'], 'minimum': 0},
+            'instructor': text(required=False),
+            'updated_at': {'bsonType': ['date', 'null']},
+            **counters(COURSE_FIELDS),
+        },
+    },
+    'enrollments': {
+        'bsonType': 'object',
+        'required': ['student_id', 'course_id', 'semester'],
+        'properties': {
+            'student_id': {'bsonType': 'objectId'},
+            'course_id': text(),
+            'semester': text(),
+            'grade': {'enum': [*GRADES, None]},
+            'enrollment_date': {'bsonType': ['date', 'null']},
+            'updated_at': {'bsonType': ['date', 'null']},
+        },
+    },
+}
+
+def validator_options(schema):
+    return {'validator': {'$jsonSchema': schema}, 'validationLevel': VALIDATION_LEVEL,
+            'validationAction': VALIDATION_ACTION}
+
+def ensure_validators(db, schemas=SCHEMAS):
+    # Like ensure_indexes, only sends collMod when the installed validator
+    # differs, so a normal launch costs one listCollections.
+    existing = {info['name']: info.get('options', {}) for info in db.list_collections()}
+    changed = []
+    for collection, schema in schemas.items():
+        wanted = validator_options(schema)
+        current = existing.get(collection)
+        if current is not None and all(current.get(key) == value for key, value in wanted.items()):
+            continue
+        try:
+            if current is None:
+                db.create_collection(collection, **wanted)
+            else:
+                db.command('collMod', collection, **wanted)
+        except (CollectionInvalid, OperationFailure) as err:
+            log.warning("Could not install the %s validator: %s", collection, err)
+            continue
+        changed.append(collection)
+    return changed
+
+def migrate_dates(db, batch_size=BATCH_SIZE):
+    # Converts date_of_birth strings (MMDDYY or YYYY-MM-DD) to BSON dates. The
+    # filter on the old value keeps a concurrent edit from being overwritten;
+    # strings that do not parse are logged and left for a person to fix.
+    converted, batch, now = 0, [], datetime.now()
+    for doc in db['students'].find({'date_of_birth': {'$type': 'string'}}, {'date_of_birth': 1}):
+        try:
+            value = parse_date(doc['date_of_birth'])
+        except ValueError as err:
+            log.warning("Student %s: %s", doc['_id'], err)
+            continue
+        batch.append(UpdateOne({'_id': doc['_id'], 'date_of_birth': doc['date_of_birth']},
+                               {'$set': {'date_of_birth': value, 'updated_at': now}}))
+        if len(batch) >= batch_size:
+            converted += db['students'].bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        converted += db['students'].bulk_write(batch, ordered=False).modified_count
+    return converted
+
+def ensure_schema(db):
+    changed = ensure_validators(db)
+    if 'students' in changed:
+        migrate_dates(db)
+    return changed
+
+def main():
+    parser = argparse.ArgumentParser(description="Install the collection validators and convert legacy dates of birth.")
+    parser.add_argument('--uri', help="defaults to ENROLLMENT_URI or enrollment.ini")
+    parser.add_argument('--db')
+    args = parser.parse_args()
+
+    db = connect(args.uri, args.db)
+    changed = ensure_validators(db)
+    print(f"Validators updated: {', '.join(changed) or 'none'}.")
+    print(f"Converted {migrate_dates(db)} dates of birth.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+from pymongo.collation import Collation
+
+from paging import combine_filters
+
+# Case-insensitive collation for name prefix searches; queries must pass the same
+# collation to use the *_ci indexes.
+NAME_COLLATION = Collation(locale='en', strength=2)
+
+# U+FFFF has the highest primary weight in the root collation, so
+# [prefix, prefix + U+FFFF) is an index range covering every string with that prefix.
+PREFIX_END = '\uffff'
+
+SEARCH_FIELDS = {
+    'students': (('Name', 'name'), ('Email', 'email'), ('Major', 'major')),
+    'courses': (('Course Name', 'name'), ('Department', 'department')),
+    'enrollments': (('Semester', 'semester'), ('Grade', 'grade'), ('Course ID', 'course_id')),
+}
+
+def prefix_range(value):
+    return {'$gte': value, '$lt': value + PREFIX_END}
+
+def student_search(search):
+    search = search or {}
+    name = search.get('name')
+    query = combine_filters(
+        {'$or': [{'first_name': prefix_range(name)}, {'last_name': prefix_range(name)}]} if name else None,
+        {'email': search['email']} if search.get('email') else None,
+        {'major': search['major']} if search.get('major') else None
+    )
+    return query, NAME_COLLATION if name else None
+
+def course_search(search):
+    search = search or {}
+    name = search.get('name')
+    query = combine_filters(
+        {'course_name': prefix_range(name)} if name else None,
+        {'department': search['department']} if search.get('department') else None
+    )
+    return query, NAME_COLLATION if name else None
+
+def enrollment_search(search):
+    search = search or {}
+    return combine_filters(
+        {'semester': search['semester']} if search.get('semester') else None,
+        {'grade': search['grade']} if search.get('grade') else None,
+        {'course_id': search['course_id']} if search.get('course_id') else None
+    )
@@ -0,0 +1,385 @@
+import heapq
+import logging
+from datetime import datetime
+from itertools import islice
+from operator import itemgetter
+
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import PyMongoError
+
+from analytics import build_snapshot
+from archive import ARCHIVE, TERMS, archive_semester, term_summary
+from cache import DisplayCache
+from changes import ChangeFeed
+from connection import ConnectionMonitor, connect
+from import_export import export_collection, import_file
+from indexes import ensure_indexes, report_collection_scans
+from instrumentation import CommandRecorder, explain_record
+from models import Course, Enrollment, Student, parse_date
+from paging import combine_filters, window_find
+from schema import ensure_schema
+from search import course_search, enrollment_search, student_search
+from stats import (COURSE_FIELDS, GRADES, STUDENT_FIELDS, average, enrollment_added,
+                   enrollment_regraded, enrollments_regraded, enrollments_removed, ensure_stats, rebuild_stats, verify_stats)
+
+log = logging.getLogger(__name__)
+
+STUDENT_EDITABLE = ('first_name', 'last_name', 'email', 'date_of_birth', 'major')
+COURSE_EDITABLE = ('course_name', 'department', 'credits', 'instructor')
+
+def require(data, *fields, partial=False):
+    missing = [field for field in fields if not data.get(field) and (field in data or not partial)]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+
+def check_grade(grade):
+    if grade is not None and grade not in GRADES:
+        raise ValueError(f"Grade must be one of {', '.join(GRADES)}.")
+
+def ascending(docs, before):
+    docs = list(docs)
+    return docs[::-1] if before is not None else docs
+
+class EnrollmentService:
+    # Data access for students, courses and enrollments with no Tk dependency.
+    # Every method is a plain blocking call, so the GUI runs them on its worker
+    # pool while scripts and batch jobs can call them directly.
+
+    def __init__(self, db, monitor=None, recorder=None):
+        self.db = db
+        self.monitor = monitor
+        self.recorder = recorder
+        self.client = db.client
+        self.students = db['students']
+        self.courses = db['courses']
+        self.enrollments = db['enrollments']
+        self.archive = db[ARCHIVE]
+        self.cache = DisplayCache(db)
+        self.feed = None
+        self.transactions = None
+
+    @classmethod
+    def connect(cls, uri=None, db_name=None, **client_options):
+        # Settings come from connection.load_settings(); uri and db_name override them.
+        monitor, recorder = ConnectionMonitor(), CommandRecorder()
+        return cls(connect(uri, db_name, (monitor, recorder), **client_options), monitor, recorder)
+
+    def watch(self, handler=None):
+        def dispatch(change):
+            self.cache.apply_change(change)
+            if handler is not None:
+                handler(change)
+
+        if self.feed is None:
+            self.feed = ChangeFeed(self.db, dispatch).start()
+        return self.feed
+
+    def close(self):
+        if self.feed is not None:
+            self.feed.stop()
+            self.feed = None
+        self.client.close()
+
+    def supports_transactions(self):
+        if self.transactions is None:
+            try:
+                hello = self.db.command('hello')
+            except PyMongoError as err:
+                log.warning("Could not check for transaction support: %s", err)
+                return False
+            self.transactions = 'setName' in hello or hello.get('msg') == 'isdbgrid'
+            if not self.transactions:
+                log.warning("MongoDB is running standalone; multi-document writes will not be atomic.")
+        return self.transactions
+
+    # Runs work(session) in a transaction. with_transaction retries the whole
+    # callback on TransientTransactionError (e.g. a write conflict with another
+    # desk) and retries the commit on UnknownTransactionCommitResult. Standalone
+    # servers cannot run transactions, so there work(None) runs directly.
+    def run_transaction(self, work):
+        if not self.supports_transactions():
+            return work(None)
+        with self.client.start_session() as session:
+            return session.with_transaction(work)
+
+    def prepare(self):
+        ensure_schema(self.db)
+        ensure_indexes(self.db)
+        ensure_stats(self.db)
+
+    def connection_stats(self):
+        return self.monitor.stats() if self.monitor is not None else None
+
+    def explain_command(self, record_id):
+        record = self.recorder.get(record_id)
+        if record is None:
+            raise ValueError("That command is no longer in the diagnostics buffer.")
+        return explain_record(self.db, record)
+
+    def export_diagnostics(self, path):
+        return self.recorder.export(path)
+
+    def report_collection_scans(self):
+        return report_collection_scans(self.db)
+
+    def add_student(self, data):
+        require(data, 'first_name', 'last_name', 'email')
+        now = datetime.now()
+        student = Student(data['first_name'], data['last_name'], data['email'], data.get('major', ''),
+                          parse_date(data.get('date_of_birth')), enrollment_date=data.get('enrollment_date') or now,
+                          updated_at=now, id=ObjectId(data['_id']) if data.get('_id') else None)
+        return self.students.insert_one(student.to_doc()).inserted_id
+
+    def update_student(self, student_id, changes):
+        changes = {field: value for field, value in changes.items() if field in STUDENT_EDITABLE}
+        require(changes, 'first_name', 'last_name', 'email', partial=True)
+        if 'date_of_birth' in changes:
+            changes['date_of_birth'] = parse_date(changes['date_of_birth'])
+        changes['updated_at'] = datetime.now()
+        result = self.students.update_one({'_id': ObjectId(student_id)}, {'$set': changes})
+        self.cache.invalidate_student(ObjectId(student_id))
+        return result.matched_count == 1
+
+    def delete_student(self, student_id):
+        return self.delete_students([student_id])
+
+    def delete_students(self, student_ids):
+        student_ids = [ObjectId(student_id) for student_id in student_ids]
+
+        def work(session):
+            removed = list(self.enrollments.find({'student_id': {'$in': student_ids}},
+                                                 {'student_id': 1, 'course_id': 1, 'grade': 1}, session=session))
+            self.enrollments.delete_many({'student_id': {'$in': student_ids}}, session=session)
+            self.students.delete_many({'_id': {'$in': student_ids}}, session=session)
+            _, affected_courses = enrollments_removed(self.db, removed, session=session)
+            return affected_courses
+
+        affected_courses = self.run_transaction(work)
+        for student_id in student_ids:
+            self.cache.invalidate_student(student_id)
+        return affected_courses
+
+    def add_course(self, data):
+        require(data, 'course_id', 'course_name', 'department', 'credits')
+        course = Course(data['course_id'], data['course_name'], data['department'], int(data['credits']),
+                        data.get('instructor', ''), updated_at=datetime.now())
+        self.courses.insert_one(course.to_doc())
+        return course.course_id
+
+    def update_course(self, course_id, changes):
+        changes = {field: value for field, value in changes.items() if field in COURSE_EDITABLE}
+        require(changes, 'course_name', 'department', 'credits', partial=True)
+        if 'credits' in changes:
+            changes['credits'] = int(changes['credits'])
+        changes['updated_at'] = datetime.now()
+        result = self.courses.update_one({'course_id': course_id}, {'$set': changes})
+        self.cache.invalidate_course(course_id)
+        return result.matched_count == 1
+
+    def delete_course(self, course_id):
+        return self.delete_courses([course_id])
+
+    def delete_courses(self, course_ids):
+        course_ids = list(course_ids)
+
+        def work(session):
+            removed = list(self.enrollments.find({'course_id': {'$in': course_ids}},
+                                                 {'student_id': 1, 'course_id': 1, 'grade': 1}, session=session))
+            self.enrollments.delete_many({'course_id': {'$in': course_ids}}, session=session)
+            self.courses.delete_many({'course_id': {'$in': course_ids}}, session=session)
+            affected_students, _ = enrollments_removed(self.db, removed, session=session)
+            return affected_students
+
+        affected_students = self.run_transaction(work)
+        for course_id in course_ids:
+            self.cache.invalidate_course(course_id)
+        return affected_students
+
+    # ``enrollment_id`` lets a caller pick the _id up front, e.g. for a write
+    # queued while offline that must keep the id the UI already shows.
+    def add_enrollment(self, student_id, course_id, semester, grade=None, enrollment_id=None):
+        require({'semester': semester}, 'semester')
+        check_grade(grade)
+        now = datetime.now()
+        enrollment = Enrollment(ObjectId(student_id), course_id, semester, now, grade, updated_at=now,
+                                id=ObjectId(enrollment_id) if enrollment_id else None)
+
+        # The stats $inc writes the student and course documents, so a delete of
+        # either running at the same time conflicts with this transaction and is
+        # retried instead of leaving an orphaned enrollment behind.
+        def work(session):
+            self.check_open(semester, session)
+            if self.students.find_one({'_id': enrollment.student_id}, {'_id': 1}, session=session) is None:
+                raise ValueError("The selected student no longer exists.")
+            if self.courses.find_one({'course_id': course_id}, {'_id': 1}, session=session) is None:
+                raise ValueError("The selected course no longer exists.")
+            doc = enrollment.to_doc()
+            enrollment_id = self.enrollments.insert_one(doc, session=session).inserted_id
+            enrollment_added(self.db, doc['student_id'], course_id, grade, session=session)
+            return enrollment_id
+
+        return self.run_transaction(work)
+
+    def update_enrollment(self, enrollment_id, semester, grade=None):
+        require({'semester': semester}, 'semester')
+        check_grade(grade)
+
+        def work(session):
+            self.check_open(semester, session)
+            previous = self.enrollments.find_one_and_update(
+                {'_id': ObjectId(enrollment_id)},
+                {'$set': {
+                    'semester': semester,
+                    'grade': grade,
+                    'updated_at': datetime.now()
+                }},
+                return_document=ReturnDocument.BEFORE,
+                session=session
+            )
+            if previous is None:
+                # Archived rows are listed with "Include archived terms" but
+                # live in enrollments_archive, which is read-only.
+                raise ValueError("The selected enrollment is archived or no longer exists.")
+            enrollment_regraded(self.db, previous['student_id'], previous['course_id'], previous.get('grade'),
+                                grade, session=session)
+            return previous
+
+        return self.run_transaction(work)
+
+    def grade_sheet(self, course_id, semester):
+        enrollments = list(self.enrollments.find({'course_id': course_id, 'semester': semester},
+                                                 {'student_id': 1, 'course_id': 1, 'grade': 1}))
+        students = self.cache.get_students(enrollment['student_id'] for enrollment in enrollments)
+        sheet = [{**enrollment, 'student': students[enrollment['student_id']]}
+                 for enrollment in enrollments if enrollment['student_id'] in students]
+        sheet.sort(key=lambda row: (row['student'].get('last_name', ''), row['student'].get('first_name', '')))
+        return sheet
+
+    # ``grades`` maps enrollment ids to the new grade (None clears it). Only
+    # rows whose grade actually changed are written: one bulk_write for the
+    # enrollments and one $inc batch per stats collection, in one transaction.
+    def save_grades(self, course_id, semester, grades):
+        grades = {ObjectId(enrollment_id): grade or None for enrollment_id, grade in grades.items()}
+        for grade in grades.values():
+            check_grade(grade)
+
+        def work(session):
+            self.check_open(semester, session)
+            current = self.enrollments.find({'_id': {'$in': list(grades)}, 'course_id': course_id, 'semester': semester},
+                                            {'student_id': 1, 'grade': 1}, session=session)
+            changes = [(doc['_id'], doc['student_id'], doc.get('grade'), grades[doc['_id']])
+                       for doc in current if doc.get('grade') != grades[doc['_id']]]
+            if not changes:
+                return [], []
+            now = datetime.now()
+            self.enrollments.bulk_write([
+                UpdateOne({'_id': enrollment_id}, {'$set': {'grade': new, 'updated_at': now}})
+                for enrollment_id, _, _, new in changes
+            ], ordered=False, session=session)
+            enrollments_regraded(self.db, [(student_id, course_id, old, new) for _, student_id, old, new in changes],
+                                 session=session)
+            return [change[0] for change in changes], [change[1] for change in changes]
+
+        return self.run_transaction(work)
+
+    def delete_enrollment(self, enrollment_id):
+        removed = self.delete_enrollments([enrollment_id])
+        return removed[0] if removed else None
+
+    def delete_enrollments(self, enrollment_ids):
+        enrollment_ids = [ObjectId(enrollment_id) for enrollment_id in enrollment_ids]
+
+        def work(session):
+            removed = list(self.enrollments.find({'_id': {'$in': enrollment_ids}},
+                                                 {'student_id': 1, 'course_id': 1, 'grade': 1}, session=session))
+            if len(removed) < len(set(enrollment_ids)):
+                raise ValueError("Some of the selected enrollments are archived or no longer exist; nothing was deleted.")
+            self.enrollments.delete_many({'_id': {'$in': [doc['_id'] for doc in removed]}}, session=session)
+            enrollments_removed(self.db, removed, session=session)
+            return removed
+
+        return self.run_transaction(work)
+
+    def check_open(self, semester, session=None):
+        if self.db[TERMS].find_one({'_id': semester}, {'_id': 1}, session=session) is not None:
+            raise ValueError(f"Semester {semester} is closed; its enrollments have been archived.")
+
+    def archive_semester(self, semester):
+        require({'semester': semester}, 'semester')
+        return archive_semester(self.db, semester)
+
+    def term_summary(self):
+        return term_summary(self.db)
+
+    # ``search`` is a dict of the filters in search.SEARCH_FIELDS, e.g.
+    # {'name': 'bal', 'major': 'BSIT'}; it is applied before any join.
+    def list_students(self, after=None, before=None, limit=None, match=None, search=None):
+        query, collation = student_search(search)
+        students = window_find(self.students, combine_filters(match, query), '_id', after, before, limit,
+                               Student.PROJECTION, collation)
+        return ascending(students, before)
+
+    def list_courses(self, after=None, before=None, limit=None, match=None, search=None):
+        query, collation = course_search(search)
+        courses = window_find(self.courses, combine_filters(match, query), 'course_id', after, before, limit,
+                              Course.PROJECTION, collation)
+        return ascending(courses, before)
+
+    # Only open terms are listed unless ``search`` has 'history': True; then the
+    # archive is paged alongside and the two _id-ordered windows are merged.
+    def list_enrollments(self, after=None, before=None, limit=None, match=None, search=None):
+        query = combine_filters(match, enrollment_search(search))
+        if search and search.get('history'):
+            windows = [window_find(collection, query, '_id', after, before, limit, Enrollment.PROJECTION)
+                       for collection in (self.enrollments, self.archive)]
+            merged = heapq.merge(*windows, key=itemgetter('_id'), reverse=before is not None)
+            enrollments = ascending(islice(merged, limit), before)
+        else:
+            enrollments = ascending(window_find(self.enrollments, query, '_id', after, before, limit,
+                                                Enrollment.PROJECTION), before)
+        return self.join_display(enrollments)
+
+    # Attaches 'student' and 'course' display fields from the cache; like the
+    # old $lookup + $unwind join, enrollments whose student or course is gone
+    # are dropped.
+    def join_display(self, enrollments):
+        students = self.cache.get_students(enrollment['student_id'] for enrollment in enrollments)
+        courses = self.cache.get_courses(enrollment['course_id'] for enrollment in enrollments)
+        joined = []
+        for enrollment in enrollments:
+            student = students.get(enrollment['student_id'])
+            course = courses.get(enrollment['course_id'])
+            if student is not None and course is not None:
+                joined.append({**enrollment, 'student': student, 'course': course})
+        return joined
+
+    def cache_stats(self):
+        return self.cache.stats()
+
+    def student_stats(self, student_id):
+        student = self.students.find_one({'_id': ObjectId(student_id)}, list(STUDENT_FIELDS.values()))
+        if student is None:
+            return None
+        return {'total_courses': student.get('total_courses', 0), 'gwa': average(student, STUDENT_FIELDS)}
+
+    def course_stats(self, course_id):
+        course = self.courses.find_one({'course_id': course_id}, list(COURSE_FIELDS.values()))
+        if course is None:
+            return None
+        return {'enrolled_students': course.get('enrolled_students', 0), 'avg_course_grade': average(course, COURSE_FIELDS)}
+
+    def analytics_snapshot(self):
+        return build_snapshot(self.db)
+
+    def rebuild_stats(self, student_ids=None, course_ids=None):
+        return rebuild_stats(self.db, student_ids, course_ids)
+
+    def verify_stats(self):
+        return verify_stats(self.db)
+
+    def import_records(self, collection, path, fmt=None):
+        return import_file(self.db, collection, path, fmt)
+
+    def export_records(self, collection, path, fmt=None):
+        return export_collection(self.db, collection, path, fmt)
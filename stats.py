@@ -0,0 +1,205 @@
+import argparse
+from collections import defaultdict
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from connection import connect
+
+GRADE_POINTS = {'A': 1.0, 'B': 2.0, 'C': 3.0, 'D': 4.0, 'F': 5.0}
+GRADES = (*GRADE_POINTS, 'Incomplete')
+
+# Counters kept on each student/course document. GWA and the course average are
+# grade_points / graded; ungraded and Incomplete enrollments only count towards
+# the totals.
+STUDENT_FIELDS = {'count': 'total_courses', 'graded': 'graded_courses', 'points': 'grade_points'}
+COURSE_FIELDS = {'count': 'enrolled_students', 'graded': 'graded_students', 'points': 'grade_points'}
+
+BATCH_SIZE = 1000
+
+# Final per-term totals for archived semesters (see archive.py), one document
+# per (semester, group, key) with generic count/graded/points fields. Rebuilds
+# add these instead of rescanning the archive.
+TERM_STATS = 'term_stats'
+
+def empty_stats(fields):
+    return {fields['count']: 0, fields['graded']: 0, fields['points']: 0.0}
+
+def average(doc, fields):
+    graded = doc.get(fields['graded'], 0)
+    return doc.get(fields['points'], 0.0) / graded if graded else None
+
+def grade_increment(fields, grade, sign=1, count=True):
+    increment = {fields['count']: sign} if count else {}
+    points = GRADE_POINTS.get(grade)
+    if points is not None:
+        increment[fields['graded']] = sign
+        increment[fields['points']] = sign * points
+    return increment
+
+# Counter writes stamp updated_at like every other write, so the updated_at
+# polling in changes.py and the offline mirror's pull see them.
+def counter_update(increment):
+    return {'$inc': increment, '$set': {'updated_at': datetime.now()}}
+
+def merge_increment(total, increment):
+    for field, value in increment.items():
+        total[field] = total.get(field, 0) + value
+
+def enrollment_added(db, student_id, course_id, grade=None, session=None):
+    db['students'].update_one({'_id': student_id}, counter_update(grade_increment(STUDENT_FIELDS, grade)),
+                              session=session)
+    db['courses'].update_one({'course_id': course_id}, counter_update(grade_increment(COURSE_FIELDS, grade)),
+                             session=session)
+
+def enrollment_regraded(db, student_id, course_id, old_grade, new_grade, session=None):
+    student_inc = grade_increment(STUDENT_FIELDS, old_grade, -1, count=False)
+    merge_increment(student_inc, grade_increment(STUDENT_FIELDS, new_grade, count=False))
+    course_inc = grade_increment(COURSE_FIELDS, old_grade, -1, count=False)
+    merge_increment(course_inc, grade_increment(COURSE_FIELDS, new_grade, count=False))
+    student_inc = {field: value for field, value in student_inc.items() if value}
+    course_inc = {field: value for field, value in course_inc.items() if value}
+    if student_inc:
+        db['students'].update_one({'_id': student_id}, counter_update(student_inc), session=session)
+    if course_inc:
+        db['courses'].update_one({'course_id': course_id}, counter_update(course_inc), session=session)
+
+def enrollments_removed(db, enrollments, session=None):
+    student_incs = defaultdict(dict)
+    course_incs = defaultdict(dict)
+    for enrollment in enrollments:
+        merge_increment(student_incs[enrollment['student_id']],
+                        grade_increment(STUDENT_FIELDS, enrollment.get('grade'), -1))
+        merge_increment(course_incs[enrollment['course_id']],
+                        grade_increment(COURSE_FIELDS, enrollment.get('grade'), -1))
+    if student_incs:
+        db['students'].bulk_write([UpdateOne({'_id': student_id}, counter_update(inc))
+                                   for student_id, inc in student_incs.items()], ordered=False, session=session)
+    if course_incs:
+        db['courses'].bulk_write([UpdateOne({'course_id': course_id}, counter_update(inc))
+                                  for course_id, inc in course_incs.items()], ordered=False, session=session)
+    return list(student_incs), list(course_incs)
+
+# ``changes`` is a list of (student_id, course_id, old_grade, new_grade); the
+# counters move in one bulk $inc per collection however many rows changed.
+def enrollments_regraded(db, changes, session=None):
+    student_incs = defaultdict(dict)
+    course_incs = defaultdict(dict)
+    for student_id, course_id, old_grade, new_grade in changes:
+        for incs, key, fields in ((student_incs, student_id, STUDENT_FIELDS), (course_incs, course_id, COURSE_FIELDS)):
+            merge_increment(incs[key], grade_increment(fields, old_grade, -1, count=False))
+            merge_increment(incs[key], grade_increment(fields, new_grade, count=False))
+    student_ops = [UpdateOne({'_id': student_id},
+                             counter_update({field: value for field, value in inc.items() if value}))
+                   for student_id, inc in student_incs.items() if any(inc.values())]
+    course_ops = [UpdateOne({'course_id': course_id},
+                            counter_update({field: value for field, value in inc.items() if value}))
+                  for course_id, inc in course_incs.items() if any(inc.values())]
+    if student_ops:
+        db['students'].bulk_write(student_ops, ordered=False, session=session)
+    if course_ops:
+        db['courses'].bulk_write(course_ops, ordered=False, session=session)
+    return list(student_incs), list(course_incs)
+
+def grade_points_expression(field='$grade'):
+    return {
+        '$switch': {
+            'branches': [{'case': {'$eq': [field, grade]}, 'then': points} for grade, points in GRADE_POINTS.items()],
+            'default': None
+        }
+    }
+
+def stats_group(group_field, fields=None):
+    fields = fields or {'count': 'count', 'graded': 'graded', 'points': 'points'}
+    return {
+        '$group': {
+            '_id': f'${group_field}',
+            fields['count']: {'$sum': 1},
+            fields['graded']: {'$sum': {'$cond': [{'$in': ['$grade', list(GRADE_POINTS)]}, 1, 0]}},
+            fields['points']: {'$sum': grade_points_expression()}
+        }
+    }
+
+def archived_stats(db, group_field, ids=None):
+    match = {'group': group_field}
+    if ids is not None:
+        match['key'] = {'$in': list(ids)}
+    pipeline = [
+        {'$match': match},
+        {'$group': {'_id': '$key', 'count': {'$sum': '$count'}, 'graded': {'$sum': '$graded'},
+                    'points': {'$sum': '$points'}}}
+    ]
+    return db[TERM_STATS].aggregate(pipeline)
+
+def compute_stats(db, group_field, fields, ids=None):
+    pipeline = [{'$match': {group_field: {'$in': list(ids)}}}] if ids is not None else []
+    pipeline.append(stats_group(group_field, fields))
+    stats = {group['_id']: {field: group[field] for field in fields.values()}
+             for group in db['enrollments'].aggregate(pipeline, allowDiskUse=True)}
+    for group in archived_stats(db, group_field, ids):
+        merge_increment(stats.setdefault(group['_id'], empty_stats(fields)),
+                        {fields[name]: group[name] for name in ('count', 'graded', 'points')})
+    return stats
+
+TARGETS = (
+    ('students', '_id', 'student_id', STUDENT_FIELDS),
+    ('courses', 'course_id', 'course_id', COURSE_FIELDS),
+)
+
+def rebuild_stats(db, student_ids=None, course_ids=None):
+    updated = 0
+    for (collection, key, group_field, fields), ids in zip(TARGETS, (student_ids, course_ids)):
+        expected = compute_stats(db, group_field, fields, ids)
+        query = {key: {'$in': list(ids)}} if ids is not None else {}
+        batch = []
+        for doc in db[collection].find(query, {key: 1}):
+            stats = expected.get(doc[key], empty_stats(fields))
+            # Only documents whose counters are wrong are written (and stamped).
+            batch.append(UpdateOne({key: doc[key], '$or': [{field: {'$ne': value}} for field, value in stats.items()]},
+                                   {'$set': {**stats, 'updated_at': datetime.now()}}))
+            if len(batch) >= BATCH_SIZE:
+                updated += db[collection].bulk_write(batch, ordered=False).modified_count
+                batch = []
+        if batch:
+            updated += db[collection].bulk_write(batch, ordered=False).modified_count
+    return updated
+
+def ensure_stats(db):
+    missing = [
+        [doc[key] for doc in db[collection].find({fields['count']: {'$exists': False}}, {key: 1})]
+        for collection, key, group_field, fields in TARGETS
+    ]
+    if any(missing):
+        return rebuild_stats(db, *missing)
+    return 0
+
+def verify_stats(db):
+    drift = []
+    for collection, key, group_field, fields in TARGETS:
+        expected = compute_stats(db, group_field, fields)
+        for doc in db[collection].find({}, {key: 1, **{field: 1 for field in fields.values()}}):
+            want = expected.get(doc[key], empty_stats(fields))
+            have = {field: doc.get(field, 0) for field in fields.values()}
+            if any(abs(have[field] - want[field]) > 1e-9 for field in fields.values()):
+                drift.append((collection, doc[key], have, want))
+    return drift
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify or rebuild the materialized enrollment statistics.")
+    parser.add_argument('command', choices=('verify', 'rebuild'))
+    parser.add_argument('--uri', help="defaults to ENROLLMENT_URI or enrollment.ini")
+    parser.add_argument('--db')
+    args = parser.parse_args()
+
+    db = connect(args.uri, args.db)
+    if args.command == 'rebuild':
+        print(f"Rebuilt statistics, {rebuild_stats(db)} documents changed.")
+        return
+    drift = verify_stats(db)
+    for collection, key, have, want in drift:
+        print(f"{collection} {key}: stored {have}, expected {want}")
+    print(f"{len(drift)} documents out of sync." if drift else "Statistics are in sync.")
+    raise SystemExit(1 if drift else 0)
+
+if __name__ == '__main__':
+    main()
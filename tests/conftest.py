@@ -0,0 +1,81 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Tests run against mongomock by default. Set ENROLLMENT_TEST_URI (e.g.
+# mongodb://localhost:27017) to run them against a real mongod instead; the
+# enrollment_test database there is dropped before and after each test.
+TEST_URI = os.environ.get('ENROLLMENT_TEST_URI')
+TEST_DB = 'enrollment_test'
+
+def sample_path(collection):
+    return os.path.join(ROOT, f'enrollment_db.{collection}.json')
+
+def mongomock_client():
+    mongomock = pytest.importorskip('mongomock')
+    from mongomock.collection import BulkOperationBuilder
+
+    # pymongo 4.11+ passes a sort option for UpdateOne/ReplaceOne in bulk
+    # writes, which mongomock 4.x does not accept yet.
+    for name in ('add_update', 'add_replace'):
+        method = getattr(BulkOperationBuilder, name)
+        if not getattr(method, 'drops_sort', False):
+            def without_sort(self, *args, _method=method, sort=None, **kwargs):
+                return _method(self, *args, **kwargs)
+            without_sort.drops_sort = True
+            setattr(BulkOperationBuilder, name, without_sort)
+    if not getattr(mongomock.Collection.aggregate, 'merges', False):
+        mongomock.Collection.aggregate = with_merge(mongomock.Collection.aggregate)
+    return mongomock.MongoClient()
+
+def with_merge(aggregate):
+    # mongomock does not implement $merge; archive.py only uses it on _id with
+    # replace/keepExisting and insert, which is all this covers.
+    def merging(self, pipeline, *args, **kwargs):
+        if not pipeline or '$merge' not in pipeline[-1]:
+            return aggregate(self, pipeline, *args, **kwargs)
+        spec = pipeline[-1]['$merge']
+        target = self.database[spec['into']]
+        for doc in aggregate(self, pipeline[:-1], *args, **kwargs):
+            if target.find_one({'_id': doc['_id']}) is None:
+                target.insert_one(doc)
+            elif spec['whenMatched'] == 'replace':
+                target.replace_one({'_id': doc['_id']}, doc)
+        return iter(())
+    merging.merges = True
+    return merging
+
+@pytest.fixture
+def db():
+    if TEST_URI:
+        from pymongo import MongoClient
+
+        client = MongoClient(TEST_URI, serverSelectionTimeoutMS=2000)
+        client.drop_database(TEST_DB)
+        yield client[TEST_DB]
+        client.drop_database(TEST_DB)
+        client.close()
+    else:
+        yield mongomock_client()[TEST_DB]
+
+@pytest.fixture
+def service(db):
+    from service import EnrollmentService
+
+    service = EnrollmentService(db)
+    if not TEST_URI:
+        # mongomock has no 'hello' command and no transactions.
+        service.transactions = False
+    return service
+
+@pytest.fixture
+def sample(db):
+    from import_export import import_file
+
+    for collection in ('students', 'courses', 'enrollments'):
+        import_file(db, collection, sample_path(collection))
+    return db
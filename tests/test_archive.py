@@ -0,0 +1,93 @@
+import math
+
+import pytest
+
+import archive
+from archive import ARCHIVE, TERMS, archive_semester, closed_semesters, term_stats, term_summary
+from stats import STUDENT_FIELDS, average, verify_stats
+
+@pytest.fixture
+def two_terms(service, sample):
+    # The sample enrollments are all in semester '1'; add an open term.
+    course_id = sample['courses'].find_one({})['course_id']
+    for student in sample['students'].find().limit(4):
+        service.add_enrollment(str(student['_id']), course_id, '2', 'B')
+    return sample
+
+def test_archive_moves_the_term_and_keeps_the_counters(service, two_terms):
+    db = two_terms
+    count = db['enrollments'].count_documents({'semester': '1'})
+    assert service.archive_semester('1') == count
+    assert db['enrollments'].count_documents({'semester': '1'}) == 0
+    assert db[ARCHIVE].count_documents({'semester': '1'}) == count
+    assert closed_semesters(db) == {'1'}
+    assert db[TERMS].find_one({'_id': '1'})['enrollments'] == count
+    assert sum(row['count'] for row in term_stats(db, '1')) == count
+    assert [(term['semester'], term['enrollments']) for term in term_summary(db)] == [('1', count), ('2', 4)]
+    assert verify_stats(db) == []
+
+def test_closed_terms_refuse_writes(service, two_terms):
+    service.archive_semester('1')
+    student = two_terms['students'].find_one({})
+    course = two_terms['courses'].find_one({})
+    with pytest.raises(ValueError):
+        service.add_enrollment(str(student['_id']), course['course_id'], '1')
+    with pytest.raises(ValueError):
+        service.archive_semester('1')
+
+def test_history_listing_merges_both_collections(service, two_terms):
+    service.archive_semester('1')
+    everything = service.list_enrollments(search={'history': True})
+    assert len(everything) == two_terms['enrollments'].count_documents({}) + two_terms[ARCHIVE].count_documents({})
+    assert [doc['_id'] for doc in everything] == sorted(doc['_id'] for doc in everything)
+    assert {doc['semester'] for doc in service.list_enrollments()} == {'2'}
+
+    first = service.list_enrollments(limit=5, search={'history': True})
+    second = service.list_enrollments(after=first[-1]['_id'], limit=5, search={'history': True})
+    assert [doc['_id'] for doc in first + second] == [doc['_id'] for doc in everything[:10]]
+
+def test_rows_regraded_during_the_archive_are_not_lost(service, two_terms, monkeypatch):
+    db = two_terms
+    target = db['enrollments'].find_one({'semester': '1', 'grade': 'A'})
+    delete_archived = archive.delete_archived
+    calls = []
+
+    def regrade_then_delete(db, semester):
+        # A regrade whose transaction read the term before it closed commits
+        # between the $merge and the delete.
+        if not calls:
+            service.transactions = False
+            db['enrollments'].update_one({'_id': target['_id']}, {'$set': {'grade': 'C', 'updated_at': 'later'}})
+        calls.append(semester)
+        return delete_archived(db, semester)
+
+    monkeypatch.setattr(archive, 'delete_archived', regrade_then_delete)
+    archive_semester(db, '1')
+    assert len(calls) == 2
+    assert db['enrollments'].count_documents({'semester': '1'}) == 0
+    assert db[ARCHIVE].find_one({'_id': target['_id']})['grade'] == 'C'
+
+def test_rows_moved_out_of_the_term_are_not_archived(two_terms, monkeypatch):
+    db = two_terms
+    target = db['enrollments'].find_one({'semester': '1'})
+    delete_archived = archive.delete_archived
+
+    def move_then_delete(db, semester):
+        db['enrollments'].update_one({'_id': target['_id']}, {'$set': {'semester': '2', 'updated_at': 'later'}})
+        return delete_archived(db, semester)
+
+    monkeypatch.setattr(archive, 'delete_archived', move_then_delete)
+    archive_semester(db, '1')
+    assert db[ARCHIVE].find_one({'_id': target['_id']}) is None
+    assert db['enrollments'].find_one({'_id': target['_id']})['semester'] == '2'
+    assert sum(row['count'] for row in term_stats(db, '1')) == db[ARCHIVE].count_documents({})
+
+def test_analytics_include_archived_terms(service, two_terms):
+    pytest.importorskip('numpy')
+    service.archive_semester('1')
+    snapshot = service.analytics_snapshot()
+    assert len(snapshot) == two_terms['enrollments'].count_documents({}) + two_terms[ARCHIVE].count_documents({})
+    assert [row[0] for row in snapshot.report('semester')] == ['2', '1']
+    labels, means = snapshot.averages('student')
+    for student in two_terms['students'].find({'graded_courses': {'$gt': 0}}):
+        assert math.isclose(means[labels.index(str(student['_id']))], average(student, STUDENT_FIELDS))
@@ -0,0 +1,188 @@
+from types import SimpleNamespace
+
+import pytest
+from bson.objectid import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+
+import enrollment
+from cache import DisplayCache
+from changes import ChangeBatcher, ChangeFeed, change_event
+
+class FakeRoot:
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, callback):
+        self.scheduled.append(callback)
+
+    def run_frame(self):
+        callbacks, self.scheduled = self.scheduled, []
+        for callback in callbacks:
+            callback()
+
+def test_batcher_keeps_the_latest_change_per_document():
+    root, applied = FakeRoot(), []
+    batcher = ChangeBatcher(root, applied.append)
+    first, second = ObjectId(), ObjectId()
+    batcher.push(change_event('update', 'students', first, {'_id': first, 'major': 'A'}))
+    batcher.push(change_event('update', 'students', second, {'_id': second}))
+    batcher.push(change_event('update', 'students', first, {'_id': first, 'major': 'B'}))
+    root.run_frame()
+    assert len(applied) == 1
+    assert {change['key']: change['doc'] for change in applied[0]}[first]['major'] == 'B'
+    assert len(applied[0]) == 2
+
+    root.run_frame()
+    assert len(applied) == 1
+    assert len(root.scheduled) == 1
+
+def test_batcher_passes_a_reset_on_alone():
+    root, applied = FakeRoot(), []
+    batcher = ChangeBatcher(root, applied.append)
+    batcher.push(change_event('update', 'students', ObjectId(), {}))
+    batcher.push(change_event('reset', None, None))
+    batcher.push(change_event('update', 'courses', 'CS101', {}))
+    root.run_frame()
+    assert applied == [[change_event('reset', None, None)]]
+    batcher.push(change_event('update', 'courses', 'CS101', {}))
+    root.run_frame()
+    assert [change['key'] for change in applied[1]] == ['CS101']
+
+def test_feed_sends_a_reset_when_its_resume_token_is_lost():
+    events = []
+    feed = ChangeFeed(None, events.append)
+    feed.resume_token = {'_data': 'gone'}
+    attempts = []
+
+    def watch():
+        attempts.append(feed.resume_token)
+        if len(attempts) == 1:
+            raise OperationFailure('resume point no longer in the oplog', 286)
+        feed.stop()
+        raise PyMongoError('stopped')
+
+    feed._watch = watch
+    feed._run()
+    assert attempts == [{'_data': 'gone'}, None]
+    assert events == [change_event('reset', None, None)]
+
+def test_reset_clears_the_display_cache(db):
+    student_id = db['students'].insert_one({'first_name': 'Ana', 'last_name': 'Cruz'}).inserted_id
+    db['courses'].insert_one({'course_id': 'CS101', 'course_name': 'Programming'})
+    cache = DisplayCache(db)
+    cache.get_students([student_id])
+    cache.get_courses(['CS101'])
+    db['students'].update_one({'_id': student_id}, {'$set': {'first_name': 'Anna'}})
+    cache.apply_change(change_event('reset', None, None))
+    assert cache.get_students([student_id])[student_id]['first_name'] == 'Anna'
+    assert cache.stats()['student_misses'] == 2
+
+class FakeView:
+    def __init__(self):
+        self.search = None
+        self.upserted = []
+        self.removed = []
+        self.reloads = 0
+
+    def upsert(self, key, iid, values):
+        self.upserted.append(iid)
+
+    def remove(self, iids):
+        self.removed += iids
+
+    def reload(self):
+        self.reloads += 1
+
+@pytest.fixture
+def gui(monkeypatch):
+    views = {name: FakeView() for name in ('students', 'courses', 'enrollments')}
+    refreshed = {name: [] for name in views}
+    rows = {}
+    # The widget globals only exist once build_ui() has run.
+    widgets = {
+        'tab_views': {name: (name.title(), view) for name, view in views.items()},
+        'stale': set(),
+        'notebook': SimpleNamespace(select=lambda: 'students'),
+        'student_view': views['students'],
+        'course_view': views['courses'],
+        'enrollment_view': views['enrollments'],
+        'enrollment_table': SimpleNamespace(get_children=lambda: list(rows), item=lambda iid, option: rows[iid]),
+        **{f'refresh_{name}': refreshed[name].extend for name in views},
+    }
+    for name, value in widgets.items():
+        monkeypatch.setattr(enrollment, name, value, raising=False)
+    return SimpleNamespace(views=views, refreshed=refreshed, rows=rows)
+
+def student_doc(student_id, first_name='Ana'):
+    return {'_id': student_id, 'first_name': first_name, 'last_name': 'Cruz', 'email': 'ana@example.com'}
+
+def test_apply_changes_patches_rows_in_place(gui):
+    student_id, enrollment_id, gone = ObjectId(), ObjectId(), ObjectId()
+    enrollment.apply_changes([
+        change_event('update', 'students', student_id, student_doc(student_id)),
+        change_event('delete', 'students', gone),
+        change_event('insert', 'enrollments', enrollment_id, {'_id': enrollment_id}),
+    ])
+    assert gui.views['students'].upserted == [str(student_id)]
+    assert gui.views['students'].removed == [str(gone)]
+    assert gui.refreshed['enrollments'] == [enrollment_id]
+    assert gui.views['courses'].reloads == 0
+
+def test_apply_changes_refetches_enrollment_rows_showing_a_renamed_student(gui):
+    student_id, other = ObjectId(), ObjectId()
+    gui.rows.update({
+        'e1': ('e1', str(student_id), 'CS101', '1', '', 'A', 'Ana Cruz', 'Programming'),
+        'e2': ('e2', str(other), 'CS101', '1', '', 'B', 'Ben Reyes', 'Programming'),
+    })
+    enrollment.apply_changes([change_event('update', 'students', student_id, student_doc(student_id, 'Anna'))])
+    assert gui.refreshed['enrollments'] == ['e1']
+
+def test_apply_changes_leaves_searched_and_stale_tables_to_the_server(gui):
+    student_id = ObjectId()
+    gui.views['students'].search = {'name': 'an'}
+    enrollment.stale.add('courses')
+    enrollment.apply_changes([
+        change_event('update', 'students', student_id, student_doc(student_id)),
+        change_event('update', 'courses', 'CS101', {'course_id': 'CS101', 'course_name': 'Programming',
+                                                    'department': 'CS', 'credits': 3}),
+    ])
+    assert gui.views['students'].upserted == []
+    assert gui.refreshed['students'] == [student_id]
+    assert gui.refreshed['courses'] == []
+
+def test_course_deletes_reload_the_visible_table_or_mark_it_stale(gui, monkeypatch):
+    enrollment.apply_changes([change_event('delete', 'courses', ObjectId())])
+    assert gui.views['courses'].reloads == 0
+    assert 'courses' in enrollment.stale
+
+    monkeypatch.setattr(enrollment, 'notebook', SimpleNamespace(select=lambda: 'courses'))
+    enrollment.load_visible()
+    assert gui.views['courses'].reloads == 1
+    enrollment.apply_changes([change_event('delete', 'courses', ObjectId())])
+    assert gui.views['courses'].reloads == 2
+
+def test_reset_reloads_everything(gui, monkeypatch):
+    loads = []
+    monkeypatch.setattr(enrollment, 'load_all', lambda: loads.append(True))
+    enrollment.apply_changes([change_event('reset', None, None)])
+    assert loads == [True]
+    assert gui.views['students'].upserted == []
+
+def test_offline_mirror_resyncs_on_reset(service, sample, tmp_path, monkeypatch):
+    from offline import LocalMirror, OfflineService
+
+    service.connection_stats = lambda: {'healthy': True}
+    mirror = LocalMirror(str(tmp_path / 'mirror.db'))
+    offline = OfflineService(service, mirror)
+    offline.sync(full=True)
+    handlers, seen = [], []
+    monkeypatch.setattr(service, 'watch', handlers.append)
+    offline.watch(seen.append)
+
+    course = sample['courses'].find_one({})
+    sample['enrollments'].delete_many({'course_id': course['course_id']})
+    sample['courses'].delete_one({'_id': course['_id']})
+    handlers[0](change_event('reset', None, None))
+    assert not mirror.get_many('courses', [course['course_id']])
+    assert seen == [change_event('reset', None, None)]
+    mirror.close()
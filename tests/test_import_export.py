@@ -0,0 +1,61 @@
+import io
+import json
+
+from bson import json_util
+from bson.objectid import ObjectId
+
+import import_export
+from import_export import import_file, iter_csv, iter_json
+
+from conftest import sample_path
+
+def test_iter_json_reads_arrays_across_read_boundaries(monkeypatch):
+    monkeypatch.setattr(import_export, 'READ_SIZE', 7)
+    docs = [{'_id': ObjectId(), 'name': f'student {n}', 'nested': {'a': [1, 2]}} for n in range(20)]
+    text = json_util.dumps(docs, indent=2)
+    assert list(iter_json(io.StringIO(text))) == docs
+
+def test_iter_json_reads_one_document_per_line(monkeypatch):
+    monkeypatch.setattr(import_export, 'READ_SIZE', 5)
+    lines = '{"a": 1}\n\n{"b": {"$numberLong": "2"}}\n{"c": 3}'
+    assert list(iter_json(io.StringIO(lines))) == [{'a': 1}, {'b': 2}, {'c': 3}]
+
+def test_iter_json_empty_array():
+    assert list(iter_json(io.StringIO('  [ ]  '))) == []
+
+def test_iter_json_reads_the_sample_export():
+    with open(sample_path('students'), encoding='utf-8') as handle:
+        docs = list(iter_json(handle))
+    with open(sample_path('students'), encoding='utf-8') as handle:
+        assert docs == json_util.loads(handle.read())
+
+def test_iter_csv_strips_values_and_drops_extra_cells():
+    text = 'first_name,last_name,email\n  Ana , Cruz ,ana@example.com,extra\nBen,Reyes\n'
+    assert list(iter_csv(io.StringIO(text))) == [
+        {'first_name': 'Ana', 'last_name': 'Cruz', 'email': 'ana@example.com'},
+        {'first_name': 'Ben', 'last_name': 'Reyes'},
+    ]
+
+def test_import_rejects_rows_missing_required_fields(db, tmp_path):
+    path = tmp_path / 'students.csv'
+    path.write_text('first_name,last_name,email\n'
+                    'Ana,Cruz,ana@example.com\n'
+                    'Ben,,ben@example.com\n', encoding='utf-8')
+    report = import_file(db, 'students', str(path))
+    assert report['inserted'] == 1
+    assert report['failed'] == 1 and report['errors'][0][0] == 2
+    assert db['students'].find_one({'first_name': 'Ana'})['updated_at'] is not None
+
+def test_import_sample_keeps_every_row(sample):
+    counts = {}
+    for collection in ('students', 'courses', 'enrollments'):
+        with open(sample_path(collection), encoding='utf-8') as handle:
+            counts[collection] = len(json.load(handle))
+    assert {collection: sample[collection].count_documents({}) for collection in counts} == counts
+
+def test_import_rejects_enrollments_for_unknown_students(db, tmp_path):
+    path = tmp_path / 'enrollments.csv'
+    path.write_text(f'student_id,course_id,semester\n{ObjectId()},CS101,1\n', encoding='utf-8')
+    report = import_file(db, 'enrollments', str(path))
+    assert report['inserted'] == 0
+    assert report['errors'][0][1].startswith('unknown student')
@@ -0,0 +1,39 @@
+import threading
+from types import SimpleNamespace
+
+from changes import FEED_THREAD
+from instrumentation import CommandRecorder
+
+def run_command(recorder, request_id, name, command, reply, duration_ms):
+    started = SimpleNamespace(command_name=name, command=command, connection_id=('localhost', 27017),
+                              request_id=request_id)
+    recorder.started(started)
+    recorder.succeeded(SimpleNamespace(command_name=name, connection_id=('localhost', 27017), request_id=request_id,
+                                       database_name='enrollment_db', duration_micros=duration_ms * 1000, reply=reply))
+
+def test_records_commands_with_their_collection_and_docs():
+    recorder = CommandRecorder()
+    run_command(recorder, 1, 'find', {'find': 'students', 'filter': {}},
+                {'cursor': {'firstBatch': [{}, {}]}}, 5)
+    run_command(recorder, 2, 'getMore', {'getMore': 7, 'collection': 'students'},
+                {'cursor': {'nextBatch': [{}]}}, 3)
+    run_command(recorder, 3, 'hello', {'hello': 1}, {}, 1)
+    records = recorder.snapshot()
+    assert [(record['command'], record['collection'], record['docs']) for record in records] == [
+        ('find', 'students', 2), ('getMore', 'students', 1)]
+    assert records[0]['spec'] == {'find': 'students', 'filter': {}}
+    assert recorder.slowest(1)[0]['command'] == 'find'
+
+def test_change_feed_commands_are_left_out():
+    recorder = CommandRecorder()
+
+    def feed():
+        for request_id in range(10):
+            run_command(recorder, request_id, 'getMore', {'getMore': 9, 'collection': '$cmd.aggregate'},
+                        {'cursor': {'nextBatch': []}}, 1000)
+
+    thread = threading.Thread(target=feed, name=FEED_THREAD)
+    thread.start()
+    thread.join()
+    run_command(recorder, 99, 'find', {'find': 'courses'}, {'cursor': {'firstBatch': []}}, 2)
+    assert [row['command'] for row in recorder.summary()] == ['find']
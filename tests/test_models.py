@@ -0,0 +1,61 @@
+from datetime import date, datetime
+
+import pytest
+from bson.objectid import ObjectId
+
+from import_export import import_file
+from models import Course, Student, format_date, parse_date
+from schema import migrate_dates
+
+@pytest.mark.parametrize('value, expected', [
+    (None, None),
+    ('', None),
+    ('2001-02-03', datetime(2001, 2, 3)),
+    (' 2001-02-03 ', datetime(2001, 2, 3)),
+    ('101003', datetime(2003, 10, 10)),
+    ('010199', datetime(1999, 1, 1)),
+    (date(2001, 2, 3), datetime(2001, 2, 3)),
+    (datetime(2001, 2, 3, 4, 5), datetime(2001, 2, 3, 4, 5)),
+])
+def test_parse_date(value, expected):
+    assert parse_date(value) == expected
+
+@pytest.mark.parametrize('value', ['1232022', '133199', '2001-13-01', 'yesterday'])
+def test_parse_date_rejects_other_forms(value):
+    with pytest.raises(ValueError, match='YYYY-MM-DD or MMDDYY'):
+        parse_date(value)
+
+def test_student_round_trip():
+    student = Student('Ana', 'Cruz', 'ana@example.com', 'BSIT', datetime(2001, 2, 3), 2, 1, 1.0, id=ObjectId())
+    assert Student.from_doc(student.to_doc()) == student
+    assert student.row()[4] == format_date(datetime(2001, 2, 3))
+    assert student.gwa == 1.0
+
+def test_course_round_trip():
+    course = Course('CS101', 'Programming', 'CS', 3, 'Reyes', 2, 0, 0.0)
+    assert Course.from_doc(course.to_doc()) == course
+    assert course.row()[-1] == 'N/A'
+
+def test_migrate_dates_converts_legacy_strings(db):
+    db['students'].insert_many([
+        {'first_name': 'Ana', 'date_of_birth': '101003'},
+        {'first_name': 'Ben', 'date_of_birth': '2001-02-03'},
+        {'first_name': 'Cy', 'date_of_birth': 'unknown'},
+        {'first_name': 'Di', 'date_of_birth': datetime(1999, 1, 1)},
+    ])
+    assert migrate_dates(db) == 2
+    births = {doc['first_name']: doc['date_of_birth'] for doc in db['students'].find()}
+    assert births == {'Ana': datetime(2003, 10, 10), 'Ben': datetime(2001, 2, 3), 'Cy': 'unknown',
+                      'Di': datetime(1999, 1, 1)}
+    assert migrate_dates(db) == 0
+
+def test_import_warns_on_bad_dates_and_keeps_the_student(db, tmp_path):
+    path = tmp_path / 'students.csv'
+    path.write_text('first_name,last_name,email,date_of_birth\n'
+                    'Ana,Cruz,ana@example.com,2001-02-03\n'
+                    'Cy,Tan,cy@example.com,1232022\n', encoding='utf-8')
+    report = import_file(db, 'students', str(path))
+    assert (report['inserted'], report['failed']) == (2, 0)
+    assert [row for row, _ in report['warnings']] == [2]
+    assert db['students'].find_one({'first_name': 'Cy'})['date_of_birth'] is None
+    assert db['students'].find_one({'first_name': 'Ana'})['date_of_birth'] == datetime(2001, 2, 3)
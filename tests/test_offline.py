@@ -0,0 +1,195 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson.objectid import ObjectId
+from pymongo.errors import ConnectionFailure, WriteError
+
+from offline import LocalMirror, OfflineService, key_of, matches, sql_filter
+
+DOC = {'first_name': 'Maria', 'last_name': 'Cruz', 'year': 2, 'major': 'BSIT', 'date_of_birth': None}
+
+@pytest.mark.parametrize('query, fold, expected', [
+    ({}, False, True),
+    ({'major': 'BSIT'}, False, True),
+    ({'major': 'bsit'}, False, False),
+    ({'major': 'bsit'}, True, True),
+    ({'year': {'$gte': 2, '$lt': 3}}, False, True),
+    ({'year': {'$gt': 2}}, False, False),
+    ({'date_of_birth': {'$lt': 5}}, False, False),
+    ({'major': {'$in': ['BSCS', 'BSIT']}}, False, True),
+    ({'$or': [{'first_name': 'Ana'}, {'last_name': 'Cruz'}]}, False, True),
+    ({'$and': [{'first_name': 'Maria'}, {'last_name': 'Reyes'}]}, False, False),
+    ({'first_name': {'$gte': 'ma', '$lt': 'ma￿'}}, True, True),
+    ({'first_name': {'$gte': 'ma', '$lt': 'ma￿'}}, False, False),
+])
+def test_matches(query, fold, expected):
+    assert matches(DOC, query, fold) is expected
+
+def test_matches_rejects_unknown_operators():
+    with pytest.raises(ValueError):
+        matches(DOC, {'year': {'$ne': 1}})
+
+@pytest.fixture
+def mirror(tmp_path):
+    mirror = LocalMirror(str(tmp_path / 'mirror.db'))
+    yield mirror
+    mirror.close()
+
+@pytest.fixture
+def offline(service, sample, mirror):
+    state = {'healthy': True}
+    service.connection_stats = lambda: dict(state)
+    offline = OfflineService(service, mirror)
+    offline.sync(full=True)
+    offline.state = state
+    return offline
+
+@pytest.mark.parametrize('query, fold', [
+    ({'major': 'BSIT'}, False),
+    ({'$or': [{'first_name': {'$gte': 'ma', '$lt': 'ma￿'}}, {'last_name': {'$gte': 'ma', '$lt': 'ma￿'}}]}, True),
+    ({'$and': [{'year_level': {'$in': [1, 2]}}, {'gender': {'$in': ['Male', 'Female']}}]}, False),
+    ({'last_name': {'$gte': 'C', '$lt': 'M'}}, False),
+])
+def test_sql_filter_finds_what_matches_finds(offline, mirror, query, fold):
+    assert sql_filter(query, fold)
+    docs = offline.service.db['students'].find()
+    expected = sorted(str(doc['_id']) for doc in docs if matches(doc, query, fold))
+    assert sorted(str(doc['_id']) for doc in mirror.find('students', query, fold=fold)) == expected
+
+def page(docs):
+    # The mirror keeps datetimes at BSON's millisecond precision, so compare
+    # what identifies and orders a row.
+    return [(doc['_id'], doc['last_name']) for doc in docs]
+
+def test_offline_reads_page_like_the_server(offline):
+    online = offline.list_students(limit=10)
+    offline.state['healthy'] = False
+    assert page(offline.list_students(limit=10)) == page(online)
+    after = online[-1]['_id']
+    assert page(offline.list_students(after=after, limit=5)) == page(offline.service.list_students(after=after, limit=5))
+
+def test_offline_writes_are_replayed_on_sync(offline, mirror):
+    db = offline.service.db
+    student = db['students'].find_one({})
+    course = db['courses'].find_one({})
+    offline.state['healthy'] = False
+    student_id = offline.add_student({'first_name': 'Off', 'last_name': 'Line', 'email': 'off@example.com'})
+    offline.update_student(str(student['_id']), {'major': 'Offline'})
+    enrollment_id = offline.add_enrollment(str(student_id), course['course_id'], '2030-1', 'A')
+    assert mirror.pending() == 3
+    assert db['students'].find_one({'_id': student_id}) is None
+    assert offline.list_students(search={'name': 'off'})[0]['_id'] == student_id
+
+    offline.state['healthy'] = True
+    report = offline.sync()
+    assert (report['applied'], report['conflicts'], report['queued']) == (3, [], 0)
+    assert db['students'].find_one({'_id': student['_id']})['major'] == 'Offline'
+    assert db['enrollments'].find_one({'_id': enrollment_id})['student_id'] == student_id
+    assert mirror.get_many('students', [student_id])[key_of(student_id)]['total_courses'] == 1
+
+def test_counter_bumps_do_not_conflict(offline):
+    db = offline.service.db
+    student = db['students'].find_one({})
+    course = db['courses'].find_one({})
+    offline.state['healthy'] = False
+    offline.update_student(str(student['_id']), {'major': 'Mine'})
+    offline.service.add_enrollment(str(student['_id']), course['course_id'], '2030-2')
+    offline.state['healthy'] = True
+    assert offline.sync()['conflicts'] == []
+    assert db['students'].find_one({'_id': student['_id']})['major'] == 'Mine'
+
+def test_server_edit_makes_the_offline_edit_a_conflict(offline):
+    db = offline.service.db
+    student = db['students'].find_one({})
+    offline.state['healthy'] = False
+    offline.update_student(str(student['_id']), {'major': 'Mine'})
+    offline.service.update_student(str(student['_id']), {'major': 'Server'})
+    offline.state['healthy'] = True
+    report = offline.sync()
+    assert report['applied'] == 0
+    assert [op for op, _ in report['conflicts']] == ['update_student']
+    assert 'major changed on the server' in report['conflicts'][0][1]
+    assert db['students'].find_one({'_id': student['_id']})['major'] == 'Server'
+    assert offline.conflicts()[0]['op'] == 'update_student'
+
+def test_connection_failure_keeps_the_queue(offline, mirror, monkeypatch):
+    student = offline.service.db['students'].find_one({})
+    offline.state['healthy'] = False
+    offline.update_student(str(student['_id']), {'major': 'Mine'})
+    offline.state['healthy'] = True
+
+    def unreachable(*args):
+        raise ConnectionFailure('server gone')
+
+    monkeypatch.setattr(offline.service, 'update_student', unreachable)
+    report = offline.sync()
+    assert (report['applied'], report['queued']) == (0, 1)
+    assert mirror.outbox()[0][1] == 'update_student'
+
+    monkeypatch.undo()
+    assert offline.sync()['applied'] == 1
+    assert mirror.pending() == 0
+
+def test_replay_of_a_rejected_write_is_recorded(offline):
+    offline.state['healthy'] = False
+    offline.add_enrollment(str(ObjectId()), 'NOPE101', '2030-1')
+    offline.state['healthy'] = True
+    report = offline.sync()
+    assert report['applied'] == 0 and report['queued'] == 0
+    assert [op for op, _ in report['conflicts']] == ['add_enrollment']
+
+def test_server_rejection_does_not_block_the_queue(offline, mirror, monkeypatch):
+    offline.state['healthy'] = False
+    offline.add_course({'course_id': 'NEG101', 'course_name': 'Negative', 'department': 'CS', 'credits': -3})
+    offline.update_course('NEG101', {'course_name': 'Still negative'})
+    student_id = offline.add_student({'first_name': 'Off', 'last_name': 'Line', 'email': 'off@example.com'})
+    offline.state['healthy'] = True
+
+    add_course = offline.service.add_course
+
+    def validator(data):
+        if int(data['credits']) < 0:
+            raise WriteError('Document failed validation', 121, {'code': 121})
+        return add_course(data)
+
+    monkeypatch.setattr(offline.service, 'add_course', validator)
+    report = offline.sync()
+    # The rename of the rejected course has nothing to apply to either.
+    assert report['queued'] == 0 and report['applied'] == 1
+    assert [op for op, _ in report['conflicts']] == ['add_course', 'update_course']
+    assert offline.conflicts()[0]['reason'].startswith('Document failed validation')
+    assert offline.service.db['students'].find_one({'_id': student_id}) is not None
+    assert offline.add_student({'first_name': 'On', 'last_name': 'Line', 'email': 'on@example.com'})
+    assert mirror.pending() == 0
+
+def test_pulls_after_the_first_only_copy_changed_documents(offline, mirror):
+    db = offline.service.db
+    # Age the sample's stamps past the overlap pulls re-read for clock skew.
+    for collection in ('students', 'courses', 'enrollments'):
+        db[collection].update_many({}, {'$set': {'updated_at': datetime.now() - timedelta(hours=1)}})
+    student = db['students'].find_one({})
+    gone = db['courses'].find_one({'enrolled_students': 0}) or db['courses'].find_one({})
+    offline.service.update_student(str(student['_id']), {'major': 'Changed'})
+    db['courses'].delete_one({'_id': gone['_id']})
+
+    report = offline.sync()
+    assert report['pulled'] == 1
+    assert mirror.get_many('students', [student['_id']])[key_of(student['_id'])]['major'] == 'Changed'
+    assert mirror.get_many('courses', [gone['course_id']])
+
+    # Deletes leave nothing to pull; the launch sync finds them by key.
+    assert offline.sync(full=True)['pulled'] <= 1
+    assert not mirror.get_many('courses', [gone['course_id']])
+
+def test_queued_count_survives_a_restart(offline, mirror, tmp_path):
+    student = offline.service.db['students'].find_one({})
+    offline.state['healthy'] = False
+    offline.update_student(str(student['_id']), {'major': 'One'})
+    offline.update_student(str(student['_id']), {'major': 'Two'})
+    assert offline.connection_stats()['queued'] == 2
+    reopened = LocalMirror(mirror.path)
+    assert reopened.pending() == 2
+    reopened.close()
+    offline.state['healthy'] = True
+    offline.sync()
+    assert mirror.pending() == 0
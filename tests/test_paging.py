@@ -0,0 +1,19 @@
+from paging import window_filter, window_stages
+
+def test_window_filter():
+    assert window_filter(None, '_id') == {}
+    assert window_filter({'semester': '1'}, '_id', after=5) == {'$and': [{'semester': '1'}, {'_id': {'$gt': 5}}]}
+    assert window_filter(None, 'course_id', before='CS') == {'course_id': {'$lt': 'CS'}}
+
+def test_window_stages_sort_towards_the_anchor():
+    assert window_stages(None, '_id') == []
+    assert window_stages(None, '_id', after=1, limit=10) == [
+        {'$match': {'_id': {'$gt': 1}}}, {'$sort': {'_id': 1}}, {'$limit': 10}]
+    assert window_stages(None, '_id', before=9, limit=10)[1] == {'$sort': {'_id': -1}}
+
+def test_paged_listing_follows_the_window(service, sample):
+    first = service.list_students(limit=10)
+    second = service.list_students(after=first[-1]['_id'], limit=10)
+    back = service.list_students(before=second[0]['_id'], limit=10)
+    assert [doc['_id'] for doc in back] == [doc['_id'] for doc in first]
+    assert first[-1]['_id'] < second[0]['_id']
@@ -0,0 +1,29 @@
+from paging import combine_filters
+from search import NAME_COLLATION, PREFIX_END, course_search, enrollment_search, student_search
+
+def test_combine_filters():
+    assert combine_filters() == {}
+    assert combine_filters(None, {}, {'a': 1}) == {'a': 1}
+    assert combine_filters({'a': 1}, None, {'b': 2}) == {'$and': [{'a': 1}, {'b': 2}]}
+
+def test_student_name_search_is_a_collated_prefix_range():
+    query, collation = student_search({'name': 'ma'})
+    prefix = {'$gte': 'ma', '$lt': 'ma' + PREFIX_END}
+    assert query == {'$or': [{'first_name': prefix}, {'last_name': prefix}]}
+    assert collation is NAME_COLLATION
+
+def test_student_exact_fields_need_no_collation():
+    query, collation = student_search({'email': 'a@b.c', 'major': 'BSIT'})
+    assert query == {'$and': [{'email': 'a@b.c'}, {'major': 'BSIT'}]}
+    assert collation is None
+    assert student_search(None) == ({}, None)
+
+def test_course_search():
+    query, collation = course_search({'name': 'Intro', 'department': 'CS'})
+    assert query == {'$and': [{'course_name': {'$gte': 'Intro', '$lt': 'Intro' + PREFIX_END}}, {'department': 'CS'}]}
+    assert collation is NAME_COLLATION
+
+def test_enrollment_search_ignores_blank_fields():
+    assert enrollment_search({'semester': '2025-1', 'grade': '', 'course_id': 'CS101'}) == \
+        {'$and': [{'semester': '2025-1'}, {'course_id': 'CS101'}]}
+    assert enrollment_search({}) == {}
@@ -0,0 +1,69 @@
+import pytest
+
+from stats import COURSE_FIELDS, STUDENT_FIELDS, average, rebuild_stats, verify_stats
+
+def counters(db, student_id, course_id):
+    student = db['students'].find_one({'_id': student_id})
+    course = db['courses'].find_one({'course_id': course_id})
+    return ({field: student[field] for field in STUDENT_FIELDS.values()},
+            {field: course[field] for field in COURSE_FIELDS.values()})
+
+@pytest.fixture
+def pair(service):
+    student_id = service.add_student({'first_name': 'Ana', 'last_name': 'Cruz', 'email': 'ana@example.com'})
+    service.add_course({'course_id': 'CS101', 'course_name': 'Programming', 'department': 'CS', 'credits': 3})
+    return student_id, 'CS101'
+
+def test_sample_counters_match_enrollments(service, sample):
+    assert verify_stats(sample) == []
+
+def test_add_enrollment_counts_it(service, pair):
+    student_id, course_id = pair
+    service.add_enrollment(student_id, course_id, '2025-1', 'A')
+    service.add_enrollment(student_id, course_id, '2025-2')
+    student, course = counters(service.db, student_id, course_id)
+    assert student == {'total_courses': 2, 'graded_courses': 1, 'grade_points': 1.0}
+    assert course == {'enrolled_students': 2, 'graded_students': 1, 'grade_points': 1.0}
+    assert verify_stats(service.db) == []
+
+def test_regrade_moves_points_not_totals(service, pair):
+    student_id, course_id = pair
+    enrollment_id = service.add_enrollment(student_id, course_id, '2025-1', 'A')
+    other_id = service.add_enrollment(student_id, course_id, '2025-2')
+    service.update_enrollment(enrollment_id, '2025-1', 'C')
+    service.save_grades(course_id, '2025-2', {str(other_id): 'Incomplete'})
+    student, course = counters(service.db, student_id, course_id)
+    assert student == {'total_courses': 2, 'graded_courses': 1, 'grade_points': 3.0}
+    assert average(service.db['students'].find_one({'_id': student_id}), STUDENT_FIELDS) == 3.0
+    assert course['graded_students'] == 1
+    assert verify_stats(service.db) == []
+
+def test_delete_enrollment_and_cascades(service, pair):
+    student_id, course_id = pair
+    enrollment_id = service.add_enrollment(student_id, course_id, '2025-1', 'B')
+    service.add_enrollment(student_id, course_id, '2025-2', 'A')
+    service.delete_enrollment(enrollment_id)
+    student, course = counters(service.db, student_id, course_id)
+    assert student == {'total_courses': 1, 'graded_courses': 1, 'grade_points': 1.0}
+    assert verify_stats(service.db) == []
+
+    service.delete_student(student_id)
+    course = service.db['courses'].find_one({'course_id': course_id})
+    assert {field: course[field] for field in COURSE_FIELDS.values()} == \
+        {'enrolled_students': 0, 'graded_students': 0, 'grade_points': 0.0}
+    assert verify_stats(service.db) == []
+
+def test_counter_writes_stamp_updated_at(service, pair):
+    student_id, course_id = pair
+    service.db['students'].update_one({'_id': student_id}, {'$unset': {'updated_at': 1}})
+    service.add_enrollment(student_id, course_id, '2025-1')
+    assert service.db['students'].find_one({'_id': student_id}).get('updated_at') is not None
+
+def test_verify_reports_drift_and_rebuild_repairs_it(service, sample):
+    student = sample['students'].find_one({'total_courses': {'$gt': 0}})
+    sample['students'].update_one({'_id': student['_id']}, {'$inc': {'total_courses': 5}})
+    drift = verify_stats(sample)
+    assert [(collection, key) for collection, key, _, _ in drift] == [('students', student['_id'])]
+    assert rebuild_stats(sample) == 1
+    assert verify_stats(sample) == []
+    assert rebuild_stats(sample) == 0
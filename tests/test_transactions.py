@@ -0,0 +1,100 @@
+import pytest
+from bson.objectid import ObjectId
+from pymongo.errors import ServerSelectionTimeoutError
+
+from conftest import TEST_URI
+from stats import verify_stats
+
+class FakeSession:
+    def __init__(self, client):
+        self.client = client
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def with_transaction(self, work):
+        self.client.transactions += 1
+        return work(self)
+
+class FakeClient:
+    # Stands in for MongoClient.start_session so the transaction path can run
+    # on mongomock, which accepts and ignores session=.
+    def __init__(self):
+        self.transactions = 0
+
+    def start_session(self):
+        return FakeSession(self)
+
+@pytest.fixture
+def transactional(service):
+    if TEST_URI:
+        pytest.skip("a real server runs its own transactions in the other tests")
+    mongomock = pytest.importorskip('mongomock')
+    mongomock.ignore_feature('session')
+    service.client = FakeClient()
+    service.transactions = True
+    yield service
+    mongomock.warn_on_feature('session')
+
+def test_transaction_support_follows_hello(service, monkeypatch):
+    for hello, expected in (({'setName': 'rs0'}, True), ({'msg': 'isdbgrid'}, True), ({}, False)):
+        service.transactions = None
+        monkeypatch.setattr(service.db, 'command', lambda name, hello=hello: hello)
+        assert service.supports_transactions() is expected
+        assert service.transactions is expected
+
+def test_transaction_support_is_rechecked_after_a_failed_hello(service, monkeypatch):
+    service.transactions = None
+
+    def unreachable(name):
+        raise ServerSelectionTimeoutError('no servers')
+
+    monkeypatch.setattr(service.db, 'command', unreachable)
+    assert service.supports_transactions() is False
+    assert service.transactions is None
+
+def test_multi_document_writes_run_in_one_transaction_each(transactional, sample):
+    student = sample['students'].find_one({'total_courses': {'$gt': 0}})
+    course = sample['courses'].find_one({})
+    enrollment_id = transactional.add_enrollment(str(student['_id']), course['course_id'], '2030-1', 'A')
+    transactional.update_enrollment(enrollment_id, '2030-1', 'B')
+    transactional.delete_enrollments([enrollment_id])
+    transactional.delete_students([student['_id']])
+    assert transactional.client.transactions == 4
+    assert verify_stats(sample) == []
+
+def test_delete_students_cascades(service, sample):
+    student_ids = [doc['_id'] for doc in sample['students'].find({'total_courses': {'$gt': 0}}).limit(2)]
+    affected = service.delete_students([str(student_id) for student_id in student_ids])
+    assert affected
+    assert sample['enrollments'].count_documents({'student_id': {'$in': student_ids}}) == 0
+    assert sample['students'].count_documents({'_id': {'$in': student_ids}}) == 0
+    assert verify_stats(sample) == []
+
+def test_delete_courses_cascades(service, sample):
+    course_ids = [doc['course_id'] for doc in sample['courses'].find({'enrolled_students': {'$gt': 0}}).limit(2)]
+    service.delete_courses(course_ids)
+    assert sample['enrollments'].count_documents({'course_id': {'$in': course_ids}}) == 0
+    assert verify_stats(sample) == []
+
+def test_delete_enrollments_is_all_or_nothing(service, sample):
+    enrollment_ids = [doc['_id'] for doc in sample['enrollments'].find().limit(3)]
+    with pytest.raises(ValueError):
+        service.delete_enrollments(enrollment_ids + [ObjectId()])
+    assert sample['enrollments'].count_documents({'_id': {'$in': enrollment_ids}}) == 3
+
+    removed = service.delete_enrollments(enrollment_ids)
+    assert sorted(doc['_id'] for doc in removed) == sorted(enrollment_ids)
+    assert sample['enrollments'].count_documents({'_id': {'$in': enrollment_ids}}) == 0
+    assert verify_stats(sample) == []
+
+def test_add_enrollment_for_a_deleted_student_writes_nothing(service, sample):
+    course = sample['courses'].find_one({})
+    before = course['enrolled_students']
+    with pytest.raises(ValueError):
+        service.add_enrollment(str(ObjectId()), course['course_id'], '2030-1', 'A')
+    assert sample['courses'].find_one({'_id': course['_id']})['enrolled_students'] == before
+    assert sample['enrollments'].count_documents({'semester': '2030-1'}) == 0
@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+from worker import Worker
+
+@pytest.fixture
+def worker():
+    worker = Worker()
+    yield worker
+    worker.shutdown()
+
+def test_results_come_back_through_drain(worker):
+    results = []
+    worker.submit(lambda x: x * 2, 21, on_done=results.append)
+    worker.run_until_idle(timeout=5)
+    assert results == [42]
+
+def test_errors_go_to_on_error(worker):
+    errors = []
+    worker.submit(lambda: 1 / 0, on_error=errors.append)
+    worker.run_until_idle(timeout=5)
+    assert isinstance(errors[0], ZeroDivisionError)
+
+def test_keyed_calls_coalesce_into_one_rerun(worker):
+    release = threading.Event()
+    calls, results = [], []
+
+    def load(value):
+        calls.append(value)
+        release.wait(5)
+        return value
+
+    worker.submit(load, 1, key='load', on_done=results.append)
+    for value in (2, 3, 4):
+        worker.submit(load, value, key='load', on_done=results.append)
+    release.set()
+    worker.run_until_idle(timeout=5)
+    # The first call ran; the three repeats collapsed into one rerun with the
+    # latest arguments, and only its result was delivered.
+    assert calls == [1, 4]
+    assert results == [4]
+
+def test_different_keys_do_not_coalesce(worker):
+    results = []
+    worker.submit(lambda: 'a', key='a', on_done=results.append)
+    worker.submit(lambda: 'b', key='b', on_done=results.append)
+    worker.run_until_idle(timeout=5)
+    assert sorted(results) == ['a', 'b']
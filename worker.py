@@ -0,0 +1,83 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+POLL_INTERVAL_MS = 20
+
+class Worker:
+    # Callbacks always run on the thread that calls drain() (the Tk thread via
+    # root.after, or the caller when headless). Calls sharing a key are coalesced:
+    # repeats while one is in flight collapse into a single rerun afterwards.
+
+    def __init__(self, root=None, max_workers=4, on_error=None):
+        self.root = root
+        self.on_error = on_error
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='enrollment-db')
+        self.results = queue.Queue()
+        self.inflight = {}
+        self.futures = set()
+        self.lock = threading.Lock()
+        if root is not None:
+            root.after(POLL_INTERVAL_MS, self._poll)
+
+    def submit(self, fn, *args, key=None, on_done=None, on_error=None):
+        if key is not None:
+            if key in self.inflight:
+                self.inflight[key] = (fn, args, on_done, on_error)
+                return
+            self.inflight[key] = None
+        future = self.executor.submit(self._run, key, fn, args, on_done, on_error)
+        with self.lock:
+            self.futures.add(future)
+        future.add_done_callback(self._forget)
+
+    def _forget(self, future):
+        with self.lock:
+            self.futures.discard(future)
+
+    def _run(self, key, fn, args, on_done, on_error):
+        try:
+            result = fn(*args)
+        except Exception as err:
+            self.results.put((key, on_error, None, err))
+        else:
+            self.results.put((key, on_done, result, None))
+
+    def drain(self):
+        while True:
+            try:
+                key, callback, result, err = self.results.get_nowait()
+            except queue.Empty:
+                return
+            superseded = False
+            if key is not None:
+                rerun = self.inflight.pop(key, None)
+                if rerun is not None:
+                    superseded = True
+                    fn, args, on_done, on_error = rerun
+                    self.submit(fn, *args, key=key, on_done=on_done, on_error=on_error)
+            if err is not None:
+                handler = callback or self.on_error
+                if handler is None:
+                    raise err
+                handler(err)
+            elif callback is not None and not superseded:
+                callback(result)
+
+    def run_until_idle(self, timeout=None):
+        while True:
+            with self.lock:
+                pending = list(self.futures)
+            if not pending and self.results.empty():
+                return
+            wait(pending, timeout=timeout)
+            self.drain()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _poll(self):
+        try:
+            self.drain()
+        finally:
+            self.root.after(POLL_INTERVAL_MS, self._poll)